@@ -0,0 +1,188 @@
+# analytics.py
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.orm import selectinload
+from database import db
+from models import Order, OrderItem, Product, SalesByDay, SalesByProduct, SalesByCategory
+from jobs import task
+
+# Cancelled orders stay in the per-status counts but not in sales
+SALES_STATUSES = ('pending', 'shipped', 'completed')
+
+
+# Add deltas to one rollup row, creating it on first use. A concurrent insert of
+# the same row fails the transaction with an IntegrityError; the job is retried.
+def _bump(model, keys, **deltas):
+    result = db.session.execute(
+        update(model)
+        .where(*[getattr(model, column) == value for column, value in keys.items()])
+        .values({column: getattr(model, column) + delta for column, delta in deltas.items()})
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.session.execute(insert(model).values(**keys, **deltas))
+
+
+# Add (sign=1) or take out (sign=-1) one order's contribution under a status
+def _apply_order(order, status, sign):
+    day = order.created_at.date()
+    units = sum(item.quantity for item in order.order_items)
+    revenue = sum((item.price_at_purchase * item.quantity for item in order.order_items), Decimal('0'))
+    _bump(SalesByDay, {'day': day, 'status': status}, orders=sign, units=sign * units, revenue=sign * revenue)
+    if status not in SALES_STATUSES:
+        return
+
+    by_product = defaultdict(lambda: [0, Decimal('0')])
+    by_category = defaultdict(lambda: [0, Decimal('0')])
+    for item in order.order_items:
+        line_total = item.price_at_purchase * item.quantity
+        for totals in (by_product[item.product_id], by_category[item.product.category]):
+            totals[0] += item.quantity
+            totals[1] += line_total
+    # Sorted keys keep row lock order consistent between workers
+    for product_id in sorted(by_product):
+        units, revenue = by_product[product_id]
+        _bump(SalesByProduct, {'day': day, 'product_id': product_id}, units=sign * units, revenue=sign * revenue)
+    for category in sorted(by_category):
+        units, revenue = by_category[category]
+        _bump(SalesByCategory, {'day': day, 'category': category}, units=sign * units, revenue=sign * revenue)
+
+
+# Bring the rollups in line with an order's current status. Enqueued whenever an
+# order is placed or changes status; running it twice, or out of order, is
+# harmless because orders.rolled_up_status records what is already counted.
+@task('update_sales_rollups')
+def update_sales_rollups(order_id):
+    order = (Order.query
+             .options(selectinload(Order.order_items)
+                      .joinedload(OrderItem.product).load_only(Product.category))
+             .filter_by(order_id=order_id).first())
+    if order is None or order.rolled_up_status == order.status:
+        return
+    previous = order.rolled_up_status
+    result = db.session.execute(
+        update(Order)
+        .where(Order.order_id == order_id,
+               Order.rolled_up_status.is_(None) if previous is None else Order.rolled_up_status == previous)
+        .values(rolled_up_status=order.status)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise RuntimeError(f"Order {order_id} was rolled up concurrently")
+    if previous is not None:
+        _apply_order(order, previous, -1)
+    _apply_order(order, order.status, 1)
+
+
+def _day(value):
+    # func.date() returns a string on SQLite
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def _insert_batches(model, rows, make_row, batch_size):
+    batch = []
+    inserted = 0
+    for row in rows.yield_per(batch_size):
+        batch.append(make_row(*row))
+        if len(batch) == batch_size:
+            db.session.execute(insert(model), batch)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(model), batch)
+        inserted += len(batch)
+    return inserted
+
+
+# Recompute every rollup from the order items' price_at_purchase. Run it with the
+# job workers stopped; rollup jobs queued meanwhile would count orders twice.
+def rebuild_sales_rollups(batch_size=1000):
+    for model in (SalesByDay, SalesByProduct, SalesByCategory):
+        db.session.execute(delete(model))
+
+    day = func.date(Order.created_at)
+    units = func.sum(OrderItem.quantity)
+    revenue = func.sum(OrderItem.price_at_purchase * OrderItem.quantity)
+    # Every order is read either way, so the status test goes in the join
+    sold = (OrderItem.order_id == Order.order_id) & Order.status.in_(SALES_STATUSES)
+
+    inserted = _insert_batches(
+        SalesByDay,
+        db.session.query(day, Order.status, func.count(func.distinct(Order.order_id)), units, revenue)
+        .join(OrderItem, OrderItem.order_id == Order.order_id)
+        .group_by(day, Order.status),
+        lambda d, status, orders, u, r: {'day': _day(d), 'status': status, 'orders': orders,
+                                         'units': u, 'revenue': r},
+        batch_size)
+    inserted += _insert_batches(
+        SalesByProduct,
+        db.session.query(day, OrderItem.product_id, units, revenue)
+        .join(OrderItem, sold)
+        .group_by(day, OrderItem.product_id),
+        lambda d, product_id, u, r: {'day': _day(d), 'product_id': product_id, 'units': u, 'revenue': r},
+        batch_size)
+    inserted += _insert_batches(
+        SalesByCategory,
+        db.session.query(day, Product.category, units, revenue)
+        .join(OrderItem, sold)
+        .join(Product, Product.product_id == OrderItem.product_id)
+        .group_by(day, Product.category),
+        lambda d, category, u, r: {'day': _day(d), 'category': category, 'units': u, 'revenue': r},
+        batch_size)
+
+    db.session.execute(update(Order).values(rolled_up_status=Order.status))
+    db.session.commit()
+    return inserted
+
+
+# The reads below cover start to end inclusive. Rows emptied by cancellations are
+# kept, so groups that sum to nothing are skipped.
+
+# Revenue per day; days without sales are omitted
+def daily_sales(start, end):
+    rows = (db.session.query(SalesByDay.day, func.sum(SalesByDay.orders),
+                             func.sum(SalesByDay.units), func.sum(SalesByDay.revenue))
+            .filter(SalesByDay.day >= start, SalesByDay.day <= end, SalesByDay.status.in_(SALES_STATUSES))
+            .group_by(SalesByDay.day)
+            .having(func.sum(SalesByDay.orders) > 0)
+            .order_by(SalesByDay.day))
+    return [{"day": day.isoformat(), "orders": orders, "units": units, "revenue": revenue}
+            for day, orders, units, revenue in rows]
+
+
+def sales_by_status(start, end):
+    rows = (db.session.query(SalesByDay.status, func.sum(SalesByDay.orders),
+                             func.sum(SalesByDay.units), func.sum(SalesByDay.revenue))
+            .filter(SalesByDay.day >= start, SalesByDay.day <= end)
+            .group_by(SalesByDay.status)
+            .having(func.sum(SalesByDay.orders) > 0)
+            .order_by(SalesByDay.status))
+    return [{"status": status, "orders": orders, "units": units, "revenue": revenue}
+            for status, orders, units, revenue in rows]
+
+
+# Best sellers by revenue, with the product names looked up in one query
+def top_products(start, end, limit):
+    revenue = func.sum(SalesByProduct.revenue)
+    rows = (db.session.query(SalesByProduct.product_id, func.sum(SalesByProduct.units), revenue)
+            .filter(SalesByProduct.day >= start, SalesByProduct.day <= end)
+            .group_by(SalesByProduct.product_id)
+            .having(func.sum(SalesByProduct.units) > 0)
+            .order_by(revenue.desc(), SalesByProduct.product_id)
+            .limit(limit).all())
+    names = dict(db.session.query(Product.product_id, Product.name)
+                 .filter(Product.product_id.in_([row[0] for row in rows])))
+    return [{"product_id": product_id, "name": names.get(product_id), "units": units, "revenue": revenue}
+            for product_id, units, revenue in rows]
+
+
+def sales_by_category(start, end):
+    revenue = func.sum(SalesByCategory.revenue)
+    rows = (db.session.query(SalesByCategory.category, func.sum(SalesByCategory.units), revenue)
+            .filter(SalesByCategory.day >= start, SalesByCategory.day <= end)
+            .group_by(SalesByCategory.category)
+            .having(func.sum(SalesByCategory.units) > 0)
+            .order_by(revenue.desc(), SalesByCategory.category))
+    return [{"category": category, "units": units, "revenue": revenue} for category, units, revenue in rows]
@@ -1,20 +1,27 @@
 from flask import Flask
 from flask_cors import CORS  # Import CORS
 from config import Config
-from database import db
+from database import db, init_db
 from routes import routes  # Import the blueprint directly
-from flask_mail import Mail 
-from flask_migrate import Migrate  # Import Migrate
+from cache import response_cache
+import notifications  # registers the email jobs
+from jobs import job_queue
+from images import image_store
+from instrumentation import instrumentation
+from compression import compression
+from passwords import password_hasher, login_throttle
 from datetime import timedelta
-from flask_jwt_extended import JWTManager  # Import JWT Manager
+from identity import jwt  # Import the JWT Manager
 
-def create_app():
+# cli=False skips Flask-Migrate and the CLI commands, whose imports (Alembic among
+# them) only `flask ...` invocations need; web workers start faster without them
+def create_app(cli=True):
     app = Flask(__name__)
     app.config.from_object(Config)
 
     # Enable CORS for specified origins and methods
     CORS(app, resources={r"/*": {"origins": ["http://127.0.0.1:5000", "http://localhost:3000"],
-                                  "methods": ["GET", "POST", "DELETE", "OPTIONS"],
+                                  "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
                                   "supports_credentials": True}})
 
     # Set secret key and session cookie configurations
@@ -23,19 +30,40 @@ def create_app():
     app.config['SESSION_COOKIE_SAMESITE'] = "None"  # Necessary for cross-site cookie sharing
     app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production
 
-    # Initialize Mail for sending emails
-    mail = Mail(app)
+    # Initialize the database
+    init_db(app)
 
-    # Initialize the database and migration
-    db.init_app(app)
-    migrate = Migrate(app, db)  # Initialize migrate with the app and db
+    # Initialize per-request SQL and timing instrumentation
+    instrumentation.init_app(app)
+
+    # Initialize ETag/304 handling and response compression
+    compression.init_app(app)
+
+    # Initialize the catalog response cache
+    response_cache.init_app(app)
 
     # Initialize JWT Manager
-    jwt = JWTManager(app)  # Set up JWT manager
+    jwt.init_app(app)  # Set up JWT manager
+
+    # Initialize the password hashing pool and failed-login throttle
+    password_hasher.init_app(app)
+    login_throttle.init_app(app)
+
+    # Initialize product image storage
+    image_store.init_app(app)
+
+    # Initialize the background job queue
+    job_queue.init_app(app)
 
     # Register the blueprint for routes
     app.register_blueprint(routes)
 
+    if cli:
+        from flask_migrate import Migrate
+        from commands import register_commands
+        Migrate(app, db)  # Initialize migrate with the app and db
+        register_commands(app)  # Register the flask CLI commands
+
     return app  # Return the created app instance
 
 if __name__ == '__main__':
@@ -0,0 +1,361 @@
+# benchmark.py
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, insert
+from database import db
+from models import User, Product, Review, Order, OrderItem
+from ratings import rebuild_ratings
+from categories import get_or_create_category, rebuild_category_counts
+from analytics import rebuild_sales_rollups
+from passwords import password_hasher
+
+# The categories and a few of the product kinds used by seed.py
+CATEGORIES = ["Men's Wear", "Women's Wear", "Jewelry", "Footwear", "Accessories", "Fitness", "Electronics",
+              "Books", "Home & Kitchen", "Home Decor", "Musical Instruments", "Pets", "Gardening", "Toys"]
+KINDS = ["Jacket", "Necklace", "Running Shoes", "T-Shirt", "Jeans", "Backpack", "Watch", "Dress", "Sneakers",
+         "Scarf", "Sweater", "Sunglasses", "Wallet", "Coat", "Headphones", "Mug", "Lamp", "Board Game"]
+ADJECTIVES = ["Vintage", "Classic", "Handmade", "Lightweight", "Casual", "Wireless", "Leather", "Silk",
+              "Canvas", "Wool", "Modern", "Cozy", "Rugged", "Stylish"]
+
+PASSWORD = "benchmark"
+STATUSES = ['pending', 'shipped', 'completed', 'cancelled']
+
+
+def _insert_batches(model, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(insert(model), batch)
+            db.session.commit()
+            batch = []
+    if batch:
+        db.session.execute(insert(model), batch)
+        db.session.commit()
+
+
+# Add synthetic users, products, orders and reviews with bulk INSERTs. Every
+# benchmark user is bench<N>@example.com with the password "benchmark".
+def seed_data(products=10000, users=1000, orders=10000, reviews=10000, batch_size=5000, rng=None):
+    rng = rng or random.Random(42)
+    now = datetime.utcnow()
+    password_hash = password_hasher.hash(PASSWORD)  # hashed once, shared by every user
+    first_user = (db.session.query(func.max(User.user_id)).scalar() or 0) + 1
+    first_product = (db.session.query(func.max(Product.product_id)).scalar() or 0) + 1
+    first_order = (db.session.query(func.max(Order.order_id)).scalar() or 0) + 1
+
+    _insert_batches(User, ({
+        'user_id': first_user + i,
+        'name': f"Bench User {first_user + i}",
+        'email': f"bench{first_user + i}@example.com",
+        'phone_number': rng.randint(100000000, 999999999),
+        'password_hash': password_hash,
+        'role': 'user',
+        'created_at': now,
+    } for i in range(users)), batch_size)
+
+    filed = {name: get_or_create_category(name) for name in CATEGORIES}
+
+    def product_row(product_id):
+        row = {
+            'product_id': product_id,
+            'name': f"{rng.choice(ADJECTIVES)} {rng.choice(KINDS)} {product_id}",
+            'description': f"A {rng.choice(ADJECTIVES).lower()} piece for everyday use.",
+            'price': round(rng.uniform(5, 300), 2),
+            'stock_quantity': rng.randint(1000, 100000),
+        }
+        category = filed[rng.choice(CATEGORIES)]
+        row.update(category_id=category.category_id, category=category.name,
+                   created_at=now - timedelta(minutes=rng.randint(0, 525600)))
+        return row
+    _insert_batches(Product, (product_row(first_product + i) for i in range(products)), batch_size)
+
+    user_ids = range(first_user, first_user + users)
+    product_ids = range(first_product, first_product + products)
+
+    order_rows, item_rows = [], []
+    for i in range(orders):
+        order_id = first_order + i
+        total = 0
+        for product_id in rng.sample(product_ids, min(rng.randint(1, 3), products)):
+            quantity = rng.randint(1, 3)
+            price = round(rng.uniform(5, 300), 2)
+            total += price * quantity
+            item_rows.append({'order_id': order_id, 'product_id': product_id,
+                              'quantity': quantity, 'price_at_purchase': price})
+        order_rows.append({
+            'order_id': order_id,
+            'user_id': rng.choice(user_ids),
+            'total_amount': round(total, 2),
+            'status': rng.choice(STATUSES),
+            'shipping_address': f"{rng.randint(1, 999)} Bench Street",
+            'created_at': now - timedelta(minutes=rng.randint(0, 525600)),
+        })
+        if len(order_rows) >= batch_size:
+            _insert_batches(Order, order_rows, batch_size)
+            _insert_batches(OrderItem, item_rows, batch_size)
+            order_rows, item_rows = [], []
+    _insert_batches(Order, order_rows, batch_size)
+    _insert_batches(OrderItem, item_rows, batch_size)
+
+    _insert_batches(Review, ({
+        'product_id': rng.choice(product_ids),
+        'user_id': rng.choice(user_ids),
+        'rating': rng.randint(1, 5),
+        'review_text': "Synthetic benchmark review.",
+        'status': 'approved',
+        'created_at': now - timedelta(minutes=rng.randint(0, 525600)),
+    } for _ in range(reviews)), batch_size)
+
+    rebuild_ratings(batch_size)
+    rebuild_category_counts()
+    rebuild_sales_rollups(batch_size)  # The orders were inserted without their rollup jobs
+    return {'users': users, 'products': products, 'orders': orders, 'reviews': reviews}
+
+
+# Counts the SQL statements issued on behalf of the current thread's request
+class QueryCounter:
+    def __init__(self):
+        self._local = threading.local()
+
+    def _count(self, *args):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def install(self):
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', self._count)
+
+    def uninstall(self):
+        for engine in db.engines.values():
+            event.remove(engine, 'before_cursor_execute', self._count)
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+class Results:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)  # endpoint -> [(seconds, queries)]
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, seconds, queries, ok):
+        with self._lock:
+            self.samples[endpoint].append((seconds, queries))
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+def _percentile(values, p):
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+# One simulated shopper: log in, then browse, view products and check out in a loop
+class VirtualUser:
+    def __init__(self, client, email, product_ids, results, counter, rng):
+        self.client = client
+        self.email = email
+        self.product_ids = product_ids
+        self.results = results
+        self.counter = counter
+        self.rng = rng
+        self.headers = {}
+        self.cursor = None
+
+    def call(self, endpoint, method, url, **kwargs):
+        self.counter.reset()
+        started = time.perf_counter()
+        response = self.client.open(url, method=method, **kwargs)
+        elapsed = time.perf_counter() - started
+        self.results.record(endpoint, elapsed, self.counter.count, response.status_code < 400)
+        return response
+
+    def login(self):
+        response = self.call('POST /login', 'POST', '/login', json={'email': self.email, 'password': PASSWORD})
+        if response.status_code == 200:
+            self.headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    def browse(self):
+        url = '/products?limit=20' + (f'&cursor={self.cursor}' if self.cursor else '')
+        response = self.call('GET /products', 'GET', url)
+        body = response.get_json(silent=True) or {}
+        self.cursor = body.get('next_cursor') if self.rng.random() < 0.7 else None
+
+    def view_product(self):
+        product_id = self.rng.choice(self.product_ids)
+        self.call('GET /products/<id>', 'GET', f'/products/{product_id}')
+        self.call('GET /products/<id>/reviews', 'GET', f'/products/{product_id}/reviews')
+
+    def place_order(self):
+        items = [{'product_id': pid, 'quantity': 1}
+                 for pid in self.rng.sample(self.product_ids, min(self.rng.randint(1, 3), len(self.product_ids)))]
+        self.call('POST /orders', 'POST', '/orders', headers=self.headers,
+                  json={'items': items, 'shipping_address': "1 Bench Street"})
+
+    def get_orders(self):
+        self.call('GET /orders', 'GET', '/orders?limit=20', headers=self.headers)
+
+    def step(self):
+        scenario = self.rng.choices(
+            [self.browse, self.view_product, self.place_order, self.get_orders],
+            weights=[50, 30, 10, 10])[0]
+        scenario()
+
+
+def _sample_product_ids(limit):
+    return [pid for (pid,) in db.session.query(Product.product_id).order_by(func.random()).limit(limit)]
+
+
+# Drive the app in-process with concurrent virtual users for `duration` seconds
+def run_load(app, users=8, duration=30, seed=42):
+    with app.app_context():
+        emails = [email for (email,) in db.session.query(User.email)
+                  .filter(User.email.like('bench%@example.com')).limit(users)]
+        product_ids = _sample_product_ids(5000)
+        counter = QueryCounter()
+        counter.install()
+    if not emails or not product_ids:
+        raise RuntimeError("No benchmark data found, run `flask bench-seed` first")
+
+    results = Results()
+    deadline = time.monotonic() + duration
+
+    def worker(i):
+        shopper = VirtualUser(app.test_client(), emails[i % len(emails)], product_ids, results, counter,
+                              random.Random(seed + i))
+        shopper.login()
+        while time.monotonic() < deadline:
+            shopper.step()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        counter.uninstall()
+    return summarize(results, elapsed, users)
+
+
+def summarize(results, elapsed, users):
+    report = {'users': users, 'duration': round(elapsed, 2), 'endpoints': {}}
+    for endpoint, samples in sorted(results.samples.items()):
+        latencies = sorted(seconds * 1000 for seconds, _ in samples)
+        report['endpoints'][endpoint] = {
+            'requests': len(samples),
+            'errors': results.errors[endpoint],
+            'throughput': round(len(samples) / elapsed, 2),
+            'p50_ms': round(_percentile(latencies, 50), 2),
+            'p95_ms': round(_percentile(latencies, 95), 2),
+            'p99_ms': round(_percentile(latencies, 99), 2),
+            'queries': round(sum(queries for _, queries in samples) / len(samples), 2),
+        }
+    return report
+
+
+# Compare a report against a stored baseline. An endpoint regresses when its p95
+# latency grows by more than `tolerance` (a fraction) or it issues at least half a
+# query more per request (cache hit rates make the average wobble a little).
+def compare(report, baseline, tolerance=0.2):
+    regressions = []
+    for endpoint, current in report['endpoints'].items():
+        previous = baseline['endpoints'].get(endpoint)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['queries'] >= previous['queries'] + 0.5:
+            regressions.append(f"{endpoint}: queries {previous['queries']} -> {current['queries']}")
+    return regressions
+
+
+def format_report(report, baseline=None):
+    lines = [f"{'endpoint':<28}{'reqs':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}"]
+    for endpoint, row in report['endpoints'].items():
+        lines.append(f"{endpoint:<28}{row['requests']:>8}{row['errors']:>6}{row['throughput']:>9}"
+                     f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['queries']:>9}")
+        previous = baseline and baseline['endpoints'].get(endpoint)
+        if previous:
+            lines.append(f"{'  baseline':<28}{previous['requests']:>8}{previous['errors']:>6}"
+                         f"{previous['throughput']:>9}{previous['p50_ms']:>9}{previous['p95_ms']:>9}"
+                         f"{previous['p99_ms']:>9}{previous['queries']:>9}")
+    return "\n".join(lines)
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+# Times one cold start in the interpreter it runs in: importing the app module,
+# create_app() and the first request, in milliseconds
+_STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(cli=sys.argv[1] == 'cli')
+created = time.perf_counter()
+status = app.test_client().get(sys.argv[2]).status_code
+served = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'create_app_ms': (created - imported) * 1000,
+                  'first_request_ms': (served - created) * 1000, 'status': status}))
+"""
+
+
+# Start the app `runs` times in fresh interpreters, as a web worker (cli=False) and
+# as the flask CLI loads it, and report the median and worst of each phase.
+# total_ms is the wall time from spawning the process to its exit.
+def measure_startup(runs=5, path='/health/ready'):
+    server_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, JOB_WORKERS_IN_PROCESS='0')
+    report = {'runs': runs, 'path': path, 'modes': {}}
+    for mode in ('web', 'cli'):
+        samples = defaultdict(list)
+        for _ in range(runs):
+            started = time.perf_counter()
+            result = subprocess.run([sys.executable, '-c', _STARTUP_SCRIPT, mode, path], cwd=server_dir, env=env,
+                                    capture_output=True, text=True)
+            total = (time.perf_counter() - started) * 1000
+            if result.returncode != 0:
+                raise RuntimeError(f"Startup run failed:\n{result.stderr}")
+            timings = json.loads(result.stdout.strip().splitlines()[-1])
+            if timings.pop('status') >= 500:
+                raise RuntimeError(f"GET {path} failed during the startup run")
+            timings['total_ms'] = total
+            for phase, value in timings.items():
+                samples[phase].append(value)
+        report['modes'][mode] = {
+            phase: {'median_ms': round(statistics.median(values), 1), 'max_ms': round(max(values), 1)}
+            for phase, values in samples.items()
+        }
+    return report
+
+
+def format_startup_report(report):
+    lines = [f"{'mode':<6}{'phase':<18}{'median':>10}{'max':>10}"]
+    for mode, phases in report['modes'].items():
+        for phase, row in phases.items():
+            lines.append(f"{mode:<6}{phase:<18}{row['median_ms']:>10}{row['max_ms']:>10}")
+    return "\n".join(lines)
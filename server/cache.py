@@ -0,0 +1,285 @@
+# cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, g, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database import has_replicas, pinned_to_primary
+
+try:
+    import redis
+except ImportError:  # Optional dependency, only needed for CACHE_BACKEND = 'redis'
+    redis = None
+
+
+# In-process LRU cache with per-entry expiry
+class MemoryCache:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    # Counters never expire or get evicted; they hold cache generations
+    def get_counter(self, key):
+        return self._counters.get(key, 0)
+
+    def get_counters(self, keys):
+        return [self._counters.get(key, 0) for key in keys]
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Redis (or any Redis-protocol server) backend, shared by every worker
+class RedisCache:
+    def __init__(self, url, prefix='trendify:'):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND is 'redis' but the redis package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self._loads(self.client.get(self.prefix + key))
+
+    def set(self, key, value, ttl):
+        body, etag, last_modified, rows = value
+        rows = ','.join(f'{row}={generation}' for row, generation in rows)
+        header = f"{etag}\n{last_modified or ''}\n{rows}\n".encode()
+        self.client.set(self.prefix + key, header + body, ex=int(ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def get_counter(self, key):
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def get_counters(self, keys):
+        return [int(value or 0) for value in self.client.mget([self.prefix + key for key in keys])]
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+    @staticmethod
+    def _loads(raw):
+        if raw is None:
+            return None
+        etag, last_modified, rows, body = raw.split(b'\n', 3)
+        rows = [row.rsplit('=', 1) for row in rows.decode().split(',') if row]
+        return body, etag.decode(), last_modified.decode() or None, [(row, int(generation)) for row, generation in rows]
+
+
+# Stores rendered JSON responses keyed by namespace generation + URL. Bumping a
+# namespace's generation (after a commit touching its models) orphans every entry
+# in it at once; orphaned entries age out through LRU eviction or their TTL.
+# Writes that only change some rows' own values (e.g. stock taken by an order)
+# bump those rows' generations instead: entries record the generations of the
+# rows they show (depends_on) and are only served while those are unchanged.
+class ResponseCache:
+    def __init__(self):
+        self.backend = None
+        self.default_ttl = 60
+        self.watched = {}  # model class -> namespace
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        if backend == 'redis':
+            self.backend = RedisCache(app.config['CACHE_REDIS_URL'])
+        elif backend == 'memory':
+            self.backend = MemoryCache(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        else:
+            self.backend = None  # caching disabled
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 60)
+        app.extensions['response_cache'] = self
+
+    def watch(self, model, namespace):
+        self.watched[model] = namespace
+
+    def invalidate(self, namespace):
+        if self.backend is not None:
+            self.backend.incr(f'{namespace}:generation')
+
+    def generation(self, namespace):
+        return self.backend.get_counter(f'{namespace}:generation')
+
+    # Row generations, plus a namespace-wide count of row bumps that tells a
+    # response rendered while rows changed not to store itself
+    def invalidate_rows(self, namespace, row_ids):
+        if self.backend is not None:
+            self.backend.incr(f'{namespace}:rows')
+            for row_id in row_ids:
+                self.backend.incr(f'{namespace}:row:{row_id}')
+
+    def rows_changed(self, namespace):
+        return self.backend.get_counter(f'{namespace}:rows')
+
+    def row_keys(self, namespace, row_ids):
+        return [f'{namespace}:row:{row_id}' for row_id in row_ids]
+
+    def row_generations(self, rows):
+        return list(zip(rows, self.backend.get_counters(rows)))
+
+    # Whether none of the rows an entry was stored with changed since
+    def rows_current(self, rows):
+        return not rows or self.row_generations([row for row, _ in rows]) == list(rows)
+
+    # Called by a cached view with the ids of the rows its response shows
+    def depends_on(self, namespace, row_ids):
+        g.setdefault('cache_rows', []).extend(self.row_keys(namespace, row_ids))
+
+    # replica=True keys bodies read from a read replica apart from primary reads
+    def key_for(self, namespace, replica=False):
+        generation = self.generation(namespace)
+        query = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+        return f'{namespace}:{generation}:{"replica:" if replica else ""}{request.path}?{query}'
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, body, etag, ttl=None, last_modified=None, rows=()):
+        self.backend.set(key, (body, etag, last_modified, rows), ttl or self.default_ttl)
+
+
+response_cache = ResponseCache()
+
+
+def _not_modified(etag):
+    # If-None-Match uses the weak comparison; compressed responses carry W/ ETags
+    return request.if_none_match.contains_weak(etag)
+
+
+def _json_response(body, etag, status=200, last_modified=None):
+    response = Response(body, status=status, mimetype='application/json')
+    response.set_etag(etag)
+    if last_modified:
+        response.headers['Last-Modified'] = last_modified
+    response.headers['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return response
+
+
+# Read-through cache for GET routes that render JSON. Successful responses are
+# stored with a strong ETag so repeat clients get 304 Not Modified.
+# With read replicas, a body read from a replica may lag the primary: it is kept
+# apart from primary reads and only for REPLICA_STICKY_SECONDS, and requests
+# pinned to the primary (read-your-writes) skip the cache altogether.
+def cached_response(namespace, ttl=None):
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if response_cache.backend is None or pinned_to_primary():
+                return f(*args, **kwargs)
+
+            replica = has_replicas()
+            key = response_cache.key_for(namespace, replica)
+            hit = response_cache.get(key)
+            if hit is not None:
+                body, etag, last_modified, rows = hit
+                if not response_cache.rows_current(rows):
+                    hit = None
+            if hit is None:
+                rows_changed = response_cache.rows_changed(namespace)
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200 or pinned_to_primary():
+                    return response
+                body = response.get_data()
+                etag = hashlib.sha1(body).hexdigest()
+                last_modified = response.headers.get('Last-Modified')
+                rows = response_cache.row_generations(g.pop('cache_rows', []))
+                if response_cache.rows_changed(namespace) == rows_changed:
+                    entry_ttl = ttl
+                    if replica:
+                        entry_ttl = min(ttl or response_cache.default_ttl, current_app.config['REPLICA_STICKY_SECONDS'])
+                    response_cache.set(key, body, etag, entry_ttl, last_modified, rows)
+
+            if _not_modified(etag):
+                response = _json_response(b'', etag, status=304, last_modified=last_modified)
+                response.headers.pop('Content-Type', None)
+                return response
+            return _json_response(body, etag, last_modified=last_modified)
+        return wrapper
+    return decorator
+
+
+# Session hooks: note which watched namespaces a transaction touched and bump
+# their generations once it commits, whether the write came through the ORM
+# unit of work or a bulk INSERT/UPDATE/DELETE statement. A bulk UPDATE run with
+# execution_options(cache_rows=[ids]) only touches those rows (see ResponseCache).
+def _touch(session, namespace):
+    session.info.setdefault('dirty_cache_namespaces', set()).add(namespace)
+
+
+def _touch_rows(session, namespace, row_ids):
+    session.info.setdefault('dirty_cache_rows', {}).setdefault(namespace, set()).update(row_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(session, flush_context):
+    # An object that only gained or lost related objects (e.g. a product getting
+    # an order item) is in session.dirty without any of its own columns changing
+    changed = [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+    for obj in list(session.new) + changed + list(session.deleted):
+        namespace = response_cache.watched.get(type(obj))
+        if namespace:
+            _touch(session, namespace)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        namespace = mapper is not None and response_cache.watched.get(mapper.class_)
+        row_ids = orm_execute_state.execution_options.get('cache_rows')
+        if namespace and row_ids is not None and orm_execute_state.is_update:
+            _touch_rows(orm_execute_state.session, namespace, row_ids)
+        elif namespace:
+            _touch(orm_execute_state.session, namespace)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    for namespace in session.info.pop('dirty_cache_namespaces', ()):
+        response_cache.invalidate(namespace)
+    for namespace, row_ids in session.info.pop('dirty_cache_rows', {}).items():
+        response_cache.invalidate_rows(namespace, row_ids)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_on_rollback(session, previous_transaction):
+    session.info.pop('dirty_cache_namespaces', None)
+    session.info.pop('dirty_cache_rows', None)
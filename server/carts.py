@@ -0,0 +1,171 @@
+# carts.py
+import json
+import secrets
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy.orm import load_only
+from database import db
+from models import Cart, Product
+from cache import response_cache
+from serializers import dumps
+
+
+class CartError(ValueError):
+    pass
+
+
+def find_cart(user_id=None, token=None):
+    if user_id is not None:
+        return Cart.query.filter_by(user_id=user_id).first()
+    if token:
+        return Cart.query.filter_by(token=token, user_id=None).first()
+    return None
+
+
+def create_cart(user_id=None):
+    cart = Cart(user_id=user_id, token=None if user_id else secrets.token_urlsafe(32), items={})
+    db.session.add(cart)
+    return cart
+
+
+def _touch(cart, items):
+    cart.items = items  # reassigned, not mutated, so the JSON column is flagged dirty
+    cart.updated_at = datetime.utcnow()
+
+
+def _load(product_ids):
+    return {p.product_id: p for p in Product.query
+            .options(load_only(Product.product_id, Product.name, Product.price, Product.stock_quantity))
+            .filter(Product.product_id.in_(product_ids))}
+
+
+# Set a line's quantity (or add to it), remembering the price the shopper saw
+def set_item(cart, product_id, quantity, add=False):
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < (1 if add else 0):
+        raise CartError("quantity must be a positive integer")
+    items = dict(cart.items)
+    key = str(product_id)
+    if add and key in items:
+        quantity += items[key][0]
+    if quantity == 0:
+        items.pop(key, None)
+        _touch(cart, items)
+        return
+
+    max_quantity = current_app.config['CART_MAX_QUANTITY']
+    if quantity > max_quantity:
+        raise CartError(f"At most {max_quantity} of one product per cart")
+    if key not in items and len(items) >= current_app.config['CART_MAX_ITEMS']:
+        raise CartError(f"At most {current_app.config['CART_MAX_ITEMS']} products per cart")
+    product = _load([product_id]).get(product_id)
+    if product is None:
+        raise CartError(f"Product with ID {product_id} does not exist")
+    items[key] = [quantity, str(product.price)]
+    _touch(cart, items)
+
+
+def remove_item(cart, product_id):
+    items = dict(cart.items)
+    if items.pop(str(product_id), None) is not None:
+        _touch(cart, items)
+
+
+# Move a guest cart's lines into a user's cart (quantities add up) and drop it
+def merge_carts(target, source):
+    items = dict(target.items)
+    max_quantity = current_app.config['CART_MAX_QUANTITY']
+    for key, (quantity, price) in source.items.items():
+        if key in items:
+            items[key] = [min(items[key][0] + quantity, max_quantity), price]
+        elif len(items) < current_app.config['CART_MAX_ITEMS']:
+            items[key] = [quantity, price]
+    _touch(target, items)
+    db.session.delete(source)
+
+
+def quantities(cart):
+    return {int(key): quantity for key, (quantity, _) in cart.items.items()}
+
+
+# The price of each line as last shown to the shopper
+def seen_prices(cart):
+    return {int(key): Decimal(price) for key, (_, price) in cart.items.items()}
+
+
+def _summarize(cart):
+    products = _load(quantities(cart)) if cart.items else {}
+    lines, price_changes, unavailable = [], [], []
+    subtotal = Decimal('0')
+    for key, (quantity, seen_price) in sorted(cart.items.items(), key=lambda entry: int(entry[0])):
+        product_id = int(key)
+        product = products.get(product_id)
+        if product is None:
+            unavailable.append({"product_id": product_id, "requested": quantity, "available": 0})
+            continue
+        if Decimal(seen_price) != product.price:
+            price_changes.append({"product_id": product_id, "old_price": Decimal(seen_price),
+                                  "new_price": product.price})
+        if product.stock_quantity < quantity:
+            unavailable.append({"product_id": product_id, "requested": quantity,
+                                "available": product.stock_quantity})
+        line_total = product.price * quantity
+        subtotal += line_total
+        lines.append({"product_id": product_id, "name": product.name, "price": product.price,
+                      "quantity": quantity, "line_total": line_total})
+    return {
+        "items": lines,
+        "item_count": sum(line['quantity'] for line in lines),
+        "subtotal": subtotal,
+        "changes": {"price_changed": price_changes, "unavailable": unavailable},
+    }
+
+
+# Price and stock check for the whole cart in one query. The result is cached
+# under the cart's version and the catalog generation, and with the generations
+# of the cart's products, so it is recomputed only after the cart or one of its
+# products changed (stock included). Generations are per process with the
+# memory backend, so a summary can miss another worker's price change; checkout
+# re-checks the prices it charges, and fresh=True bypasses the cached copy.
+# Call it on a flushed cart.
+def summarize(cart, fresh=False):
+    if response_cache.backend is None:
+        return json.loads(dumps(_summarize(cart)))
+    key = f'cart:{cart.cart_id}:{cart.version}:{response_cache.generation("catalog")}'
+    hit = None if fresh else response_cache.get(key)
+    if hit is not None and response_cache.rows_current(hit[-1]):
+        return json.loads(hit[0])
+    rows = response_cache.row_generations(response_cache.row_keys('catalog', quantities(cart)))
+    summary = json.loads(dumps(_summarize(cart)))
+    response_cache.set(key, dumps(summary), '', current_app.config['CART_SUMMARY_TTL'], rows=rows)
+    return summary
+
+
+def summarize_empty():
+    return {"items": [], "item_count": 0, "subtotal": 0,
+            "changes": {"price_changed": [], "unavailable": []}}
+
+
+def has_changes(summary):
+    return bool(summary['changes']['price_changed'] or summary['changes']['unavailable'])
+
+
+# Record the current prices as seen, after the shopper was shown the changes
+def acknowledge_prices(cart, summary):
+    items = dict(cart.items)
+    for change in summary['changes']['price_changed']:
+        key = str(change['product_id'])
+        items[key] = [items[key][0], str(change['new_price'])]
+    _touch(cart, items)
+
+
+def clear(cart):
+    _touch(cart, {})
+
+
+# Delete guest carts nobody touched for `older_than_days`
+def purge_guest_carts(older_than_days):
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    deleted = Cart.query.filter(Cart.updated_at < cutoff, Cart.user_id.is_(None)).delete()
+    db.session.commit()
+    return deleted
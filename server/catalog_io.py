@@ -0,0 +1,192 @@
+# catalog_io.py
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import insert, or_, update
+from sqlalchemy.orm import load_only
+from database import db
+from models import Product
+from serializers import dumps
+from categories import slugify, get_or_create_category, rebuild_category_counts
+
+FORMATS = ('csv', 'jsonl')
+
+# Columns read on import and written on export, in CSV header order
+COLUMNS = ['product_id', 'sku', 'name', 'description', 'price', 'stock_quantity', 'category', 'image_url']
+REQUIRED = ['name', 'description', 'price', 'stock_quantity', 'category']
+
+
+class ImportResult:
+    def __init__(self, max_errors):
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row_number, "error": message})
+
+    def to_dict(self):
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors)
+        }
+
+
+# Yield (row number, dict) pairs from a binary stream without reading it all into memory
+def parse_rows(stream, fmt):
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if fmt == 'csv':
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            yield row_number, row
+    else:
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield row_number, row
+
+
+def clean_row(row):
+    if not isinstance(row, dict):
+        raise ValueError("Row is not an object")
+    missing = [field for field in REQUIRED if row.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+    try:
+        price = Decimal(str(row['price']))
+    except InvalidOperation:
+        raise ValueError("price must be a number")
+    if not price.is_finite():
+        raise ValueError("price must be a number")
+    try:
+        stock_quantity = int(row['stock_quantity'])
+    except (TypeError, ValueError):
+        raise ValueError("stock_quantity must be an integer")
+    if price < 0 or stock_quantity < 0:
+        raise ValueError("price and stock_quantity must not be negative")
+    slugify(str(row['category']))  # rejects names with nothing to file them under
+
+    return {
+        'sku': str(row['sku']).strip() if row.get('sku') not in (None, '') else None,
+        'name': str(row['name']).strip(),
+        'description': str(row['description']),
+        'price': price,
+        'stock_quantity': stock_quantity,
+        'category': str(row['category']).strip(),
+        'image_url': row.get('image_url') or None,
+    }
+
+
+def _upsert_batch(batch, result):
+    # Match the batch against existing products by SKU, falling back to name, in one query
+    skus = {values['sku'] for _, values in batch if values['sku']}
+    names = {values['name'] for _, values in batch if not values['sku']}
+    existing = (Product.query
+                .options(load_only(Product.product_id, Product.sku, Product.name))
+                .filter(or_(Product.sku.in_(skus), Product.name.in_(names))))
+    by_sku, by_name = {}, {}
+    for product in existing:
+        if product.sku:
+            by_sku[product.sku] = product.product_id
+        by_name.setdefault(product.name, product.product_id)
+
+    # File every row under its normalized category, adding categories seen for the first time
+    filed = {name: get_or_create_category(name) for name in {values['category'] for _, values in batch}}
+    for _, values in batch:
+        category = filed[values['category']]
+        values.update(category_id=category.category_id, category=category.name)
+
+    inserts, updates = {}, {}
+    for _, values in batch:
+        key = ('sku', values['sku']) if values['sku'] else ('name', values['name'])
+        product_id = by_sku.get(values['sku']) if values['sku'] else by_name.get(values['name'])
+        if product_id is None:
+            inserts[key] = values  # the last row wins when a key repeats within a batch
+        else:
+            updates[product_id] = dict(values, product_id=product_id)
+            if not values['sku']:
+                del updates[product_id]['sku']  # keep the SKU of a product matched by name
+
+    if inserts:
+        db.session.execute(insert(Product), list(inserts.values()))
+    if updates:
+        db.session.execute(update(Product), list(updates.values()))
+    db.session.commit()
+    result.inserted += len(inserts)
+    result.updated += len(updates)
+
+
+# Validate and upsert rows in batches of executemany statements, committing each batch.
+# Bad rows are reported in the result instead of aborting the import.
+def import_products(rows, batch_size=1000, max_errors=1000):
+    result = ImportResult(max_errors)
+    batch = []
+    for row_number, row in rows:
+        try:
+            batch.append((row_number, clean_row(row)))
+        except ValueError as e:
+            result.error(row_number, str(e))
+            continue
+        if len(batch) >= batch_size:
+            _flush(batch, result)
+            batch = []
+    if batch:
+        _flush(batch, result)
+    if result.inserted or result.updated:
+        rebuild_category_counts()
+    return result
+
+
+def _flush(batch, result):
+    try:
+        _upsert_batch(batch, result)
+    except Exception as e:
+        db.session.rollback()
+        # A batch failed as a whole (e.g. a constraint violation); retry row by row
+        # so the good rows still land and the bad one is reported
+        if len(batch) == 1:
+            result.error(batch[0][0], str(getattr(e, 'orig', e)))
+            return
+        for entry in batch:
+            _flush([entry], result)
+
+
+# Yield the catalog as CSV or JSON Lines text chunks, one batch of products at a time
+def export_products(fmt, batch_size=1000):
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(COLUMNS)
+        yield buffer.getvalue()
+
+    last_id = 0
+    while True:
+        products = (Product.query
+                    .options(load_only(*[getattr(Product, c) for c in COLUMNS]))
+                    .filter(Product.product_id > last_id)
+                    .order_by(Product.product_id)
+                    .limit(batch_size).all())
+        if not products:
+            return
+        last_id = products[-1].product_id
+
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerows([[getattr(p, c) for c in COLUMNS] for p in products])
+            yield buffer.getvalue()
+        else:
+            yield b''.join(dumps({c: getattr(p, c) for c in COLUMNS}) + b'\n' for p in products).decode()
+        db.session.expunge_all()
@@ -0,0 +1,137 @@
+# categories.py
+import re
+from sqlalchemy import and_, case, func, or_, update
+from database import db
+from models import Category, Product
+
+
+def slugify(name):
+    slug = re.sub(r'[^a-z0-9]+', '-', re.sub(r"['’]", '', name.lower())).strip('-')
+    if not slug:
+        raise ValueError("Category name must contain letters or digits")
+    return slug
+
+
+# Find a category by the slug of its name, adding it (at the top level unless a
+# parent is given) when there is none yet
+def get_or_create_category(name, parent_id=None):
+    name = name.strip()
+    slug = slugify(name)
+    category = Category.query.filter_by(slug=slug).first()
+    if category is None:
+        category = Category(name=name, slug=slug, parent_id=parent_id)
+        db.session.add(category)
+        db.session.flush()
+    return category
+
+
+# The category a product write refers to: {'category_id': ...} or a {'category': name}
+def resolve_category(data):
+    if data.get('category_id') is not None:
+        category = db.session.get(Category, data['category_id'])
+        if category is None:
+            raise ValueError(f"Category with ID {data['category_id']} does not exist")
+        return category
+    if not isinstance(data.get('category'), str):
+        raise ValueError("category must be a string")
+    return get_or_create_category(data['category'])
+
+
+def file_product(product, category):
+    product.category_id = category.category_id
+    product.category = category.name
+
+
+def _adjust(category_id, products=0, in_stock=0):
+    db.session.execute(
+        update(Category)
+        .where(Category.category_id == category_id)
+        .values(product_count=Category.product_count + products,
+                in_stock_count=Category.in_stock_count + in_stock)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Add (sign=1) or take out (sign=-1) one product from its category's counts
+def count_product(category_id, stock_quantity, sign):
+    _adjust(category_id, sign, sign if stock_quantity > 0 else 0)
+
+
+# Keep the counts in step with an admin edit of a product's category or stock
+def product_changed(product, old_category_id, old_stock_quantity):
+    if product.category_id != old_category_id:
+        count_product(old_category_id, old_stock_quantity, -1)
+        count_product(product.category_id, product.stock_quantity, 1)
+    elif (old_stock_quantity > 0) != (product.stock_quantity > 0):
+        _adjust(product.category_id, in_stock=1 if product.stock_quantity > 0 else -1)
+
+
+# Call after stock for these products moved in the current transaction: products
+# that sold out (or, with restocked=True, came back from zero) move their
+# category's in-stock count. Reads the rows this transaction just updated, and
+# only writes a category when one actually crossed zero.
+def sync_in_stock_counts(quantities, restocked=False):
+    if restocked:
+        crossed = or_(*[and_(Product.product_id == product_id, Product.stock_quantity == quantity)
+                        for product_id, quantity in quantities.items()])
+    else:
+        crossed = and_(Product.product_id.in_(list(quantities)), Product.stock_quantity == 0)
+    rows = (db.session.query(Product.category_id, func.count(Product.product_id))
+            .filter(crossed)
+            .group_by(Product.category_id)
+            .order_by(Product.category_id).all())
+    for category_id, count in rows:
+        _adjust(category_id, in_stock=count if restocked else -count)
+
+
+# Recompute every category's counts from the products table, e.g. after a bulk import
+def rebuild_category_counts():
+    db.session.execute(update(Category).values(product_count=0, in_stock_count=0))
+    rows = (db.session.query(
+                Product.category_id,
+                func.count(Product.product_id),
+                func.sum(case((Product.stock_quantity > 0, 1), else_=0)))
+            .group_by(Product.category_id).all())
+    if rows:
+        db.session.execute(update(Category), [
+            {'category_id': category_id, 'product_count': count, 'in_stock_count': in_stock}
+            for category_id, count, in_stock in rows
+        ])
+    db.session.commit()
+    return len(rows)
+
+
+def _node(category):
+    return {"category_id": category.category_id, "name": category.name, "slug": category.slug,
+            "parent_id": category.parent_id, "product_count": category.product_count,
+            "in_stock_count": category.in_stock_count, "children": []}
+
+
+# The whole tree in one query. Each category's counts include its subcategories.
+# Returns (top-level nodes, nodes by slug).
+def category_tree():
+    categories = Category.query.order_by(Category.name, Category.category_id).all()
+    nodes = {category.category_id: _node(category) for category in categories}
+    roots = []
+    for category in categories:
+        node = nodes[category.category_id]
+        parent = nodes.get(category.parent_id)
+        (parent['children'] if parent else roots).append(node)
+
+    def total(node):
+        for child in node['children']:
+            total(child)
+            node['product_count'] += child['product_count']
+            node['in_stock_count'] += child['in_stock_count']
+    for root in roots:
+        total(root)
+    return roots, {node['slug']: node for node in nodes.values()}
+
+
+# Ids of a category and everything below it, for filtering products
+def subtree_ids(node):
+    ids = [node['category_id']]
+    for child in node['children']:
+        ids.extend(subtree_ids(child))
+    return ids
+
@@ -0,0 +1,199 @@
+# commands.py
+import os
+import time
+import click
+from flask.cli import with_appcontext
+from flask_migrate.cli import db as db_cli
+from database import db, sync_sqlite_replicas
+from index_check import find_unindexed_filters
+from inventory import release_expired_reservations
+from ratings import rebuild_ratings
+from search import product_index
+import analytics
+import benchmark
+import carts
+from categories import rebuild_category_counts
+import catalog_io
+from images import import_fixture_images
+from identity import purge_expired_revocations
+from jobs import job_queue, purge_finished_jobs
+from idempotency import purge_expired_idempotency_keys
+
+
+@db_cli.command('check-indexes')
+@with_appcontext
+def check_indexes_command():
+    """Flag query filters in the app modules that no database index can serve."""
+    problems = find_unindexed_filters(os.path.dirname(os.path.abspath(__file__)))
+    for filename, line, function, table, columns in problems:
+        click.echo(f"{filename}:{line} {function}() filters {table} on "
+                   f"{', '.join(columns)} but no index starts with any of them")
+    if problems:
+        raise SystemExit(1)
+    click.echo("Every filtered column is covered by an index")
+
+
+def register_commands(app):
+    @app.cli.command('release-reservations')
+    def release_reservations_command():
+        """Return stock held by expired reservations to the pool."""
+        released = 0
+        while True:
+            batch = release_expired_reservations()
+            db.session.commit()
+            if not batch:
+                break
+            released += batch
+        click.echo(f"Released {released} expired reservations")
+
+    @app.cli.command('rebuild-ratings')
+    def rebuild_ratings_command():
+        """Recompute product rating aggregates from the approved reviews."""
+        updated = rebuild_ratings()
+        click.echo(f"Rebuilt rating aggregates for {updated} products")
+
+    @app.cli.command('rebuild-analytics')
+    def rebuild_analytics_command():
+        """Recompute the sales rollup tables from the order items. Stop the job workers first."""
+        rows = analytics.rebuild_sales_rollups()
+        click.echo(f"Rebuilt sales rollups: {rows} rows")
+
+    @app.cli.command('rebuild-category-counts')
+    def rebuild_category_counts_command():
+        """Recompute the per-category product and in-stock counts from the products table."""
+        updated = rebuild_category_counts()
+        click.echo(f"Rebuilt counts for {updated} categories")
+
+    @app.cli.command('import-products')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(catalog_io.FORMATS), help='Defaults to the file extension.')
+    def import_products_command(path, fmt):
+        """Upsert products from a CSV or JSON Lines file."""
+        fmt = fmt or ('csv' if path.endswith('.csv') else 'jsonl')
+        with open(path, 'rb') as f:
+            result = catalog_io.import_products(
+                catalog_io.parse_rows(f, fmt),
+                batch_size=app.config['IMPORT_BATCH_SIZE'],
+                max_errors=app.config['IMPORT_MAX_ERRORS']
+            )
+        product_index.reset()
+        for error in result.errors:
+            click.echo(f"row {error['row']}: {error['error']}", err=True)
+        click.echo(f"Inserted {result.inserted}, updated {result.updated}, failed {result.failed}")
+
+    @app.cli.command('import-images')
+    @click.argument('directory', type=click.Path(exists=True, file_okay=False))
+    def import_images_command(directory):
+        """Attach <product_id>.<ext> image files from DIRECTORY to those products."""
+        attached = import_fixture_images(directory)
+        click.echo(f"Attached {attached} images; run `flask run-jobs --once` to generate their variants")
+
+    @app.cli.command('export-products')
+    @click.argument('path', type=click.Path(dir_okay=False, writable=True))
+    @click.option('--format', 'fmt', type=click.Choice(catalog_io.FORMATS), help='Defaults to the file extension.')
+    def export_products_command(path, fmt):
+        """Write every product to a CSV or JSON Lines file."""
+        fmt = fmt or ('csv' if path.endswith('.csv') else 'jsonl')
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            for chunk in catalog_io.export_products(fmt):
+                f.write(chunk)
+        click.echo(f"Exported products to {path}")
+
+    @app.cli.command('purge-revocations')
+    def purge_revocations_command():
+        """Delete revocation entries for tokens that have expired anyway."""
+        deleted = purge_expired_revocations()
+        click.echo(f"Purged {deleted} expired revocation entries")
+
+    @app.cli.command('sync-replicas')
+    def sync_replicas_command():
+        """Copy the SQLite primary into the SQLite read replica files (local testing)."""
+        synced = sync_sqlite_replicas()
+        click.echo(f"Synced {synced} replicas")
+
+    @app.cli.command('purge-idempotency-keys')
+    def purge_idempotency_keys_command():
+        """Delete stored Idempotency-Key responses past their retention window."""
+        deleted = purge_expired_idempotency_keys()
+        click.echo(f"Purged {deleted} expired idempotency keys")
+
+    @app.cli.command('purge-carts')
+    def purge_carts_command():
+        """Delete guest carts untouched for GUEST_CART_RETENTION_DAYS."""
+        deleted = carts.purge_guest_carts(app.config['GUEST_CART_RETENTION_DAYS'])
+        click.echo(f"Purged {deleted} abandoned guest carts")
+
+    @app.cli.command('run-jobs')
+    @click.option('--workers', default=4, show_default=True, help='Worker threads.')
+    @click.option('--once', is_flag=True, help='Run the jobs that are due now, then exit.')
+    def run_jobs_command(workers, once):
+        """Run background jobs (emails, alerts) from the job table."""
+        if once:
+            click.echo(f"Ran {job_queue.run_pending()} jobs")
+            return
+        job_queue.start(workers)
+        click.echo(f"Started {workers} job workers, press Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            job_queue.stop()
+
+    @app.cli.command('purge-jobs')
+    @click.option('--days', default=7, show_default=True, help='Keep finished jobs this many days.')
+    def purge_jobs_command(days):
+        """Delete finished jobs; dead-lettered jobs are kept."""
+        deleted = purge_finished_jobs(days)
+        click.echo(f"Purged {deleted} finished jobs")
+
+    @app.cli.command('bench-seed')
+    @click.option('--products', default=10000, show_default=True)
+    @click.option('--users', default=1000, show_default=True)
+    @click.option('--orders', default=10000, show_default=True)
+    @click.option('--reviews', default=10000, show_default=True)
+    @click.option('--reset', is_flag=True, help='Drop and recreate every table first.')
+    def bench_seed_command(products, users, orders, reviews, reset):
+        """Add synthetic benchmark data (use a scratch DATABASE_URL)."""
+        if reset:
+            db.drop_all()
+            db.create_all()
+        counts = benchmark.seed_data(products=products, users=users, orders=orders, reviews=reviews)
+        product_index.reset()
+        click.echo("Seeded " + ", ".join(f"{n} {name}" for name, n in counts.items()))
+
+    @app.cli.command('bench-run')
+    @click.option('--users', default=8, show_default=True, help='Concurrent virtual shoppers.')
+    @click.option('--duration', default=30, show_default=True, help='Seconds to run.')
+    @click.option('--output', type=click.Path(dir_okay=False, writable=True), help='Write the report as JSON.')
+    @click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='Report to compare against.')
+    @click.option('--tolerance', default=0.2, show_default=True, help='Allowed p95 growth over the baseline.')
+    def bench_run_command(users, duration, output, baseline, tolerance):
+        """Load-test the shopping flow in-process and report latency per endpoint."""
+        try:
+            report = benchmark.run_load(app, users=users, duration=duration)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        previous = benchmark.load_report(baseline) if baseline else None
+        click.echo(benchmark.format_report(report, previous))
+        if output:
+            benchmark.save_report(report, output)
+        if previous:
+            regressions = benchmark.compare(report, previous, tolerance)
+            for regression in regressions:
+                click.echo(f"REGRESSION {regression}", err=True)
+            if regressions:
+                raise SystemExit(1)
+
+    @app.cli.command('bench-startup')
+    @click.option('--runs', default=5, show_default=True, help='Cold starts per mode.')
+    @click.option('--path', default='/health/ready', show_default=True, help='Endpoint for the first request.')
+    @click.option('--output', type=click.Path(dir_okay=False, writable=True), help='Write the report as JSON.')
+    def bench_startup_command(runs, path, output):
+        """Time imports, create_app() and the first request in fresh interpreters."""
+        try:
+            report = benchmark.measure_startup(runs=runs, path=path)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        click.echo(benchmark.format_startup_report(report))
+        if output:
+            benchmark.save_report(report, output)
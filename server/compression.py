@@ -0,0 +1,117 @@
+# compression.py
+import hashlib
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Optional dependency, only gzip is offered without it
+    brotli = None
+
+
+class _GzipStream:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def compress(self, data, flush=False):
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data, flush=False):
+        out = self._compressor.process(data)
+        return out + self._compressor.flush() if flush else out
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _compressed_chunks(chunks, stream):
+    # Flush after every chunk so a streamed listing still reaches the client as it is produced
+    try:
+        for chunk in chunks:
+            data = stream.compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk, flush=True)
+            if data:
+                yield data
+        yield stream.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+# App-wide response post-processing for every route:
+# - Buffered GET responses without a validator get a weak ETag from a hash of their body,
+#   and any If-None-Match / If-Modified-Since match (against that ETag, or the
+#   Last-Modified a view set) is answered with 304 and no body.
+# - Text and JSON bodies are compressed with brotli or gzip, whichever the
+#   client prefers, once they reach COMPRESSION_MIN_SIZE; streamed responses
+#   are compressed chunk by chunk.
+class Compression:
+    def __init__(self):
+        self.enabled = True
+        self.min_size = 500
+        self.mimetypes = set()
+        self.gzip_level = 6
+        self.brotli_quality = 5
+        self.etags = True
+
+    def init_app(self, app):
+        self.enabled = app.config['COMPRESSION_ENABLED']
+        self.min_size = app.config['COMPRESSION_MIN_SIZE']
+        self.mimetypes = set(app.config['COMPRESSION_MIMETYPES'])
+        self.gzip_level = app.config['COMPRESSION_GZIP_LEVEL']
+        self.brotli_quality = app.config['COMPRESSION_BROTLI_QUALITY']
+        self.etags = app.config['AUTO_ETAGS']
+        app.after_request(self._after_request)
+        app.extensions['compression'] = self
+
+    def _after_request(self, response):
+        # make_conditional would read a streamed body into memory to set Content-Length
+        if request.method in ('GET', 'HEAD') and response.status_code == 200 \
+                and not response.is_streamed and not response.direct_passthrough:
+            if self.etags and 'ETag' not in response.headers:
+                response.set_etag(hashlib.sha1(response.get_data()).hexdigest(), weak=True)
+            response.make_conditional(request.environ)
+        if self.enabled:
+            self._compress(response)
+        return response
+
+    def _encoding(self):
+        offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+        return request.accept_encodings.best_match(offered)
+
+    def _compress(self, response):
+        if response.mimetype not in self.mimetypes or response.direct_passthrough:
+            return
+        response.vary.add('Accept-Encoding')
+        if not 200 <= response.status_code < 300 or response.status_code == 204 \
+                or 'Content-Encoding' in response.headers or 'Content-Range' in response.headers:
+            return
+        if not response.is_streamed and response.content_length is not None \
+                and response.content_length < self.min_size:
+            return
+        encoding = self._encoding()
+        if encoding is None:
+            return
+
+        stream = _BrotliStream(self.brotli_quality) if encoding == 'br' else _GzipStream(self.gzip_level)
+        if response.is_streamed:
+            response.response = _compressed_chunks(response.response, stream)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(stream.compress(response.get_data()) + stream.finish())
+        response.headers['Content-Encoding'] = encoding
+        # The compressed bytes differ from the identity ones, so only a weak validator still holds
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+
+compression = Compression()
@@ -2,13 +2,128 @@ import os
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your_secret_key'
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///trendify.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///trendify.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-    # Mail Configuration
-    MAIL_SERVER = 'smtp.example.com'
-    MAIL_PORT = 587
-    MAIL_USE_TLS = True
+    # Read replicas (comma separated URIs); reads from @use_replica routes go there
+    DATABASE_REPLICA_URLS = [uri for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri]
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))  # read-your-writes window
+
+    # Connection pool for PostgreSQL/MySQL (per worker process)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # seconds to wait for a connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds before a connection is replaced
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+    # SQLite pragmas applied on every new connection
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -64000))  # negative means KiB
+
+    # Pagination
+    DEFAULT_PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+
+    # Product search index, held by each worker process
+    SEARCH_INDEX_REFRESH_SECONDS = 5  # how long other workers' product writes may take to show up
+    SEARCH_INDEX_SYNC_OVERLAP = 60  # seconds of updated_at re-read on every sync
+
+    # Inventory reservations
+    RESERVATION_TTL_SECONDS = 15 * 60
+    INVENTORY_RETRY_ATTEMPTS = 3
+    INVENTORY_RETRY_BACKOFF = 0.05  # seconds, doubled on every retry
+
+    # Response cache ('memory', 'redis' or 'none'). 'memory' is per process: behind
+    # several gunicorn workers, a write only invalidates the entries of the worker that
+    # made it, and the others serve theirs until CACHE_DEFAULT_TTL runs out. Run more
+    # than one worker with 'redis', whose entries and generations every worker shares.
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_DEFAULT_TTL = 60  # seconds
+    CACHE_MAX_ENTRIES = 1024
+
+    # How long revoked tokens and role changes may take to reach other workers
+    IDENTITY_CACHE_TTL = 30  # seconds
+
+    # Bulk product import
+    IMPORT_BATCH_SIZE = 1000
+    IMPORT_MAX_ERRORS = 1000  # per-row errors reported back, the rest are only counted
+
+    # Order placement: Idempotency-Key retention and batch size
+    IDEMPOTENCY_KEY_TTL = 24 * 3600  # seconds a stored response can be replayed
+    IDEMPOTENCY_IN_PROGRESS_TIMEOUT = 120  # seconds before a key left in progress (worker died) can be retried
+    MAX_BATCH_ORDERS = 100
+
+    # Password hashing, run in a pool of worker processes (0: on the request thread)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')  # or pbkdf2:sha256:N, argon2
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = 16  # queued or running hashes before callers wait
+    PASSWORD_HASH_TIMEOUT = 5  # seconds to wait for a slot before answering 503
+
+    # Failed login throttling (per process), in a fixed window of seconds
+    LOGIN_MAX_FAILURES_PER_EMAIL = 5
+    LOGIN_MAX_FAILURES_PER_IP = 50
+    LOGIN_FAILURE_WINDOW = 900
+
+    # Server-side carts
+    CART_MAX_ITEMS = 100  # distinct products
+    CART_MAX_QUANTITY = 99  # per product
+    CART_SUMMARY_TTL = 300  # seconds a cart's price/stock check stays cached
+    GUEST_CART_RETENTION_DAYS = 30
+
+    # Product images: content-addressed originals and resized variants, served from
+    # IMAGE_BASE_URL (empty: this app's /images route; set it to a CDN in production)
+    IMAGE_STORAGE_DIR = os.environ.get('IMAGE_STORAGE_DIR')  # default: <instance folder>/images
+    IMAGE_BASE_URL = os.environ.get('IMAGE_BASE_URL', '')
+    IMAGE_FIXTURE_DIR = os.environ.get('IMAGE_FIXTURE_DIR')  # local source for {"fixture": name} uploads
+    IMAGE_WIDTHS = (160, 320, 640, 1280)
+    IMAGE_DEFAULT_WIDTH = 320  # the plain src in product responses
+    IMAGE_FORMATS = ('webp', 'jpeg')
+    IMAGE_QUALITY = {'webp': 80, 'jpeg': 82}
+    IMAGE_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+    IMAGE_CACHE_MAX_AGE = 365 * 24 * 3600  # seconds; variant URLs are immutable
+
+    # Response compression (gzip, and brotli when the brotli package is installed)
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = 500  # bytes; smaller bodies gain less than the encoding costs
+    COMPRESSION_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html')
+    COMPRESSION_GZIP_LEVEL = 6
+    COMPRESSION_BROTLI_QUALITY = 5  # 0-11; higher levels cost too much CPU per request
+    AUTO_ETAGS = True  # weak ETags and 304s for GET responses that set no validator themselves
+
+    # Production serving: gunicorn -c gunicorn.conf.py web:app (see serving.py)
+    SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:8000')
+    SERVER_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 0))  # processes; 0: one per usable CPU core
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 0))  # per process; 0: 4, at most DB_POOL_SIZE
+    SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', 30))  # seconds a request may run before its worker is killed
+    SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))  # seconds to drain on shutdown/reload
+    SERVER_KEEPALIVE = int(os.environ.get('SERVER_KEEPALIVE', 5))  # seconds; behind a load balancer, above its idle timeout
+    SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', 10000))  # recycle a worker after this many; 0: never
+
+    # Request instrumentation: Server-Timing header, /metrics and the slow-query log
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', 'true').lower() == 'true'
+    SERVER_TIMING_HEADER = True
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))  # logged with the statement's plan
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 1000))
+    N_PLUS_ONE_THRESHOLD = 10  # identical statements in one request before it is flagged
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # if set, /metrics requires "Bearer <token>"
+
+    # Background jobs (emails and other post-order side effects)
+    JOB_WORKERS_IN_PROCESS = int(os.environ.get('JOB_WORKERS_IN_PROCESS', 0))  # 0: run `flask run-jobs` instead
+    JOB_MAX_ATTEMPTS = 5
+    JOB_RETRY_BACKOFF = 30  # seconds before the first retry, doubled on each further attempt
+    JOB_POLL_INTERVAL = 5  # seconds; in-process workers are also woken on commit
+    JOB_LOCK_TIMEOUT = 600  # seconds before a running job is assumed lost and requeued
+    LOW_STOCK_THRESHOLD = 5
+    STOCK_ALERT_RECIPIENTS = [e for e in os.environ.get('STOCK_ALERT_RECIPIENTS', '').split(',') if e]
+
+    # Mail Configuration (point MAIL_SERVER at a local SMTP stand-in for testing)
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.example.com')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() == 'true'
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
-    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'no-reply@trendify.example')
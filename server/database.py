@@ -1,4 +1,206 @@
+import random
+import sqlite3
+from functools import wraps
+from flask import current_app, request
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
-db = SQLAlchemy()
+# Cookie that pins a client to the primary for a while after it wrote something,
+# so it reads its own writes even when the replicas lag
+PRIMARY_PIN_COOKIE = 'db_primary_pin'
 
+
+# Session that sends reads to a read replica while a @use_replica route runs and
+# nothing has been written yet; everything else goes to the primary
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and self.info.get('use_replica') and not self.info.get('wrote')
+                and not self._flushing and not getattr(clause, 'is_dml', False)):
+            replica = self._replica()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica(self):
+        # One replica per session, so a request sees a single consistent snapshot
+        if 'replica' not in self.info:
+            keys = [key for key in self._db.engines if key and key.startswith('replica_')]
+            self.info['replica'] = random.choice(keys) if keys else None
+        key = self.info['replica']
+        return self._db.engines[key] if key else None
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_flush(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_dml(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['wrote'] = True
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+# Route the reads of a read-only view to a replica, unless the client wrote recently
+def use_replica(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if PRIMARY_PIN_COOKIE in request.cookies:
+            return f(*args, **kwargs)
+        db.session.info['use_replica'] = True
+        try:
+            return f(*args, **kwargs)
+        finally:
+            db.session.info.pop('use_replica', None)
+    return wrapper
+
+
+# True when this request must see the primary: the client wrote recently, or the
+# request itself has written
+def pinned_to_primary():
+    return PRIMARY_PIN_COOKIE in request.cookies or db.session.info.get('wrote', False)
+
+
+def has_replicas():
+    return any(key and key.startswith('replica_') for key in db.engines)
+
+
+def _pin_writers_to_primary(response):
+    if db.session.info.get('wrote'):
+        response.set_cookie(PRIMARY_PIN_COOKIE, '1', max_age=current_app.config['REPLICA_STICKY_SECONDS'],
+                            httponly=True, samesite='Lax')
+    return response
+
+
+# Engine options for a database URI: a tuned connection pool for server databases
+# (PostgreSQL, MySQL); for SQLite files a pool without pings plus a lock wait timeout
+def engine_options(config, uri):
+    url = make_url(uri)
+    pool = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+    if url.get_backend_name() != 'sqlite':
+        return dict(pool, pool_recycle=config['DB_POOL_RECYCLE'], pool_pre_ping=config['DB_POOL_PRE_PING'])
+
+    options = {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    if url.database not in (None, '', ':memory:'):
+        options.update(pool)
+    return options
+
+
+def _sqlite_pragmas(config):
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size = {int(config['SQLITE_CACHE_SIZE'])}",
+    ]
+
+    # WAL lets readers carry on while a writer commits; it is set per database file,
+    # so it is skipped for in-memory databases
+    def on_connect(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        database = cursor.execute("PRAGMA database_list").fetchone()[2]
+        if database:
+            cursor.execute(f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return on_connect
+
+
+# pysqlite only opens a transaction right before INSERT/UPDATE/DELETE, so a SAVEPOINT
+# issued first runs outside any transaction and its RELEASE commits. Callers that use
+# savepoints open the SQLite transaction up front (IMMEDIATE: take the write lock now).
+def begin_write():
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite' and not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def init_db(app):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config, app.config['SQLALCHEMY_DATABASE_URI']),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+
+    # Read replicas are extra binds that no model is mapped to; only RoutingSession uses them
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    for i, uri in enumerate(app.config['DATABASE_REPLICA_URLS']):
+        binds[f'replica_{i}'] = {'url': uri, **engine_options(app.config, uri)}
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+    db.init_app(app)
+    if app.config['DATABASE_REPLICA_URLS']:
+        app.after_request(_pin_writers_to_primary)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _sqlite_pragmas(app.config))
+
+
+# Copy a SQLite primary into the replica files, a local stand-in for replication
+def sync_sqlite_replicas():
+    primary = db.engines[None]
+    replicas = [engine for key, engine in db.engines.items() if key and key.startswith('replica_')]
+    if primary.dialect.name != 'sqlite' or any(engine.dialect.name != 'sqlite' for engine in replicas):
+        raise RuntimeError("Replica sync is only available for SQLite databases")
+    source = primary.raw_connection()
+    try:
+        for engine in replicas:
+            target = engine.raw_connection()
+            try:
+                source.driver_connection.backup(target.driver_connection)
+            finally:
+                target.close()
+    finally:
+        source.close()
+    return len(replicas)
+
+
+def _pool_usage(pool):
+    return {
+        'pool': type(pool).__name__,
+        'size': pool.size() if hasattr(pool, 'size') else None,
+        'checked_in': pool.checkedin() if hasattr(pool, 'checkedin') else None,
+        'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+        'overflow': pool.overflow() if hasattr(pool, 'overflow') else None,
+    }
+
+
+# Connection pool usage per engine, for monitoring
+def pool_stats():
+    return {key or 'default': _pool_usage(engine.pool) for key, engine in db.engines.items()}
+
+
+# Readiness of every engine, for load balancer health checks. An engine whose pool
+# has every connection checked out is reported unhealthy without waiting for one
+# (a request would queue for up to DB_POOL_TIMEOUT); otherwise a trivial query
+# must succeed.
+def database_health():
+    max_overflow = current_app.config['DB_MAX_OVERFLOW']
+    health = {}
+    for key, engine in db.engines.items():
+        usage = _pool_usage(engine.pool)
+        if usage['size'] is not None and max_overflow >= 0 \
+                and usage['checked_out'] >= usage['size'] + max_overflow:
+            usage.update(ok=False, error="connection pool exhausted")
+        else:
+            try:
+                with engine.connect() as connection:
+                    connection.exec_driver_sql("SELECT 1")
+                usage.update(ok=True, error=None)
+            except Exception as e:
+                usage.update(ok=False, error=type(e).__name__)
+        health[key or 'default'] = usage
+    return health
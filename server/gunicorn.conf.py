@@ -0,0 +1,5 @@
+# gunicorn.conf.py
+# gunicorn -c gunicorn.conf.py web:app
+from serving import gunicorn_settings
+
+globals().update(gunicorn_settings())
@@ -0,0 +1,150 @@
+# idempotency.py
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import Response, current_app, g, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models import IdempotencyKey
+
+
+def _fingerprint():
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.path}\n".encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+# Claim (user, key) for this request. Returns (record id, None) when the request
+# should run, or (None, response) to answer with instead.
+def _claim(user_id, key, fingerprint):
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+    record = IdempotencyKey(user_id=user_id, key=key, request_hash=fingerprint, expires_at=expires_at)
+    db.session.add(record)
+    try:
+        db.session.commit()
+        return record.idempotency_key_id, None
+    except IntegrityError:
+        db.session.rollback()
+
+    existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+    if existing is None:
+        return None, (jsonify({"error": "Idempotency-Key is being released, retry the request"}), 409)
+    # A key still in progress long after its request could have finished belongs to
+    # a worker that died before committing; nothing it did was committed, since the
+    # response is stored in the same transaction as the request's writes
+    abandoned_before = now - timedelta(seconds=current_app.config['IDEMPOTENCY_IN_PROGRESS_TIMEOUT'])
+    reclaimable = or_(IdempotencyKey.expires_at <= now,
+                      and_(IdempotencyKey.status == 'in_progress', IdempotencyKey.created_at <= abandoned_before))
+    if existing.expires_at <= now or (existing.status == 'in_progress' and existing.created_at <= abandoned_before):
+        # An expired or abandoned key may be reused; take it over atomically
+        result = db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.idempotency_key_id == existing.idempotency_key_id, reclaimable)
+            .values(request_hash=fingerprint, status='in_progress', response_status=None,
+                    response_body=None, created_at=now, expires_at=expires_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            return existing.idempotency_key_id, None
+        db.session.refresh(existing)
+    if existing.request_hash != fingerprint:
+        return None, (jsonify({"error": "Idempotency-Key was already used for a different request"}), 422)
+    if existing.status == 'in_progress':
+        return None, (jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409)
+    return None, _replay(existing)
+
+
+def _store(record_id, response):
+    db.session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.idempotency_key_id == record_id)
+        .values(status='completed', response_status=response.status_code,
+                response_body=response.get_data(as_text=True))
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Store the response of an idempotent view in the current transaction, so it is
+# committed together with the writes it reports on. Views whose writes must not
+# be repeated (e.g. placing an order) call this right before their commit;
+# otherwise the response is stored after the view returns.
+def store_response(response):
+    response = make_response(response)
+    record_id = g.get('idempotency_key_id')
+    if record_id is not None:
+        _store(record_id, response)
+    return response
+
+
+# Answer without storing the response, so a retry with the same key runs the view
+# again. For outcomes that depend on server-side state rather than on the request
+# body (e.g. a checkout refused because the cart changed), where replaying them
+# would make the key useless once the client has resolved the conflict.
+def release_key(response):
+    response = make_response(response)
+    g.idempotency_release = True
+    return response
+
+
+def _release(record_id):
+    db.session.rollback()
+    # A response stored with the view's own commit stays: its writes were committed
+    IdempotencyKey.query.filter_by(idempotency_key_id=record_id, status='in_progress').delete()
+    db.session.commit()
+
+
+# Make a JWT-protected POST safe to retry. The first request with a given
+# Idempotency-Key header runs and its response is stored; a retry with the same
+# key and body gets the stored response back instead of running again. Server
+# errors and responses passed through release_key are not stored, so the client
+# can retry them with the same key. Views
+# with non-repeatable writes store their response in the same commit with
+# store_response, so a crash in between cannot leave the key in progress.
+def idempotent(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return f(*args, **kwargs)
+        if not key.strip() or len(key) > 255:
+            return jsonify({"error": "Idempotency-Key must be 1 to 255 characters"}), 400
+
+        record_id, response = _claim(int(get_jwt_identity()), key, _fingerprint())
+        if response is not None:
+            return response
+
+        g.idempotency_key_id = record_id
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            _release(record_id)
+            raise
+        if response.status_code >= 500 or response.is_streamed or g.pop('idempotency_release', False):
+            _release(record_id)
+            return response
+
+        db.session.rollback()  # anything the view left uncommitted is not part of its response
+        stored = db.session.query(IdempotencyKey.status).filter_by(idempotency_key_id=record_id).scalar()
+        if stored != 'completed':
+            _store(record_id, response)
+            db.session.commit()
+        return response
+    return wrapper
+
+
+# Drop keys past their retention window
+def purge_expired_idempotency_keys():
+    deleted = IdempotencyKey.query.filter(IdempotencyKey.expires_at <= datetime.utcnow()).delete()
+    db.session.commit()
+    return deleted
@@ -0,0 +1,111 @@
+# identity.py
+import threading
+import time
+from datetime import datetime, timezone
+from flask import current_app
+from flask_jwt_extended import JWTManager
+from database import db
+from models import RevokedToken
+
+# Initialize JWT Manager
+jwt = JWTManager()
+
+
+# In-process view of the revocation list: revoked token ids, plus per-user cutoffs
+# ("every token issued before this second is invalid, and so is one issued within
+# it unless it carries the role the user was given") written when a user's role
+# changes. It is reloaded from the database at most once every IDENTITY_CACHE_TTL
+# seconds, so checking a token costs no queries and a revocation made by another
+# worker takes effect within that window.
+class IdentityCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked_jtis = set()
+        self._cutoffs = {}  # user_id -> (unix timestamp, role)
+        self._loaded_at = None
+
+    def _refresh(self):
+        ttl = current_app.config['IDENTITY_CACHE_TTL']
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < ttl:
+            return
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < ttl:
+                return
+            # Oldest first, so the latest cutoff (and role) per user wins
+            rows = (RevokedToken.query
+                    .filter(RevokedToken.expires_at > datetime.utcnow())
+                    .order_by(RevokedToken.revoked_token_id).all())
+            revoked_jtis, cutoffs = set(), {}
+            for row in rows:
+                if row.jti:
+                    revoked_jtis.add(row.jti)
+                if row.issued_before:
+                    _add_cutoff(cutoffs, row.user_id, row.issued_before, row.role)
+            self._revoked_jtis, self._cutoffs = revoked_jtis, cutoffs
+            self._loaded_at = time.monotonic()
+
+    def is_revoked(self, payload):
+        self._refresh()
+        if payload['jti'] in self._revoked_jtis:
+            return True
+        cutoff = self._cutoffs.get(int(payload['sub']))
+        if cutoff is None:
+            return False
+        timestamp, role = cutoff
+        return payload['iat'] < timestamp or (payload['iat'] == timestamp and payload.get('role') != role)
+
+    # Revoke a single token (logout)
+    def revoke_token(self, payload):
+        db.session.add(RevokedToken(
+            jti=payload['jti'],
+            user_id=int(payload['sub']),
+            expires_at=datetime.utcfromtimestamp(payload['exp'])
+        ))
+        db.session.commit()
+        with self._lock:
+            self._revoked_jtis.add(payload['jti'])
+
+    # Revoke every token issued to a user so far because their role changed to
+    # `role`. Token iat claims are whole seconds, so the cutoff is too; within the
+    # revoking second only tokens carrying the new role (e.g. from logging in again
+    # right away) stay valid. The caller commits.
+    def revoke_user(self, user_id, role):
+        now = datetime.utcnow().replace(microsecond=0)
+        db.session.add(RevokedToken(
+            user_id=user_id,
+            issued_before=now,
+            role=role,
+            expires_at=now + current_app.config['JWT_ACCESS_TOKEN_EXPIRES']
+        ))
+        with self._lock:
+            _add_cutoff(self._cutoffs, user_id, now, role)
+
+    def reset(self):
+        with self._lock:
+            self._loaded_at = None
+
+
+def _add_cutoff(cutoffs, user_id, issued_before, role):
+    timestamp = issued_before.replace(tzinfo=timezone.utc).timestamp()
+    if user_id not in cutoffs or timestamp >= cutoffs[user_id][0]:
+        cutoffs[user_id] = (timestamp, role)
+
+
+identity_cache = IdentityCache()
+
+
+@jwt.token_in_blocklist_loader
+def _check_if_token_revoked(jwt_header, jwt_payload):
+    return identity_cache.is_revoked(jwt_payload)
+
+
+# Claims signed into every access token at login
+def identity_claims(user):
+    return {"role": user.role}
+
+
+# Drop revocation rows whose tokens have expired anyway
+def purge_expired_revocations():
+    deleted = RevokedToken.query.filter(RevokedToken.expires_at <= datetime.utcnow()).delete()
+    db.session.commit()
+    return deleted
@@ -0,0 +1,222 @@
+# images.py
+import hashlib
+import importlib.util
+import logging
+import os
+import re
+import tempfile
+from sqlalchemy import update
+from database import db
+from models import Image, Product
+from jobs import enqueue, task
+
+# Pillow is an optional dependency, needed to generate the resized variants. It is
+# imported by the job that does so rather than by every web worker at startup.
+HAVE_PILLOW = importlib.util.find_spec('PIL') is not None
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of the formats accepted for upload
+SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp'}
+HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ImageError(ValueError):
+    pass
+
+
+def _sniff(header):
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, content_type in SIGNATURES:
+        if header.startswith(signature):
+            return content_type
+    return None
+
+
+# Content-addressed image files: originals are stored once under their SHA-256,
+# and each variant's file name carries that hash, so a URL never changes meaning
+# and can be cached forever by browsers and a CDN in front of IMAGE_BASE_URL.
+class ImageStore:
+    def __init__(self):
+        self.root = None
+        self.base_url = ''
+        self.widths = (160, 320, 640, 1280)
+        self.formats = ('webp', 'jpeg')
+        self.default_width = 320
+        self.quality = {'webp': 80, 'jpeg': 82}
+        self.max_bytes = 10 * 1024 * 1024
+
+    def init_app(self, app):
+        self.root = app.config['IMAGE_STORAGE_DIR'] or os.path.join(app.instance_path, 'images')
+        self.base_url = app.config['IMAGE_BASE_URL'].rstrip('/')
+        self.widths = tuple(sorted(app.config['IMAGE_WIDTHS']))
+        self.formats = tuple(app.config['IMAGE_FORMATS'])
+        self.default_width = app.config['IMAGE_DEFAULT_WIDTH']
+        self.quality = app.config['IMAGE_QUALITY']
+        self.max_bytes = app.config['IMAGE_MAX_UPLOAD_BYTES']
+        if not HAVE_PILLOW:
+            logger.warning("Pillow is not installed; uploaded images are stored but no variants are generated")
+        app.extensions['image_store'] = self
+
+    def original_path(self, sha256):
+        return os.path.join(self.root, 'originals', sha256[:2], sha256)
+
+    def variant_path(self, sha256, width, fmt):
+        return os.path.join(self.root, 'variants', sha256[:2], f'{sha256}-{width}.{EXTENSIONS[fmt]}')
+
+    def url(self, sha256, width, fmt):
+        return f'{self.base_url}/images/{sha256}/{width}.{EXTENSIONS[fmt]}'
+
+    # Resolve the file behind /images/<hash>/<name>, or None for anything unknown
+    def lookup(self, sha256, name):
+        width, _, extension = name.partition('.')
+        formats = {EXTENSIONS[fmt]: fmt for fmt in self.formats}
+        if not HASH_PATTERN.match(sha256) or not width.isdigit() or int(width) not in self.widths \
+                or extension not in formats:
+            return None
+        path = self.variant_path(sha256, int(width), formats[extension])
+        return path if os.path.exists(path) else None
+
+    # Copy a stream into storage while hashing it, in bounded memory.
+    # Returns (sha256, content type, size in bytes).
+    def save_original(self, stream):
+        os.makedirs(os.path.join(self.root, 'originals'), exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        header = b''
+        fd, temp_path = tempfile.mkstemp(dir=os.path.join(self.root, 'originals'))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(64 * 1024)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ImageError(f"Images may be at most {self.max_bytes // (1024 * 1024)} MB")
+                    if len(header) < 16:
+                        header += chunk[:16]
+                    digest.update(chunk)
+                    f.write(chunk)
+            content_type = _sniff(header)
+            if content_type is None:
+                raise ImageError("Only JPEG, PNG, GIF and WebP images are accepted")
+            sha256 = digest.hexdigest()
+            path = self.original_path(sha256)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)  # same content, same name: a duplicate upload just overwrites it
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return sha256, content_type, size
+
+    # JPEG where configured, as the fallback every browser decodes
+    def default_url(self, sha256):
+        return self.url(sha256, self.default_width, 'jpeg' if 'jpeg' in self.formats else self.formats[0])
+
+    # The fields a product response carries for its image: the variant URLs per
+    # format as a srcset string, plus the widths for building one by hand
+    def srcset(self, sha256):
+        return {
+            "src": self.default_url(sha256),
+            "widths": list(self.widths),
+            "srcset": {fmt: ", ".join(f"{self.url(sha256, width, fmt)} {width}w" for width in self.widths)
+                       for fmt in self.formats},
+        }
+
+
+image_store = ImageStore()
+
+
+# Store an uploaded image and point the product at it. An image already on file
+# (same bytes) is reused; a new one gets its variants from a background job, and
+# the product keeps showing its previous image until they are ready. The caller commits.
+def attach_image(product, stream):
+    sha256, content_type, size = image_store.save_original(stream)
+    image = Image.query.filter_by(sha256=sha256).first()
+    if image is None:
+        image = Image(sha256=sha256, content_type=content_type, size_bytes=size)
+        db.session.add(image)
+        db.session.flush()
+        enqueue('generate_image_variants', image_id=image.image_id)
+    elif image.status == 'failed':
+        image.status = 'pending'
+        enqueue('generate_image_variants', image_id=image.image_id)
+    product.image_id = image.image_id
+    if image.status == 'ready':
+        product.image_hash = sha256
+    return image
+
+
+def _write_variant(source, sha256, width, fmt):
+    from PIL import Image as PILImage
+    variant = source.copy()
+    variant.thumbnail((width, width * 4), PILImage.LANCZOS)  # never upscales
+    if fmt == 'jpeg' and variant.mode not in ('RGB', 'L'):
+        variant = variant.convert('RGB')
+    path = image_store.variant_path(sha256, width, fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    options = {'quality': image_store.quality[fmt], 'optimize': True}
+    if fmt == 'jpeg':
+        options['progressive'] = True
+    else:
+        options['method'] = 4
+    variant.save(temp_path, fmt.upper(), **options)
+    os.replace(temp_path, path)
+
+
+# Resize an original into every configured width and format, then switch the
+# products that use it over to the new image
+@task('generate_image_variants')
+def generate_image_variants(image_id):
+    image = db.session.get(Image, image_id)
+    if image is None or image.status == 'ready':
+        return
+    if not HAVE_PILLOW:
+        raise RuntimeError("Pillow is required to generate image variants")
+    from PIL import Image as PILImage, ImageOps
+    try:
+        with PILImage.open(image_store.original_path(image.sha256)) as source:
+            source.seek(0)  # first frame of an animated GIF
+            source = ImageOps.exif_transpose(source)
+            source.load()
+    except (OSError, PILImage.DecompressionBombError) as e:
+        image.status = 'failed'
+        logger.warning("Image %s could not be decoded: %s", image_id, e)
+        return
+
+    for width in image_store.widths:
+        for fmt in image_store.formats:
+            _write_variant(source, image.sha256, width, fmt)
+    image.width, image.height = source.size
+    image.status = 'ready'
+    db.session.execute(
+        update(Product)
+        .where(Product.image_id == image_id)
+        .values(image_hash=image.sha256)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Attach <product_id>.<ext> files from a local directory to the products with
+# those IDs, e.g. fixtures replacing hotlinked seed images. Returns the count.
+def import_fixture_images(directory):
+    attached = 0
+    for filename in sorted(os.listdir(directory)):
+        product_id, _, _ = filename.partition('.')
+        product = db.session.get(Product, int(product_id)) if product_id.isdigit() else None
+        if product is None:
+            continue
+        with open(os.path.join(directory, filename), 'rb') as f:
+            attach_image(product, f)
+        db.session.commit()
+        attached += 1
+    return attached
@@ -0,0 +1,99 @@
+# index_check.py
+import ast
+import os
+from sqlalchemy import inspect
+from database import db
+
+FILTER_METHODS = {'filter', 'where'}
+
+
+def _models():
+    return {mapper.class_.__name__: mapper.class_ for mapper in db.Model.registry.mappers}
+
+
+def _query_model(node, models):
+    # Find the model a query chain starts from: Model.query... or db.session.query(Model)...
+    while isinstance(node, (ast.Call, ast.Attribute)):
+        if isinstance(node, ast.Attribute):
+            if node.attr == 'query' and isinstance(node.value, ast.Name) and node.value.id in models:
+                return node.value.id
+            node = node.value
+        else:
+            if (isinstance(node.func, ast.Attribute) and node.func.attr == 'query'
+                    and node.args and isinstance(node.args[0], ast.Name) and node.args[0].id in models):
+                return node.args[0].id
+            node = node.func
+    return None
+
+
+def _filtered_columns(tree, models):
+    # Yield (function name, line, model name, column) for every column a query filters on.
+    # ast.walk is breadth-first, so nested functions overwrite their enclosing function.
+    owners = {}
+    for function in ast.walk(tree):
+        if isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            for node in ast.walk(function):
+                if isinstance(node, ast.Call):
+                    owners[node] = function.name
+
+    for call, function in owners.items():
+        if not isinstance(call.func, ast.Attribute):
+            continue
+        if call.func.attr == 'filter_by':
+            model = _query_model(call.func.value, models)
+            if model:
+                for keyword in call.keywords:
+                    yield function, call.lineno, model, keyword.arg
+        elif call.func.attr in FILTER_METHODS:
+            for arg in call.args:
+                for node in ast.walk(arg):
+                    if (isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)
+                            and node.value.id in models):
+                        yield function, call.lineno, node.value.id, node.attr
+
+
+def _leading_columns(inspector, table):
+    # Columns that can drive an index lookup: the first column of the primary key,
+    # of every index and of every unique constraint
+    leading = set()
+    primary_key = inspector.get_pk_constraint(table).get('constrained_columns') or []
+    if primary_key:
+        leading.add(primary_key[0])
+    for index in inspector.get_indexes(table) + inspector.get_unique_constraints(table):
+        columns = [column for column in index.get('column_names') or [] if column]
+        if columns:
+            leading.add(columns[0])
+    return leading
+
+
+# Scan the application modules for query filters and report every function whose
+# filters on a table cannot use any index of the live database.
+# Returns a list of (path, line, function, table, columns) tuples.
+def find_unindexed_filters(source_dir):
+    models = _models()
+    inspector = inspect(db.engine)
+    leading_by_table = {}
+    problems = []
+
+    for filename in sorted(os.listdir(source_dir)):
+        if not filename.endswith('.py'):
+            continue
+        path = os.path.join(source_dir, filename)
+        with open(path) as f:
+            tree = ast.parse(f.read(), filename=path)
+
+        filters = {}
+        for function, line, model_name, column in _filtered_columns(tree, models):
+            model = models[model_name]
+            if column not in model.__table__.columns:
+                continue
+            key = (function, model.__tablename__)
+            filters.setdefault(key, (line, set()))[1].add(column)
+
+        for (function, table), (line, columns) in filters.items():
+            if table not in leading_by_table:
+                leading_by_table[table] = _leading_columns(inspector, table)
+            if not columns & leading_by_table[table]:
+                problems.append((filename, line, function, table, sorted(columns)))
+
+    return sorted(problems)
@@ -0,0 +1,226 @@
+# instrumentation.py
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('trendify.profiling')
+
+# Request duration histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+EXPLAIN = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+    'mariadb': 'EXPLAIN ',
+}
+
+
+# Per-request numbers, kept on flask.g
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.slowest = (0.0, None)
+        self.statements = Counter()
+
+
+def _stats():
+    if not has_request_context():
+        return None
+    return g.get('_request_stats')
+
+
+# Process-wide counters, rendered in the Prometheus text format by /metrics.
+# Each worker process keeps its own, so scrape every worker (or sum them).
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()  # (method, endpoint, status) -> count
+        self.buckets = defaultdict(lambda: [0] * (len(BUCKETS) + 1))  # (method, endpoint) -> counts
+        self.duration = Counter()  # (method, endpoint) -> seconds
+        self.queries = Counter()  # endpoint -> statements
+        self.db_time = Counter()  # endpoint -> seconds
+        self.serialize_time = Counter()  # endpoint -> seconds
+        self.slow_queries = Counter()  # endpoint -> count
+        self.n_plus_one = Counter()  # endpoint -> count
+
+    def observe(self, method, endpoint, status, stats, elapsed):
+        with self._lock:
+            self.requests[method, endpoint, status] += 1
+            counts = self.buckets[method, endpoint]
+            for i, bound in enumerate(BUCKETS):
+                if elapsed <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self.duration[method, endpoint] += elapsed
+            self.queries[endpoint] += stats.queries
+            self.db_time[endpoint] += stats.db_time
+            self.serialize_time[endpoint] += stats.serialize_time
+
+    def count(self, counter, endpoint):
+        with self._lock:
+            counter[endpoint] += 1
+
+    def render(self):
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            family('trendify_http_requests_total', 'counter', 'HTTP requests by route and status.')
+            for (method, endpoint, status), value in sorted(self.requests.items()):
+                lines.append(f'trendify_http_requests_total{{method="{method}",endpoint="{endpoint}",'
+                             f'status="{status}"}} {value}')
+
+            family('trendify_http_request_duration_seconds', 'histogram', 'Time spent handling requests.')
+            for (method, endpoint), counts in sorted(self.buckets.items()):
+                labels = f'method="{method}",endpoint="{endpoint}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, counts):
+                    cumulative += count
+                    lines.append(f'trendify_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                cumulative += counts[-1]
+                lines.append(f'trendify_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+                lines.append(f'trendify_http_request_duration_seconds_sum{{{labels}}} '
+                             f'{self.duration[method, endpoint]:.6f}')
+                lines.append(f'trendify_http_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+            for name, counter, help_text, fmt in (
+                    ('trendify_db_queries_total', self.queries, 'SQL statements executed.', '{}'),
+                    ('trendify_db_query_seconds_total', self.db_time, 'Time spent in SQL statements.', '{:.6f}'),
+                    ('trendify_serialize_seconds_total', self.serialize_time, 'Time spent encoding JSON.', '{:.6f}'),
+                    ('trendify_slow_queries_total', self.slow_queries, 'Statements over SLOW_QUERY_MS.', '{}'),
+                    ('trendify_n_plus_one_total', self.n_plus_one, 'Requests repeating one statement.', '{}')):
+                family(name, 'counter', help_text)
+                for endpoint, value in sorted(counter.items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {fmt.format(value)}')
+        return "\n".join(lines) + "\n"
+
+
+# Hooks SQLAlchemy engine events and Flask request hooks to measure every
+# request: statement count, DB time, the slowest statement and JSON encoding
+# time. Results go to the Server-Timing header, /metrics and the slow-query log.
+class Instrumentation:
+    def __init__(self):
+        self.metrics = Metrics()
+        self.enabled = False
+
+    def init_app(self, app):
+        self.enabled = app.config['INSTRUMENTATION_ENABLED']
+        app.extensions['instrumentation'] = self
+        if not self.enabled:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self._metrics_view)
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    def _before_request(self):
+        g._request_stats = RequestStats()
+
+    def _after_request(self, response):
+        stats = _stats()
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.started
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        config = current_app.config
+
+        self.metrics.observe(request.method, endpoint, response.status_code, stats, elapsed)
+
+        if config['SERVER_TIMING_HEADER']:
+            response.headers['Server-Timing'] = ", ".join([
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+                f'serialize;dur={stats.serialize_time * 1000:.1f}',
+                f'app;dur={elapsed * 1000:.1f}',
+            ])
+
+        statement, repeats = stats.statements.most_common(1)[0] if stats.statements else (None, 0)
+        if repeats >= config['N_PLUS_ONE_THRESHOLD']:
+            self.metrics.count(self.metrics.n_plus_one, endpoint)
+            logger.warning("Possible N+1 in %s %s: one statement ran %d times: %s",
+                           request.method, endpoint, repeats, statement)
+
+        if elapsed * 1000 >= config['SLOW_REQUEST_MS']:
+            slowest_time, slowest_statement = stats.slowest
+            logger.warning("Slow request %s %s: %.1fms, %d queries, %.1fms in the database; "
+                           "slowest statement %.1fms: %s", request.method, request.full_path,
+                           elapsed * 1000, stats.queries, stats.db_time * 1000, slowest_time * 1000,
+                           slowest_statement)
+        return response
+
+    def _metrics_view(self):
+        token = current_app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response("Unauthorized\n", status=401, mimetype='text/plain')
+        return Response(self.metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    # Time a block of work under the request's serialization total
+    @contextmanager
+    def timed_serialization(self):
+        stats = _stats()
+        if stats is None:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats.serialize_time += time.perf_counter() - started
+
+
+instrumentation = Instrumentation()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _stats() is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _stats()
+    if stats is None or not conn.info.get('query_started'):
+        return
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    stats.queries += 1
+    stats.db_time += elapsed
+    stats.statements[statement] += 1
+    if elapsed > stats.slowest[0]:
+        stats.slowest = (elapsed, statement)
+    if elapsed * 1000 >= current_app.config['SLOW_QUERY_MS']:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        instrumentation.metrics.count(instrumentation.metrics.slow_queries, endpoint)
+        logger.warning("Slow query in %s %s: %.1fms\n%s\nparameters: %r\nplan:\n%s",
+                       request.method, endpoint, elapsed * 1000, statement, parameters,
+                       _explain(conn, statement, parameters, executemany))
+
+
+# Ask the database for the statement's plan, on the same connection but through
+# a raw DBAPI cursor so the explain itself is not instrumented
+def _explain(conn, statement, parameters, executemany):
+    prefix = EXPLAIN.get(conn.dialect.name)
+    if prefix is None or executemany or not statement.lstrip().upper().startswith('SELECT'):
+        return '(not available)'
+    try:
+        cursor = conn.connection.driver_connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+        finally:
+            cursor.close()
+    except Exception as e:
+        return f'(explain failed: {e})'
@@ -0,0 +1,160 @@
+# inventory.py
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from database import db
+from models import Product, Reservation, ReservationItem
+from categories import sync_in_stock_counts
+
+
+class InventoryError(Exception):
+    def __init__(self, message, product_id=None):
+        super().__init__(message)
+        self.product_id = product_id
+
+
+class UnknownProduct(InventoryError):
+    pass
+
+
+class InsufficientStock(InventoryError):
+    pass
+
+
+# Turn a list of {'product_id', 'quantity'} dicts into {product_id: total quantity}
+def parse_items(items):
+    if not isinstance(items, list) or not items or any(not isinstance(item, dict) for item in items):
+        raise ValueError("Items should be a non-empty list of objects with 'product_id' and 'quantity'")
+
+    quantities = {}
+    for item in items:
+        if item.get('product_id') is None or item.get('quantity') is None:
+            raise ValueError("Each item must have 'product_id' and 'quantity'")
+        try:
+            product_id = int(item['product_id'])
+            quantity = int(item['quantity'])
+        except (TypeError, ValueError):
+            raise ValueError("'product_id' and 'quantity' must be integers")
+        if quantity < 1:
+            raise ValueError("'quantity' must be at least 1")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+# Load every requested product with a single IN query
+def load_products(product_ids):
+    products = Product.query.filter(Product.product_id.in_(product_ids)).all()
+    by_id = {product.product_id: product for product in products}
+    for product_id in product_ids:
+        if product_id not in by_id:
+            raise UnknownProduct(f"Product with ID {product_id} does not exist", product_id)
+    return by_id
+
+
+# Decrement stock with conditional UPDATEs so concurrent checkouts can never oversell.
+# Rows are touched in product_id order to keep lock acquisition consistent across workers.
+# The caller owns the transaction and must roll back on InventoryError. Stock moves only
+# invalidate the cached responses showing these products (cache_rows, see cache.py).
+def reserve_stock(quantities):
+    products = load_products(list(quantities))
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        result = db.session.execute(
+            update(Product)
+            .where(Product.product_id == product_id, Product.stock_quantity >= quantity)
+            .values(stock_quantity=Product.stock_quantity - quantity)
+            .execution_options(synchronize_session='evaluate', cache_rows=[product_id])
+        )
+        if result.rowcount != 1:
+            raise InsufficientStock(f"Insufficient stock for product ID {product_id}", product_id)
+    sync_in_stock_counts(quantities)
+    return products
+
+
+def restore_stock(quantities):
+    for product_id in sorted(quantities):
+        db.session.execute(
+            update(Product)
+            .where(Product.product_id == product_id)
+            .values(stock_quantity=Product.stock_quantity + quantities[product_id])
+            .execution_options(synchronize_session='evaluate', cache_rows=[product_id])
+        )
+    if quantities:
+        sync_in_stock_counts(quantities, restocked=True)
+
+
+# Run fn() in its own transaction, retrying with backoff when the database reports a
+# write conflict (SQLite "database is locked", PostgreSQL serialization failures)
+def retry_on_conflict(fn):
+    attempts = current_app.config['INVENTORY_RETRY_ATTEMPTS']
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn()
+        except OperationalError:
+            db.session.rollback()
+            if attempt == attempts:
+                raise
+            current_app.logger.warning(f"Inventory write conflict, retrying (attempt {attempt} of {attempts})")
+            time.sleep(current_app.config['INVENTORY_RETRY_BACKOFF'] * 2 ** (attempt - 1))
+
+
+# Hold stock for a user until expires_at; the stock is taken out of the pool immediately
+def create_reservation(user_id, quantities, ttl_seconds=None):
+    release_expired_reservations()
+    ttl_seconds = ttl_seconds or current_app.config['RESERVATION_TTL_SECONDS']
+    reserve_stock(quantities)
+    reservation = Reservation(
+        user_id=user_id,
+        status='held',
+        expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds),
+        items=[ReservationItem(product_id=pid, quantity=qty) for pid, qty in quantities.items()]
+    )
+    db.session.add(reservation)
+    return reservation
+
+
+# Atomically move a reservation out of 'held'; only one caller can win this transition
+def _transition(reservation_id, new_status, not_expired=False):
+    conditions = [Reservation.reservation_id == reservation_id, Reservation.status == 'held']
+    if not_expired:
+        conditions.append(Reservation.expires_at > datetime.utcnow())
+    result = db.session.execute(
+        update(Reservation)
+        .where(*conditions)
+        .values(status=new_status)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _reserved_quantities(reservation_id):
+    items = ReservationItem.query.filter_by(reservation_id=reservation_id).all()
+    return {item.product_id: item.quantity for item in items}
+
+
+# Convert a live hold into purchased stock. Returns {product_id: quantity} or None when the
+# reservation is unknown, not owned by the user, already used or expired.
+def commit_reservation(reservation_id, user_id):
+    reservation = db.session.get(Reservation, reservation_id)
+    if not reservation or reservation.user_id != user_id:
+        return None
+    if not _transition(reservation_id, 'committed', not_expired=True):
+        return None
+    return _reserved_quantities(reservation_id)
+
+
+def release_reservation(reservation_id):
+    if not _transition(reservation_id, 'released'):
+        return False
+    restore_stock(_reserved_quantities(reservation_id))
+    return True
+
+
+# Give stock from lapsed holds back to the pool, a bounded batch at a time
+def release_expired_reservations(batch_size=100):
+    expired = (db.session.query(Reservation.reservation_id)
+               .filter(Reservation.status == 'held', Reservation.expires_at <= datetime.utcnow())
+               .limit(batch_size).all())
+    return sum(1 for (reservation_id,) in expired if release_reservation(reservation_id))
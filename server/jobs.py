@@ -0,0 +1,200 @@
+# jobs.py
+import logging
+import threading
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from database import db
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+# Registered job handlers, by name
+TASKS = {}
+
+
+def task(name):
+    def decorator(f):
+        TASKS[name] = f
+        return f
+    return decorator
+
+
+# Add a job to the current transaction; it becomes visible to workers when the
+# caller commits, so a job never runs for work that was rolled back
+def enqueue(name, max_attempts=None, delay=0, **payload):
+    if name not in TASKS:
+        raise ValueError(f"Unknown job: {name}")
+    job = Job(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts or job_queue.max_attempts,
+        run_at=datetime.utcnow() + timedelta(seconds=delay)
+    )
+    db.session.add(job)
+    db.session.info['enqueued_jobs'] = True
+    return job
+
+
+# Database-backed job queue. Workers claim a due job with a conditional UPDATE, so
+# any number of threads and processes can share the table. A failed job is retried
+# with exponential backoff and moved to the dead-letter queue (status 'dead') after
+# max_attempts; a job whose worker died is picked up again after JOB_LOCK_TIMEOUT.
+class JobQueue:
+    def __init__(self):
+        self.app = None
+        self.max_attempts = 5
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def init_app(self, app):
+        self.app = app
+        self.max_attempts = app.config['JOB_MAX_ATTEMPTS']
+        app.extensions['job_queue'] = self
+        if app.config['JOB_WORKERS_IN_PROCESS']:
+            self.start(app.config['JOB_WORKERS_IN_PROCESS'])
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _claim(self):
+        now = datetime.utcnow()
+        due = (db.session.query(Job.job_id)
+               .filter(Job.status == 'queued', Job.run_at <= now)
+               .order_by(Job.run_at)
+               .limit(10).all())
+        for (job_id,) in due:
+            result = db.session.execute(
+                update(Job)
+                .where(Job.job_id == job_id, Job.status == 'queued')
+                .values(status='running', locked_at=now, attempts=Job.attempts + 1)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            if result.rowcount == 1:
+                return db.session.get(Job, job_id)
+        return None
+
+    def _finish(self, job, error=None):
+        now = datetime.utcnow()
+        if error is None:
+            job.status = 'done'
+            job.finished_at = now
+            job.last_error = None
+        elif job.attempts >= job.max_attempts:
+            job.status = 'dead'
+            job.finished_at = now
+            job.last_error = error
+            logger.error("Job %s (%s) moved to the dead-letter queue: %s", job.job_id, job.name, error)
+        else:
+            backoff = self.app.config['JOB_RETRY_BACKOFF'] * 2 ** (job.attempts - 1)
+            job.status = 'queued'
+            job.run_at = now + timedelta(seconds=backoff)
+            job.last_error = error
+            logger.warning("Job %s (%s) failed, retrying in %ss: %s", job.job_id, job.name, backoff, error)
+        job.locked_at = None
+        db.session.commit()
+
+    # Claim and run one due job. Returns False when nothing was due.
+    def run_next(self):
+        job = self._claim()
+        if job is None:
+            return False
+        job_id, handler = job.job_id, TASKS.get(job.name)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job {job.name}")
+            handler(**job.payload)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            error = traceback.format_exc(limit=5)
+            self._finish(db.session.get(Job, job_id), error)
+        else:
+            self._finish(job)
+        return True
+
+    # Run due jobs until none are left, e.g. from a test or a cron-style command
+    def run_pending(self, limit=None):
+        ran = 0
+        while limit is None or ran < limit:
+            with self.app.app_context():
+                if not self.run_next():
+                    break
+            ran += 1
+        return ran
+
+    # Put jobs whose worker died mid-run back in the queue
+    def recover_stale(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.app.config['JOB_LOCK_TIMEOUT'])
+        result = db.session.execute(
+            update(Job)
+            .where(Job.status == 'running', Job.locked_at < cutoff)
+            .values(status='queued', locked_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def _work(self):
+        poll_interval = self.app.config['JOB_POLL_INTERVAL']
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    self.recover_stale()
+                if self.run_pending():
+                    continue
+            except Exception:
+                logger.exception("Job worker error")
+            self._wakeup.wait(poll_interval)
+            self._wakeup.clear()
+
+    # Start a pool of worker threads in this process
+    def start(self, workers):
+        self._stopping.clear()
+        for i in range(workers):
+            thread = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # Move a dead-lettered job back to the queue for another full set of attempts
+    def retry(self, job):
+        if job.status != 'dead':
+            return False
+        job.status = 'queued'
+        job.attempts = 0
+        job.run_at = datetime.utcnow()
+        job.finished_at = None
+        db.session.info['enqueued_jobs'] = True
+        return True
+
+
+job_queue = JobQueue()
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_workers(session):
+    if session.info.pop('enqueued_jobs', False):
+        job_queue.wake()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_jobs(session, previous_transaction):
+    session.info.pop('enqueued_jobs', None)
+
+
+# Delete finished jobs older than the given age; dead jobs are kept for inspection
+def purge_finished_jobs(older_than_days):
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    deleted = Job.query.filter(Job.status == 'done', Job.finished_at < cutoff).delete()
+    db.session.commit()
+    return deleted
@@ -0,0 +1,53 @@
+"""add review status and product rating aggregates
+
+Revision ID: b5d2a8e61f07
+Revises: 3c7e1f0b9a42
+Create Date: 2026-10-18 11:26:53.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d2a8e61f07'
+down_revision = '3c7e1f0b9a42'
+branch_labels = None
+depends_on = None
+
+RATING_COLUMNS = ['rating_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+
+
+def upgrade():
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', sa.Enum('pending', 'approved', 'rejected'), nullable=False, server_default='pending'))
+        batch_op.create_index('ix_reviews_status_created_at', ['status', 'created_at'], unique=False)
+
+    # Reviews written before moderation existed were already public
+    op.execute("UPDATE reviews SET status = 'approved'")
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        for column in RATING_COLUMNS:
+            batch_op.add_column(sa.Column(column, sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_average', sa.Float(), nullable=False, server_default='0'))
+        batch_op.create_index(batch_op.f('ix_products_rating_average'), ['rating_average'], unique=False)
+
+    # Backfill the aggregates from the existing reviews
+    approved = "FROM reviews WHERE reviews.product_id = products.product_id AND reviews.status = 'approved'"
+    op.execute(f"UPDATE products SET rating_count = (SELECT COUNT(*) {approved}), "
+               f"rating_sum = (SELECT COALESCE(SUM(rating), 0) {approved})")
+    for rating in range(1, 6):
+        op.execute(f"UPDATE products SET rating_{rating} = (SELECT COUNT(*) {approved} AND reviews.rating = {rating})")
+    op.execute("UPDATE products SET rating_average = rating_sum * 1.0 / rating_count WHERE rating_count > 0")
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_products_rating_average'))
+        batch_op.drop_column('rating_average')
+        for column in reversed(RATING_COLUMNS):
+            batch_op.drop_column(column)
+
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.drop_index('ix_reviews_status_created_at')
+        batch_op.drop_column('status')
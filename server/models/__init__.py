@@ -1,6 +1,14 @@
 from database import db
 from .user import User
+from .category import Category
+from .image import Image
 from .product import Product
 from .review import Review
 from .order import Order
 from .order_item import OrderItem
+from .reservation import Reservation, ReservationItem
+from .revoked_token import RevokedToken
+from .job import Job
+from .idempotency_key import IdempotencyKey
+from .cart import Cart
+from .sales import SalesByDay, SalesByProduct, SalesByCategory
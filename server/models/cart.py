@@ -0,0 +1,18 @@
+from database import db
+from datetime import datetime
+
+class Cart(db.Model):
+    __tablename__ = 'carts'
+
+    cart_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), unique=True)  # null for guest carts
+    token = db.Column(db.String(64), unique=True)  # guest carts are looked up by token
+    # {"<product_id>": [quantity, "<unit price when added>"]}, one row per cart
+    items = db.Column(db.JSON, nullable=False, default=dict)
+    version = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    # Every UPDATE checks and bumps the version, so concurrent edits of one cart
+    # can't silently overwrite each other (the loser gets StaleDataError)
+    __mapper_args__ = {'version_id_col': version}
@@ -0,0 +1,20 @@
+from database import db
+from datetime import datetime
+
+class Category(db.Model):
+    __tablename__ = 'categories'
+
+    category_id = db.Column(db.Integer, primary_key=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('categories.category_id'), index=True)
+    name = db.Column(db.String(100), nullable=False)
+    # Lowercase, punctuation-free form of the name; "Men's Wear" and "Mens Wear" share one
+    slug = db.Column(db.String(100), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Products filed directly under this category, maintained by categories.py
+    product_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    in_stock_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Relationships
+    parent = db.relationship('Category', remote_side=[category_id], back_populates='children')
+    children = db.relationship('Category', back_populates='parent')
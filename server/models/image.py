@@ -0,0 +1,16 @@
+from database import db
+from datetime import datetime
+
+class Image(db.Model):
+    __tablename__ = 'images'
+
+    image_id = db.Column(db.Integer, primary_key=True)
+    # SHA-256 of the original file, which is stored under this name
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    content_type = db.Column(db.String(50), nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    # 'ready' once every variant is written
+    status = db.Column(db.Enum('pending', 'ready', 'failed'), nullable=False, default='pending')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,22 @@
+from database import db
+from datetime import datetime
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Workers poll for the oldest queued job that is due
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    job_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    # 'dead' is the dead-letter queue: jobs that failed max_attempts times
+    status = db.Column(db.Enum('queued', 'running', 'done', 'dead'), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
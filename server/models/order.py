@@ -3,13 +3,19 @@ from datetime import datetime
 
 class Order(db.Model):
     __tablename__ = 'orders'
-    
+    __table_args__ = (
+        # Order history: filter by user, newest first
+        db.Index('ix_orders_user_id_created_at', 'user_id', 'created_at'),
+    )
+
     order_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     total_amount = db.Column(db.Numeric(10, 2), nullable=False)
     status = db.Column(db.Enum('pending', 'shipped', 'completed', 'cancelled'), default='pending')
     shipping_address = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # The status this order is currently counted under in the sales rollups (None: not yet counted)
+    rolled_up_status = db.Column(db.Enum('pending', 'shipped', 'completed', 'cancelled'))
     
     # Relationships
     user = db.relationship('User', back_populates='orders')
@@ -5,13 +5,31 @@ class Product(db.Model):
     __tablename__ = 'products'
     
     product_id = db.Column(db.Integer, primary_key=True)
+    sku = db.Column(db.String(64), unique=True)
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=False)
     price = db.Column(db.Numeric(10, 2), nullable=False)
     stock_quantity = db.Column(db.Integer, nullable=False)
-    category = db.Column(db.String(100), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.category_id'), nullable=False, index=True)
+    # The category's name, copied here for the search index, facets and sales rollups
+    category = db.Column(db.String(100), nullable=False, index=True)
     image_url = db.Column(db.String(255))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Uploaded image (see images.py); image_hash is set once its variants are ready
+    image_id = db.Column(db.Integer, db.ForeignKey('images.image_id'), index=True)
+    image_hash = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Sent as Last-Modified on the product page, and how search.py finds changed products
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Rating aggregates over approved reviews, maintained by ratings.py
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_average = db.Column(db.Float, nullable=False, default=0, server_default='0', index=True)
+    rating_1 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_2 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_3 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_4 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_5 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relationships
     order_items = db.relationship('OrderItem', back_populates='product', cascade='all, delete-orphan')
@@ -0,0 +1,27 @@
+from database import db
+from datetime import datetime
+
+class Reservation(db.Model):
+    __tablename__ = 'reservations'
+
+    reservation_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    status = db.Column(db.Enum('held', 'committed', 'released'), nullable=False, default='held')
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Relationships
+    items = db.relationship('ReservationItem', back_populates='reservation', cascade='all, delete-orphan')
+
+
+class ReservationItem(db.Model):
+    __tablename__ = 'reservation_items'
+
+    reservation_item_id = db.Column(db.Integer, primary_key=True)
+    reservation_id = db.Column(db.Integer, db.ForeignKey('reservations.reservation_id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+
+    # Relationships
+    reservation = db.relationship('Reservation', back_populates='items')
+    product = db.relationship('Product')
@@ -3,12 +3,20 @@ from datetime import datetime
 
 class Review(db.Model):
     __tablename__ = 'reviews'
-    
+    __table_args__ = (
+        # Public listing: approved reviews of one product, by date or by rating
+        db.Index('ix_reviews_product_id_status_created_at', 'product_id', 'status', 'created_at'),
+        db.Index('ix_reviews_product_id_status_rating', 'product_id', 'status', 'rating'),
+        # Moderation queue and aggregate rebuilds: reviews in a given status, oldest first
+        db.Index('ix_reviews_status_created_at', 'status', 'created_at'),
+    )
+
     review_id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False, index=True)
     rating = db.Column(db.Integer, nullable=False)
     review_text = db.Column(db.Text)
+    status = db.Column(db.Enum('pending', 'approved', 'rejected'), nullable=False, default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
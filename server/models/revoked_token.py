@@ -0,0 +1,13 @@
+from database import db
+from datetime import datetime
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+
+    revoked_token_id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True)  # a single revoked token
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    issued_before = db.Column(db.DateTime)  # or every token of the user issued up to this time
+    role = db.Column(db.Enum('user', 'admin'))  # the role the user was given at that time
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,37 @@
+from database import db
+
+ORDER_STATUSES = ('pending', 'shipped', 'completed', 'cancelled')
+
+
+# Rollup tables behind the admin analytics endpoints, maintained by analytics.py.
+# Days are the UTC date the order was placed.
+
+# Orders, units and revenue per day and order status
+class SalesByDay(db.Model):
+    __tablename__ = 'sales_by_day'
+
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.Enum(*ORDER_STATUSES), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+
+# Units and revenue per day and product, cancelled orders excluded
+class SalesByProduct(db.Model):
+    __tablename__ = 'sales_by_product'
+
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+
+# Units and revenue per day and product category, cancelled orders excluded
+class SalesByCategory(db.Model):
+    __tablename__ = 'sales_by_category'
+
+    day = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(100), primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
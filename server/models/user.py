@@ -1,5 +1,5 @@
 from database import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import password_hasher
 from datetime import datetime
 
 class User(db.Model):
@@ -18,10 +18,13 @@ class User(db.Model):
     reviews = db.relationship('Review', back_populates='user', cascade='all, delete-orphan')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
     
     def is_admin(self):
         return self.role == 'admin'
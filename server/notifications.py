@@ -0,0 +1,57 @@
+# notifications.py
+from flask import current_app
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from models import Product, Order, OrderItem
+from jobs import task
+
+# Flask-Mail, and smtplib behind it, is imported and configured on the first
+# email a process sends; only the job workers ever send one
+def _send_mail(**message):
+    from flask_mail import Mail, Message
+    if 'mail' not in current_app.extensions:
+        Mail(current_app._get_current_object())
+    current_app.extensions['mail'].send(Message(**message))
+
+
+@task('send_order_confirmation')
+def send_order_confirmation(order_id):
+    order = (Order.query
+             .options(joinedload(Order.user),
+                      selectinload(Order.order_items).joinedload(OrderItem.product).load_only(Product.name))
+             .filter_by(order_id=order_id).first())
+    if order is None:
+        return  # the order was deleted before the job ran
+    lines = [f"{item.quantity} x {item.product.name} @ {item.price_at_purchase}" for item in order.order_items]
+    _send_mail(
+        subject=f"Your Trendify order #{order.order_id}",
+        recipients=[order.user.email],
+        body="\n".join([
+            f"Hi {order.user.name},",
+            "",
+            "Thanks for your order. We will let you know when it ships.",
+            "",
+            *lines,
+            "",
+            f"Total: {order.total_amount}",
+            f"Shipping to: {order.shipping_address}",
+        ])
+    )
+
+
+@task('send_low_stock_alert')
+def send_low_stock_alert(product_ids):
+    recipients = current_app.config['STOCK_ALERT_RECIPIENTS']
+    if not recipients:
+        return
+    threshold = current_app.config['LOW_STOCK_THRESHOLD']
+    products = (Product.query
+                .options(load_only(Product.product_id, Product.name, Product.stock_quantity))
+                .filter(Product.product_id.in_(product_ids), Product.stock_quantity <= threshold)
+                .order_by(Product.product_id).all())
+    if not products:
+        return  # restocked in the meantime
+    _send_mail(
+        subject=f"Low stock: {len(products)} products",
+        recipients=recipients,
+        body="\n".join(f"#{p.product_id} {p.name}: {p.stock_quantity} left" for p in products)
+    )
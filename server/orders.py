@@ -0,0 +1,141 @@
+# orders.py
+from flask import current_app
+from sqlalchemy import update
+from database import db, begin_write
+from models import Order, OrderItem
+from inventory import (InventoryError, parse_items, load_products, reserve_stock, restore_stock,
+                       commit_reservation)
+from jobs import enqueue
+
+
+# The prices an order would be charged at differ from the ones the shopper was shown
+class PriceChanged(Exception):
+    def __init__(self, changes):
+        super().__init__("Prices changed since the cart was shown")
+        self.changes = changes
+
+
+# Validate one order request ({'items': [...]} or {'reservation_id': ...}, plus
+# 'shipping_address') before touching the session
+def parse_order(data):
+    if not isinstance(data, dict) or ('items' not in data and 'reservation_id' not in data) \
+            or 'shipping_address' not in data:
+        raise ValueError("Items and shipping address are required")
+    if not isinstance(data['shipping_address'], str) or not data['shipping_address'].strip():
+        raise ValueError("shipping_address must be a non-empty string")
+    if 'reservation_id' in data:
+        if not isinstance(data['reservation_id'], int):
+            raise ValueError("reservation_id must be an integer")
+        return None, data['reservation_id']
+    return parse_items(data['items']), None
+
+
+# Take the stock and add the order, its items and its follow-up jobs to the
+# session. The caller commits, or rolls back on InventoryError. Returns the order
+# and the new stock level of every product in it. With expected_prices
+# ({product_id: Decimal}), PriceChanged is raised (roll back too) unless every
+# product is charged at exactly that price.
+def build_order(user_id, shipping_address, quantities=None, reservation_id=None, expected_prices=None):
+    if reservation_id is None:
+        products = reserve_stock(quantities)
+    else:
+        # The stock was already taken out of the pool when the reservation was made
+        quantities = commit_reservation(reservation_id, user_id)
+        if quantities is None:
+            raise InventoryError("Reservation not found, already used or expired")
+        products = load_products(list(quantities))
+
+    if expected_prices is not None:
+        changes = [{"product_id": product_id, "old_price": expected_prices[product_id],
+                    "new_price": products[product_id].price}
+                   for product_id in sorted(quantities) if products[product_id].price != expected_prices[product_id]]
+        if changes:
+            raise PriceChanged(changes)
+
+    order = Order(user_id=user_id, shipping_address=shipping_address, total_amount=0)
+    db.session.add(order)
+
+    total_price = 0
+    for product_id, quantity in quantities.items():
+        product = products[product_id]
+        total_price += product.price * quantity
+        db.session.add(OrderItem(
+            order=order,
+            product=product,
+            quantity=quantity,
+            price_at_purchase=product.price
+        ))
+    order.total_amount = total_price
+
+    # Queue the side effects in the same transaction as the order
+    db.session.flush()
+    enqueue('send_order_confirmation', order_id=order.order_id)
+    enqueue('update_sales_rollups', order_id=order.order_id)
+    low_stock = [pid for pid, p in products.items() if p.stock_quantity <= current_app.config['LOW_STOCK_THRESHOLD']]
+    if low_stock:
+        enqueue('send_low_stock_alert', product_ids=low_stock)
+
+    return order, {pid: p.stock_quantity for pid, p in products.items()}
+
+
+# Place many orders in one transaction. Each order runs in a savepoint, so a
+# failed order is rolled back on its own and reported in its result; with
+# atomic=True any failure rolls back the whole batch. The caller commits.
+def build_orders(user_id, requests, atomic=False):
+    results, stock_levels, failed = [], {}, False
+    begin_write()
+    for index, data in enumerate(requests):
+        try:
+            quantities, reservation_id = parse_order(data)
+        except ValueError as e:
+            results.append({"index": index, "status": "error", "error": str(e)})
+            failed = True
+            continue
+
+        savepoint = db.session.begin_nested()
+        try:
+            order, levels = build_order(user_id, data['shipping_address'], quantities, reservation_id)
+            savepoint.commit()
+        except InventoryError as e:
+            savepoint.rollback()
+            results.append({"index": index, "status": "error", "error": str(e)})
+            failed = True
+            continue
+        stock_levels.update(levels)
+        results.append({"index": index, "status": "created", "order_id": order.order_id,
+                        "total_price": order.total_amount})
+
+    if atomic and failed:
+        for result in results:
+            if result['status'] == 'created':
+                result.update(status="rolled_back")
+                del result['order_id'], result['total_price']
+        return results, {}, False
+    return results, stock_levels, True
+
+
+# Allowed status changes; cancelling puts the items back in stock
+ORDER_TRANSITIONS = {
+    'pending': ('shipped', 'cancelled'),
+    'shipped': ('completed',),
+}
+
+
+# Move an order to a new status with a conditional UPDATE, so two admins can't
+# both cancel it and restock twice. Returns False when the order is not in a
+# status that can move to new_status. The caller commits.
+def set_order_status(order, new_status):
+    from_statuses = [status for status, targets in ORDER_TRANSITIONS.items() if new_status in targets]
+    result = db.session.execute(
+        update(Order)
+        .where(Order.order_id == order.order_id, Order.status.in_(from_statuses))
+        .values(status=new_status)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return False
+    if new_status == 'cancelled':
+        restore_stock({item.product_id: item.quantity for item in order.order_items})
+    db.session.expire(order, ['status'])
+    enqueue('update_sales_rollups', order_id=order.order_id)
+    return True
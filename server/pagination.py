@@ -0,0 +1,86 @@
+# pagination.py
+import base64
+import binascii
+import json
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Cursor tokens are url-safe base64 JSON so clients treat them as opaque strings
+def encode_cursor(sort, values):
+    payload = {"s": sort, "k": [v.isoformat() if isinstance(v, datetime) else v for v in values]}
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+# A cursor value must have its column's type; anything else (e.g. a list or an
+# object in a tampered cursor) would only fail once the query runs
+def _cursor_value(column, value):
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    accepted = (int, float) if python_type is float else python_type  # a float column may hold a whole number
+    if not isinstance(value, accepted) or (isinstance(value, bool) and python_type is not bool):
+        raise TypeError(f"expected {python_type.__name__}")
+    return value
+
+
+def decode_cursor(token, sort, keys):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = payload['k']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor("Invalid cursor")
+    if payload.get('s') != sort or not isinstance(values, list) or len(values) != len(keys):
+        raise InvalidCursor("Cursor does not match the requested sort")
+
+    decoded = []
+    for (column, _), value in zip(keys, values):
+        try:
+            decoded.append(_cursor_value(column, value))
+        except (TypeError, ValueError):
+            raise InvalidCursor("Invalid cursor")
+    return decoded
+
+
+# Read ?limit= and clamp it to the configured maximum
+def get_limit(args, default=None):
+    default = default or current_app.config['DEFAULT_PAGE_SIZE']
+    try:
+        limit = int(args.get('limit', default))
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, current_app.config['MAX_PAGE_SIZE'])
+
+
+def _after(keys, values):
+    # (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y), per-column direction
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        equal = [keys[j][0] == values[j] for j in range(i)]
+        step = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+
+# keys is a list of (column, descending) pairs whose last entry is unique (the primary key)
+def keyset_paginate(query, keys, sort, cursor, limit):
+    if cursor:
+        query = query.filter(_after(keys, decode_cursor(cursor, sort, keys)))
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in keys])
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, [getattr(last, column.key) for column, _ in keys])
+    return rows, next_cursor
@@ -0,0 +1,179 @@
+# passwords.py
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+
+try:
+    import argon2
+except ImportError:  # Optional dependency, only needed for PASSWORD_HASH_METHOD = 'argon2'
+    argon2 = None
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+# Run in the worker processes; kept free of app imports so workers start quickly
+def _hash(password, method, argon2_params):
+    if method == 'argon2':
+        return argon2.PasswordHasher(**argon2_params).hash(password)
+    return generate_password_hash(password, method)
+
+
+def _verify(password_hash, password):
+    if password_hash.startswith('$argon2'):
+        if argon2 is None:
+            # Fail closed: without argon2-cffi the hash can't be checked
+            logger.error("Refusing a password check: the stored hash is argon2 but argon2-cffi is not installed")
+            return False
+        try:
+            return argon2.PasswordHasher().verify(password_hash, password)
+        except (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHashError):
+            return False
+    return check_password_hash(password_hash, password)
+
+
+# Hashes and checks passwords in a bounded pool of worker processes, so a burst of
+# logins costs CPU on other cores instead of holding the request threads' GIL.
+# At most PASSWORD_HASH_MAX_PENDING hashes are queued or running; past that a
+# caller waits up to PASSWORD_HASH_TIMEOUT for a slot, then gets PasswordHasherBusy.
+class PasswordHasher:
+    def __init__(self):
+        self.method = 'scrypt'
+        self.argon2_params = {}
+        self.workers = 0
+        self.timeout = 5
+        self._slots = None
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._prefix = None
+        self._dummy_hash = None
+
+    def init_app(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        if self.method == 'argon2' and argon2 is None:
+            raise RuntimeError("PASSWORD_HASH_METHOD is 'argon2' but the argon2-cffi package is not installed")
+        self.argon2_params = app.config.get('PASSWORD_ARGON2_PARAMS', {})
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_MAX_PENDING'])
+        self._prefix = self._dummy_hash = None
+        app.extensions['password_hasher'] = self
+
+    def _executor(self):
+        # Created on first use, and again in each forked server worker
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy("Too many password checks in progress")
+        try:
+            future = self._executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method, self.argon2_params)
+
+    def verify(self, password_hash, password):
+        return self._run(_verify, password_hash, password)
+
+    # Hash many passwords in parallel, e.g. when seeding
+    def hash_many(self, passwords):
+        if not self.workers:
+            return [self.hash(password) for password in passwords]
+        return list(self._executor().map(
+            _hash, passwords, [self.method] * len(passwords), [self.argon2_params] * len(passwords)))
+
+    # Spend the same time on an unknown email as on a wrong password
+    def verify_dummy(self, password):
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash(os.urandom(16).hex())
+        self.verify(self._dummy_hash, password)
+        return False
+
+    # True when the hash was made with another algorithm or cost than configured
+    def needs_rehash(self, password_hash):
+        if self.method == 'argon2':
+            if not password_hash.startswith('$argon2'):
+                return True
+            return argon2.PasswordHasher(**self.argon2_params).check_needs_rehash(password_hash)
+        if self._prefix is None:
+            # werkzeug fills in default costs, so learn the full prefix from a real hash
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._prefix
+
+    def shutdown(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+
+
+password_hasher = PasswordHasher()
+
+
+# Counts failed logins per email and per client address in fixed windows. The
+# counts live in this process, so with N server workers an attacker gets up to
+# N times the configured attempts.
+class LoginThrottle:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._failures = {}  # key -> (window start, count)
+        self.window = 900
+        self.limits = {'email': 5, 'ip': 50}
+
+    def init_app(self, app):
+        self.window = app.config['LOGIN_FAILURE_WINDOW']
+        self.limits = {'email': app.config['LOGIN_MAX_FAILURES_PER_EMAIL'],
+                       'ip': app.config['LOGIN_MAX_FAILURES_PER_IP']}
+        app.extensions['login_throttle'] = self
+
+    def _keys(self, email, ip):
+        return [('email', (email or '').strip().lower()), ('ip', ip)]
+
+    # Seconds until the next attempt is allowed, or 0
+    def retry_after(self, email, ip):
+        now = time.monotonic()
+        with self._lock:
+            for kind, value in self._keys(email, ip):
+                started, count = self._failures.get((kind, value), (now, 0))
+                if now - started < self.window and count >= self.limits[kind]:
+                    return int(self.window - (now - started)) + 1
+        return 0
+
+    def failed(self, email, ip):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._failures) > 100000:
+                self._failures = {key: entry for key, entry in self._failures.items()
+                                  if now - entry[0] < self.window}
+            for key in self._keys(email, ip):
+                started, count = self._failures.get(key, (now, 0))
+                if now - started >= self.window:
+                    started, count = now, 0
+                self._failures[key] = (started, count + 1)
+
+    def succeeded(self, email):
+        with self._lock:
+            self._failures.pop(('email', (email or '').strip().lower()), None)
+
+
+login_throttle = LoginThrottle()
@@ -0,0 +1,100 @@
+# ratings.py
+from sqlalchemy import case, func, update
+from database import db
+from models import Product, Review
+
+RATINGS = range(1, 6)
+
+
+def _histogram_column(rating):
+    return getattr(Product, f'rating_{rating}')
+
+
+# Add (delta=1) or remove (delta=-1) one approved rating from a product's aggregates
+# with a single atomic UPDATE. rating_average is listed first so it is computed from
+# the pre-update counts on every backend.
+def _apply_rating(product_id, rating, delta):
+    new_count = Product.rating_count + delta
+    new_sum = Product.rating_sum + rating * delta
+    histogram = _histogram_column(rating)
+    db.session.execute(
+        update(Product)
+        .where(Product.product_id == product_id)
+        .ordered_values(
+            (Product.rating_average, case((new_count > 0, new_sum * 1.0 / new_count), else_=0)),
+            (Product.rating_count, new_count),
+            (Product.rating_sum, new_sum),
+            (histogram, histogram + delta),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _transition(review_id, from_statuses, to_status):
+    result = db.session.execute(
+        update(Review)
+        .where(Review.review_id == review_id, Review.status.in_(from_statuses))
+        .values(status=to_status)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+# Move a review to 'approved' or 'rejected' and keep the product aggregates in step.
+# Each status change is a conditional UPDATE, so concurrent moderators can't count a
+# review twice. Returns False when the review already had that status.
+def set_review_status(review, new_status):
+    if new_status == 'approved':
+        if not _transition(review.review_id, ['pending', 'rejected'], 'approved'):
+            return False
+        _apply_rating(review.product_id, review.rating, 1)
+    elif _transition(review.review_id, ['approved'], new_status):
+        _apply_rating(review.product_id, review.rating, -1)
+    elif not _transition(review.review_id, ['pending'], new_status):
+        return False
+    db.session.expire(review, ['status'])
+    return True
+
+
+def rating_summary(product):
+    return {
+        "average": round(product.rating_average, 2),
+        "count": product.rating_count,
+        "histogram": {str(r): getattr(product, f'rating_{r}') for r in RATINGS}
+    }
+
+
+# Recompute every product's aggregates from the approved rows in the reviews table
+def rebuild_ratings(batch_size=1000):
+    db.session.execute(update(Product).values(
+        rating_count=0, rating_sum=0, rating_average=0,
+        **{f'rating_{r}': 0 for r in RATINGS}
+    ))
+
+    rows = (db.session.query(
+                Review.product_id,
+                func.count(Review.review_id),
+                func.sum(Review.rating),
+                *[func.sum(case((Review.rating == r, 1), else_=0)) for r in RATINGS])
+            .filter(Review.status == 'approved')
+            .group_by(Review.product_id))
+
+    batch = []
+    updated = 0
+    for product_id, count, total, *histogram in rows.yield_per(batch_size):
+        batch.append({
+            'product_id': product_id,
+            'rating_count': count,
+            'rating_sum': total,
+            'rating_average': total / count,
+            **{f'rating_{r}': n for r, n in zip(RATINGS, histogram)}
+        })
+        if len(batch) == batch_size:
+            db.session.execute(update(Product), batch)
+            updated += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(update(Product), batch)
+        updated += len(batch)
+    db.session.commit()
+    return updated
@@ -1,16 +1,35 @@
 # routes.py
-from flask import Blueprint, request, jsonify, make_response
-from models import db, User, Product, Review, Order, OrderItem
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, request, jsonify, make_response, Response, stream_with_context, current_app, send_file, abort
+from models import db, User, Category, Product, Review, Order, OrderItem, Reservation, Job
+from database import database_health, pool_stats, use_replica
+from passwords import PasswordHasherBusy, password_hasher, login_throttle
 from functools import wraps
-from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
+from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity, get_jwt, verify_jwt_in_request
+from sqlalchemy.orm import load_only, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from datetime import date, datetime, timedelta
+from pagination import get_limit, keyset_paginate
+from search import product_index
+from cache import response_cache, cached_response
+from ratings import set_review_status
+from serializers import (json_response, stream_json_array, product_schema, user_schema,
+                         review_schema, order_schema, job_schema)
+import catalog_io
+from identity import identity_cache, identity_claims
+from inventory import (InventoryError, parse_items, retry_on_conflict, create_reservation,
+                       release_reservation)
+from orders import PriceChanged, parse_order, build_order, build_orders, set_order_status
+from idempotency import idempotent, release_key, store_response
+from jobs import job_queue
+import carts
+import categories
+from images import ImageError, attach_image, image_store
+from werkzeug.security import safe_join
+import analytics
 
 # Initialize Blueprint
 routes = Blueprint('routes', __name__)
 
-# Initialize JWT Manager
-jwt = JWTManager()
-
 # CORS CONFIGURATIONS
 def _build_cors_prelight_response():
     response = make_response()
@@ -24,18 +43,23 @@ def _build_cors_prelight_response():
 def error_response(message, status_code):
     return jsonify({"error": message}), status_code
 
-# Admin authorization decorator
+# Admin authorization decorator. The role comes from the signed token claim, so
+# this costs no queries; role changes revoke the user's older tokens instead.
 def admin_required(f):
     @wraps(f)
-    @jwt_required()  # Require a valid JWT to access this route
+    @jwt_required()  # Require a valid (and not revoked) JWT to access this route
     def decorated_function(*args, **kwargs):
         user_id = get_jwt_identity()  # Get the current user's ID from the JWT
         current_app.logger.debug(f"User ID from token: {user_id}")
-        user = User.query.get(user_id)
-        if not user:
-            current_app.logger.warning(f"User not found for ID: {user_id}")
-            return jsonify({"message": "User not found"}), 403
-        if not user.is_admin():
+        role = get_jwt().get('role')
+        if role is None:
+            # Tokens issued before the role claim existed
+            user = db.session.get(User, int(user_id))
+            if not user:
+                current_app.logger.warning(f"User not found for ID: {user_id}")
+                return jsonify({"message": "User not found"}), 403
+            role = user.role
+        if role != 'admin':
             current_app.logger.warning(f"User ID {user_id} is not an admin")
             return jsonify({"message": "Admin access required"}), 403
         return f(*args, **kwargs)
@@ -53,14 +77,13 @@ def register_admin():
     if User.query.filter_by(email=data['email']).first():
         return jsonify({"message": "Admin already exists"}), 400
 
-    hashed_password = generate_password_hash(data['password'])
     admin_user = User(
         name=data['name'],
         email=data['email'],
         phone_number=data['phone_number'],
-        password_hash=hashed_password,
         role='admin'  # Ensure 'admin' role is set correctly in your User model
     )
+    admin_user.set_password(data['password'])
     db.session.add(admin_user)
     db.session.commit()
 
@@ -108,15 +131,37 @@ def login():
     if not email or not password:
         return error_response("Email and password are required", 400)
 
+    # Throttled attempts are refused before any hashing work
+    retry_after = login_throttle.retry_after(email, request.remote_addr)
+    if retry_after:
+        return jsonify({"error": "Too many failed login attempts, try again later"}), 429, \
+            {'Retry-After': str(retry_after)}
+
     user = User.query.filter_by(email=email).first()
     
-    if user and user.check_password(password):  # Use the method defined in your User model
+    if user.check_password(password) if user else password_hasher.verify_dummy(password):
+        login_throttle.succeeded(email)
+        # Upgrade hashes made with an older algorithm or cost while we have the password
+        if user.password_needs_rehash():
+            user.set_password(password)
+            db.session.commit()
         # Create JWT token using the correct user ID attribute
-        access_token = create_access_token(identity=user.user_id)  # Correctly reference user_id
+        access_token = create_access_token(identity=str(user.user_id), additional_claims=identity_claims(user))
+        # Carry a guest cart over to the user's own cart
+        guest = carts.find_cart(token=request.headers.get('X-Cart-Token'))
+        if guest:
+            carts.merge_carts(carts.find_cart(user.user_id) or carts.create_cart(user.user_id), guest)
+            db.session.commit()
         return jsonify({"message": "Login successful", "access_token": access_token, "role": user.role}), 200
 
+    login_throttle.failed(email, request.remote_addr)
     return error_response("Invalid credentials", 401)
 
+# Password hashing is saturated: ask the client to come back shortly
+@routes.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(e):
+    return jsonify({"error": "The server is busy, please retry"}), 503, {'Retry-After': '1'}
+
 # Retrieve All Users (Admin Only)
 @routes.route('/users', methods=['GET'])
 @admin_required
@@ -126,21 +171,15 @@ def get_all_users():
     # Get the user ID from the JWT token
     user_id = get_jwt_identity()
     current_app.logger.debug(f"User ID from token: {user_id}")
-    users = User.query.all()
-    return jsonify([{
-        "user_id": user.user_id,
-        "name": user.name,
-        "email": user.email,
-        "phone_number": user.phone_number,
-        "role": user.role
-    } for user in users]), 200
+    users = User.query.options(load_only(*user_schema.columns())).order_by(User.user_id).yield_per(500)
+    return stream_json_array(users, user_schema)
 
 # Update User Role (Admin Only)
 @routes.route('/users/<int:user_id>/role', methods=['PATCH'])
 @admin_required
 def update_user_role(user_id):
     data = request.get_json()
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
     if not user:
         return error_response("User not found", 404)
 
@@ -148,39 +187,173 @@ def update_user_role(user_id):
     if new_role not in ['user', 'admin']:
         return error_response("Invalid role", 400)
 
-    user.role = new_role
+    if user.role != new_role:
+        user.role = new_role
+        # Tokens carrying the old role claim stop working (everywhere within IDENTITY_CACHE_TTL)
+        identity_cache.revoke_user(user.user_id, new_role)
     db.session.commit()
     return jsonify({"message": "User role updated successfully"}), 200
 
-# Retrieve All Products
+# Database Connection Pool Usage (Admin Only)
+@routes.route('/db/pool', methods=['GET'])
+@admin_required
+def get_pool_stats():
+    return jsonify(pool_stats()), 200
+
+# Liveness probe: the worker is up and answering requests
+@routes.route('/health/live', methods=['GET'])
+def liveness():
+    return jsonify({"status": "ok"}), 200
+
+# Readiness probe: 503 while a database is unreachable or its connection pool is exhausted
+@routes.route('/health/ready', methods=['GET'])
+def readiness():
+    databases = database_health()
+    ready = all(check['ok'] for check in databases.values())
+    return jsonify({"status": "ready" if ready else "unavailable", "databases": databases}), 200 if ready else 503
+
+# Background Jobs (Admin Only), ?status=dead lists the dead-letter queue
+@routes.route('/jobs', methods=['GET'])
+@admin_required
+def get_jobs():
+    status = request.args.get('status', 'dead')
+    if status not in ('queued', 'running', 'done', 'dead'):
+        return error_response("Invalid status", 400)
+    try:
+        jobs, next_cursor = keyset_paginate(
+            Job.query.filter_by(status=status), [(Job.job_id, True)], 'jobs',
+            request.args.get('cursor'), get_limit(request.args))
+    except ValueError as e:
+        return error_response(str(e), 400)
+    return json_response({"jobs": job_schema.dump_many(jobs), "next_cursor": next_cursor})
+
+# Requeue a Dead-Lettered Job (Admin Only)
+@routes.route('/jobs/<int:job_id>/retry', methods=['POST'])
+@admin_required
+def retry_job(job_id):
+    job = db.session.get(Job, job_id)
+    if not job:
+        return error_response("Job not found", 404)
+    if not job_queue.retry(job):
+        return error_response("Only dead jobs can be retried", 400)
+    db.session.commit()
+    return jsonify({"message": "Job requeued"}), 200
+
+# Logout (revokes the current access token)
+@routes.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    identity_cache.revoke_token(get_jwt())
+    return jsonify({"message": "Logged out successfully"}), 200
+
+# Cached catalog responses are dropped whenever a commit touches a product
+response_cache.watch(Product, 'catalog')
+response_cache.watch(Category, 'categories')
+
+# Keyset orderings for the product listing; the primary key is always the tie-breaker
+PRODUCT_SORTS = {
+    'id': [(Product.product_id, False)],
+    'newest': [(Product.created_at, True), (Product.product_id, True)],
+    'rating': [(Product.rating_average, True), (Product.product_id, True)],
+}
+
+# Retrieve Products (keyset paginated, ?category=<slug> includes its subcategories)
 @routes.route('/products', methods=['GET'])
+@cached_response('catalog')
+@use_replica
 def get_products():
-    products = Product.query.all()
-    return jsonify([{
-        "product_id": p.product_id,
-        "name": p.name,
-        "description": p.description,
-        "price": float(p.price),
-        "stock_quantity": p.stock_quantity,
-        "category": p.category,
-        "image_url": p.image_url
-    } for p in products]), 200
+    sort = request.args.get('sort', 'id')
+    if sort not in PRODUCT_SORTS:
+        return error_response(f"Invalid sort, expected one of: {', '.join(PRODUCT_SORTS)}", 400)
+    keys = PRODUCT_SORTS[sort]
+
+    try:
+        fields = product_schema.parse_fields(request.args.get('fields'))
+        limit = get_limit(request.args)
+        # Only load the requested columns (plus the sort keys) so listings skip the description text
+        columns = product_schema.columns(fields) | {column for column, _ in keys}
+        query = Product.query.options(load_only(*columns))
+        if request.args.get('category'):
+            node = categories.category_tree()[1].get(request.args['category'])
+            if node is None:
+                return error_response("Category not found", 404)
+            query = query.filter(Product.category_id.in_(categories.subtree_ids(node)))
+        products, next_cursor = keyset_paginate(query, keys, sort, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    response_cache.depends_on('catalog', [product.product_id for product in products])
+    return json_response({
+        "products": product_schema.dump_many(products, fields),
+        "next_cursor": next_cursor
+    })
 
 # Retrieve Single Product
 @routes.route('/products/<int:product_id>', methods=['GET'])
+@cached_response('catalog')
+@use_replica
 def get_product(product_id):
-    product = Product.query.get(product_id)
+    product = db.session.get(Product, product_id)
     if not product:
         return error_response("Product not found", 404)
-    return jsonify({
-        "product_id": product.product_id,
-        "name": product.name,
-        "description": product.description,
-        "price": float(product.price),
-        "stock_quantity": product.stock_quantity,
-        "category": product.category,
-        "image_url": product.image_url
-    }), 200
+    response_cache.depends_on('catalog', [product_id])
+    response = json_response(product_schema.dump(product))
+    response.last_modified = product.updated_at
+    return response
+
+def _optional_float(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+# Search Products (in-process inverted index with prefix/typo matching and category facets,
+# ?category=<slug> as on /products)
+@routes.route('/products/search', methods=['GET'])
+@use_replica
+def search_products():
+    try:
+        fields = product_schema.parse_fields(request.args.get('fields'))
+        limit = get_limit(request.args)
+        offset = request.args.get('offset', 0, type=int)
+        min_price = _optional_float(request.args, 'min_price')
+        max_price = _optional_float(request.args, 'max_price')
+    except ValueError as e:
+        return error_response(str(e), 400)
+    if offset < 0:
+        return error_response("offset must not be negative", 400)
+
+    in_stock = request.args.get('in_stock', '').lower() in ('1', 'true', 'yes')
+    # ?category=<slug> includes its subcategories, as on /products
+    category_ids = None
+    if request.args.get('category'):
+        node = categories.category_tree()[1].get(request.args['category'])
+        if node is None:
+            return error_response("Category not found", 404)
+        category_ids = set(categories.subtree_ids(node))
+    product_ids, facets = product_index.search(
+        request.args.get('q', ''),
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock,
+        category_ids=category_ids
+    )
+
+    # Fetch only the requested page, in one query, and keep the ranking order
+    page_ids = product_ids[offset:offset + limit]
+    products = {}
+    if page_ids:
+        query = Product.query.options(load_only(*product_schema.columns(fields)))
+        products = {p.product_id: p for p in query.filter(Product.product_id.in_(page_ids))}
+
+    return json_response({
+        "results": [product_schema.dump(products[pid], fields) for pid in page_ids if pid in products],
+        "total": len(product_ids),
+        "facets": {"category": facets}
+    })
 
 # Add New Product (Admin Only)
 @routes.route('/products', methods=['POST'])
@@ -189,20 +362,31 @@ def add_product():
     data = request.get_json()
     required_fields = ['name', 'description', 'price', 'stock_quantity', 'category']
     
+    # A category may be given by ID instead of by name
+    if 'category_id' in data:
+        required_fields.remove('category')
     missing_fields = [field for field in required_fields if field not in data]
     if missing_fields:
         return error_response(f"Missing fields: {', '.join(missing_fields)}", 400)
 
+    try:
+        category = categories.resolve_category(data)
+    except ValueError as e:
+        db.session.rollback()
+        return error_response(str(e), 400)
+
     product = Product(
         name=data['name'],
         description=data['description'],
         price=data['price'],
         stock_quantity=data['stock_quantity'],
-        category=data['category'],
         image_url=data.get('image_url')
     )
+    categories.file_product(product, category)
     db.session.add(product)
+    categories.count_product(category.category_id, product.stock_quantity, 1)
     db.session.commit()
+    product_index.add(product)
     return jsonify({"message": "Product added successfully"}), 201
 
 # Update Product (Admin Only)
@@ -210,30 +394,170 @@ def add_product():
 @admin_required
 def update_product(product_id):
     data = request.get_json()
-    product = Product.query.get(product_id)
+    product = db.session.get(Product, product_id)
     if not product:
         return error_response("Product not found", 404)
 
+    old_category_id, old_stock_quantity = product.category_id, product.stock_quantity
+    if 'category_id' in data or 'category' in data:
+        try:
+            categories.file_product(product, categories.resolve_category(data))
+        except ValueError as e:
+            db.session.rollback()
+            return error_response(str(e), 400)
+
     product.name = data.get('name', product.name)
     product.description = data.get('description', product.description)
     product.price = data.get('price', product.price)
     product.stock_quantity = data.get('stock_quantity', product.stock_quantity)
-    product.category = data.get('category', product.category)
     product.image_url = data.get('image_url', product.image_url)
+    categories.product_changed(product, old_category_id, old_stock_quantity)
     db.session.commit()
+    product_index.add(product)
     return jsonify({"message": "Product updated successfully"}), 200
 
 # Delete Product (Admin Only)
 @routes.route('/products/<int:product_id>', methods=['DELETE'])
 @admin_required
 def delete_product(product_id):
-    product = Product.query.get(product_id)
+    product = db.session.get(Product, product_id)
     if not product:
         return error_response("Product not found", 404)
+    categories.count_product(product.category_id, product.stock_quantity, -1)
     db.session.delete(product)
     db.session.commit()
+    product_index.remove(product_id)
     return jsonify({"message": "Product deleted successfully"}), 200
 
+# Upload a Product Image (Admin Only): multipart field "image", or {"fixture": name}
+# to take a file from IMAGE_FIXTURE_DIR. Resized variants are made in the background.
+@routes.route('/products/<int:product_id>/image', methods=['POST'])
+@admin_required
+def upload_product_image(product_id):
+    product = db.session.get(Product, product_id)
+    if not product:
+        return error_response("Product not found", 404)
+
+    try:
+        if 'image' in request.files:
+            image = attach_image(product, request.files['image'].stream)
+        else:
+            data = request.get_json(silent=True) or {}
+            fixture_dir = current_app.config['IMAGE_FIXTURE_DIR']
+            path = fixture_dir and isinstance(data.get('fixture'), str) and safe_join(fixture_dir, data['fixture'])
+            if not path:
+                return error_response("Send an image file or the name of a fixture", 400)
+            try:
+                with open(path, 'rb') as f:
+                    image = attach_image(product, f)
+            except FileNotFoundError:
+                return error_response("Fixture not found", 404)
+    except ImageError as e:
+        db.session.rollback()
+        return error_response(str(e), 400)
+    db.session.commit()
+    return jsonify({"message": "Image uploaded successfully", "image_id": image.image_id,
+                    "status": image.status}), 202 if image.status == 'pending' else 200
+
+# Image Variants: the hash in the URL pins the content, so responses never go stale
+@routes.route('/images/<sha256>/<name>', methods=['GET'])
+def get_image(sha256, name):
+    path = image_store.lookup(sha256, name)
+    if path is None:
+        abort(404)
+    response = send_file(path, max_age=current_app.config['IMAGE_CACHE_MAX_AGE'], etag=sha256 + name)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# Category Tree with product and in-stock counts (each including its subcategories)
+@routes.route('/categories', methods=['GET'])
+@cached_response('categories')
+@use_replica
+def get_categories():
+    roots, _ = categories.category_tree()
+    return json_response({"categories": roots})
+
+# Category Landing Page: the category, its path from the top and its subcategories
+@routes.route('/categories/<slug>', methods=['GET'])
+@cached_response('categories')
+@use_replica
+def get_category(slug):
+    _, by_slug = categories.category_tree()
+    node = by_slug.get(slug)
+    if node is None:
+        return error_response("Category not found", 404)
+    by_id = {n['category_id']: n for n in by_slug.values()}
+    breadcrumb = []
+    parent = by_id.get(node['parent_id'])
+    while parent is not None:
+        breadcrumb.insert(0, {"category_id": parent['category_id'], "name": parent['name'], "slug": parent['slug']})
+        parent = by_id.get(parent['parent_id'])
+    return json_response({"category": node, "breadcrumb": breadcrumb})
+
+# Add Category (Admin Only), optionally under a parent_id
+@routes.route('/categories', methods=['POST'])
+@admin_required
+def add_category():
+    data = request.get_json()
+    if not isinstance(data, dict) or not isinstance(data.get('name'), str) or not data['name'].strip():
+        return error_response("name must be a non-empty string", 400)
+    parent_id = data.get('parent_id')
+    if parent_id is not None and db.session.get(Category, parent_id) is None:
+        return error_response(f"Category with ID {parent_id} does not exist", 400)
+    try:
+        slug = categories.slugify(data['name'])
+    except ValueError as e:
+        return error_response(str(e), 400)
+    existing = Category.query.filter_by(slug=slug).first()
+    if existing:
+        return error_response(f"Category '{existing.name}' already exists", 409)
+
+    category = categories.get_or_create_category(data['name'], parent_id)
+    db.session.commit()
+    return jsonify({"message": "Category added successfully", "category_id": category.category_id,
+                    "slug": category.slug}), 201
+
+def _catalog_format():
+    fmt = request.args.get('format')
+    if not fmt:
+        content_type = request.mimetype or ''
+        fmt = 'csv' if content_type == 'text/csv' else 'jsonl'
+    if fmt not in catalog_io.FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(catalog_io.FORMATS)}")
+    return fmt
+
+# Bulk Import Products from a CSV or JSON Lines body (Admin Only)
+@routes.route('/products/import', methods=['POST'])
+@admin_required
+def import_products():
+    try:
+        fmt = _catalog_format()
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    result = catalog_io.import_products(
+        catalog_io.parse_rows(request.stream, fmt),
+        batch_size=current_app.config['IMPORT_BATCH_SIZE'],
+        max_errors=current_app.config['IMPORT_MAX_ERRORS']
+    )
+    product_index.reset()  # rebuilt from the table on the next search
+    return jsonify(result.to_dict()), 200
+
+# Bulk Export Products as CSV or JSON Lines (Admin Only)
+@routes.route('/products/export', methods=['GET'])
+@admin_required
+def export_products():
+    try:
+        fmt = _catalog_format()
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(catalog_io.export_products(fmt)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=products.{fmt}'
+    return response
+
 # Create Review for a Product
 @routes.route('/products/<int:product_id>/reviews', methods=['POST'])
 def add_review(product_id):
@@ -241,7 +565,7 @@ def add_review(product_id):
     user_id = data.get('user_id')
 
     # Check if the user exists
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
     if not user:
         return error_response("User not found", 404)
 
@@ -250,6 +574,9 @@ def add_review(product_id):
     if missing_fields:
         return error_response(f"Missing fields: {', '.join(missing_fields)}", 400)
 
+    if data['rating'] not in (1, 2, 3, 4, 5):
+        return error_response("Rating must be an integer from 1 to 5", 400)
+
     review = Review(
         product_id=product_id,
         user_id=user_id,
@@ -261,27 +588,88 @@ def add_review(product_id):
     db.session.commit()
     return jsonify({"message": "Review added successfully"}), 201
 
-# View Reviews for a Product
+# Keyset orderings for review listings; review_id is always the tie-breaker
+REVIEW_SORTS = {
+    'newest': [(Review.created_at, True), (Review.review_id, True)],
+    'highest': [(Review.rating, True), (Review.review_id, True)],
+    'lowest': [(Review.rating, False), (Review.review_id, True)],
+    'oldest': [(Review.created_at, False), (Review.review_id, False)],
+}
+
+def paginate_reviews(query, default_sort):
+    sort = request.args.get('sort', default_sort)
+    if sort not in REVIEW_SORTS:
+        raise ValueError(f"Invalid sort, expected one of: {', '.join(REVIEW_SORTS)}")
+    reviews, next_cursor = keyset_paginate(
+        query, REVIEW_SORTS[sort], sort, request.args.get('cursor'), get_limit(request.args))
+    return json_response({
+        "reviews": review_schema.dump_many(reviews),
+        "next_cursor": next_cursor
+    })
+
+# View Approved Reviews for a Product (paginated, ?sort=newest|highest|lowest)
 @routes.route('/products/<int:product_id>/reviews', methods=['GET'])
+@use_replica
 def get_reviews(product_id):
-    reviews = Review.query.filter_by(product_id=product_id).all()
-    return jsonify([{
-        "review_id": r.review_id,
-        "user_id": r.user_id,
-        "rating": r.rating,
-        "review_text": r.review_text,
-        "status": r.status
-    } for r in reviews]), 200
+    try:
+        return paginate_reviews(Review.query.filter_by(product_id=product_id, status='approved'), 'newest')
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+# Moderation Queue (Admin Only), oldest pending reviews first by default
+@routes.route('/reviews', methods=['GET'])
+@admin_required
+def get_moderation_queue():
+    status = request.args.get('status', 'pending')
+    if status not in ('pending', 'approved', 'rejected'):
+        return error_response("Invalid status", 400)
+    try:
+        return paginate_reviews(Review.query.filter_by(status=status), 'oldest')
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+# Bulk Approve/Reject Reviews (Admin Only)
+@routes.route('/reviews/moderate', methods=['PATCH'])
+@admin_required
+def moderate_reviews():
+    data = request.get_json()
+    if not data or 'review_ids' not in data or 'status' not in data:
+        return error_response("review_ids and status are required", 400)
+
+    review_ids = data['review_ids']
+    status = data['status']
+    if status not in ('approved', 'rejected'):
+        return error_response("status must be 'approved' or 'rejected'", 400)
+    if not isinstance(review_ids, list) or any(not isinstance(rid, int) for rid in review_ids):
+        return error_response("review_ids must be a list of integers", 400)
+    if len(review_ids) > current_app.config['MAX_PAGE_SIZE']:
+        return error_response(f"At most {current_app.config['MAX_PAGE_SIZE']} reviews per request", 400)
+
+    # One query for the reviews, then one conditional UPDATE per status change
+    reviews = {r.review_id: r for r in Review.query.filter(Review.review_id.in_(review_ids))}
+    results = {}
+    for review_id in review_ids:
+        review = reviews.get(review_id)
+        if not review:
+            results[review_id] = "not_found"
+        elif set_review_status(review, status):
+            results[review_id] = status
+        else:
+            results[review_id] = "unchanged"
+    db.session.commit()
+
+    return jsonify({"message": "Reviews moderated successfully", "results": results}), 200
 
 # Approve Review (Admin Only)
 @routes.route('/reviews/<int:review_id>/approve', methods=['PATCH'])
 @admin_required
 def approve_review(review_id):
-    review = Review.query.get(review_id)
+    review = db.session.get(Review, review_id)
     if not review:
         return error_response("Review not found", 404)
 
-    review.status = 'approved'
+    # Counts the rating towards the product aggregates unless it was already approved
+    set_review_status(review, 'approved')
     db.session.commit()
     return jsonify({"message": "Review approved successfully"}), 200
 
@@ -289,17 +677,19 @@ def approve_review(review_id):
 @routes.route('/reviews/<int:review_id>/reject', methods=['PATCH'])
 @admin_required
 def reject_review(review_id):
-    review = Review.query.get(review_id)
+    review = db.session.get(Review, review_id)
     if not review:
         return error_response("Review not found", 404)
 
-    review.status = 'rejected'
+    # Takes the rating back out of the product aggregates if it had been approved
+    set_review_status(review, 'rejected')
     db.session.commit()
     return jsonify({"message": "Review rejected successfully"}), 200
-from flask import current_app
+
 
 @routes.route('/orders', methods=['POST'])
 @jwt_required()
+@idempotent
 def place_order():
     # Log the incoming request headers for debugging
     current_app.logger.debug(f"Request headers: {request.headers}")
@@ -310,75 +700,360 @@ def place_order():
     
     if not user_id:
         return jsonify({"error": "User authentication failed"}), 401
+    user_id = int(user_id)
 
     data = request.get_json()
 
-    # Check for 'items' and 'shipping_address' in request data
-    if not data or 'items' not in data or 'shipping_address' not in data:
-        return jsonify({"error": "Items and shipping address are required"}), 400
-
-    items = data['items']
-    shipping_address = data['shipping_address']
+    # Check for 'items' (or a 'reservation_id' from POST /reservations) and 'shipping_address',
+    # and validate the items before touching the session
+    try:
+        quantities, reservation_id = parse_order(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # Validate 'items' format
-    if not isinstance(items, list) or any(not isinstance(item, dict) for item in items):
-        return jsonify({"error": "Items should be a list of objects with 'product_id' and 'quantity'"}), 400
+    def create_order():
+        order, stock_levels = build_order(user_id, data['shipping_address'], quantities, reservation_id)
+        response = store_response((jsonify({"message": "Order placed successfully", "order_id": order.order_id}), 201))
+        db.session.commit()
+        return order, stock_levels, response
 
-    # Create a new order
-    order = Order(user_id=user_id, shipping_address=shipping_address)
-    db.session.add(order)
+    try:
+        order, stock_levels, response = retry_on_conflict(create_order)
+    except InventoryError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
 
-    total_price = 0
-    for item in items:
-        product_id = item.get('product_id')
-        quantity = item.get('quantity')
+    for product_id, stock_quantity in stock_levels.items():
+        product_index.set_stock(product_id, stock_quantity)
 
-        if product_id is None or quantity is None:
-            return jsonify({"error": "Each item must have 'product_id' and 'quantity'"}), 400
+    current_app.logger.info(f"Order placed successfully for user {user_id} with order ID {order.order_id}")
+    return response
 
-        # Retrieve product
-        product = Product.query.get(product_id)
-        if not product:
-            return jsonify({"error": f"Product with ID {product_id} does not exist"}), 400
+# Place Many Orders in One Transaction (per-order results; "atomic": true for all-or-nothing)
+@routes.route('/orders/batch', methods=['POST'])
+@jwt_required()
+@idempotent
+def place_orders_batch():
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+    if not isinstance(data, dict) or not isinstance(data.get('orders'), list) or not data['orders']:
+        return error_response("orders must be a non-empty list", 400)
+    max_orders = current_app.config['MAX_BATCH_ORDERS']
+    if len(data['orders']) > max_orders:
+        return error_response(f"At most {max_orders} orders per batch", 400)
+    atomic = bool(data.get('atomic', False))
 
-        if product.stock_quantity < quantity:
-            return jsonify({"error": f"Insufficient stock for product ID {product_id}"}), 400
+    def create_orders():
+        results, stock_levels, ok = build_orders(user_id, data['orders'], atomic)
+        created = sum(1 for result in results if result['status'] == 'created')
+        response = json_response({"created": created, "failed": len(results) - created, "results": results},
+                                 status=201 if created else 400)
+        if ok:
+            store_response(response)
+            db.session.commit()
+        else:
+            db.session.rollback()
+        return results, created, stock_levels, response
 
-        # Calculate item price and update total
-        item_total_price = product.price * quantity
-        total_price += item_total_price
+    results, created, stock_levels, response = retry_on_conflict(create_orders)
+    for product_id, stock_quantity in stock_levels.items():
+        product_index.set_stock(product_id, stock_quantity)
 
-        order_item = OrderItem(
-            order=order,
-            product=product,
-            quantity=quantity,
-            price_at_purchase=product.price
-        )
-        db.session.add(order_item)
+    current_app.logger.info(f"Batch of {len(results)} orders for user {user_id}: {created} created")
+    return response
 
-        # Update product stock
-        product.stock_quantity -= quantity
+# Change an Order's Status (Admin Only); cancelling a pending order restocks its items
+@routes.route('/orders/<int:order_id>/status', methods=['PATCH'])
+@admin_required
+def update_order_status(order_id):
+    data = request.get_json()
+    new_status = data.get('status') if isinstance(data, dict) else None
+    if new_status not in ('shipped', 'completed', 'cancelled'):
+        return error_response("status must be one of: shipped, completed, cancelled", 400)
+    order = db.session.get(Order, order_id, options=[selectinload(Order.order_items)])
+    if not order:
+        return error_response("Order not found", 404)
 
-    # Set order total amount and commit
-    order.total_amount = total_price
+    previous_status = order.status
+    if not set_order_status(order, new_status):
+        db.session.rollback()
+        return error_response(f"A {previous_status} order can't be moved to {new_status}", 409)
     db.session.commit()
 
-    current_app.logger.info(f"Order placed successfully for user {user_id} with order ID {order.order_id}")
-    return jsonify({"message": "Order placed successfully", "order_id": order.order_id}), 201
+    if new_status == 'cancelled':
+        restocked = (Product.query.options(load_only(Product.product_id, Product.stock_quantity))
+                     .filter(Product.product_id.in_([item.product_id for item in order.order_items])))
+        for product in restocked:
+            product_index.set_stock(product.product_id, product.stock_quantity)
+    return jsonify({"message": "Order status updated successfully", "status": new_status}), 200
+
+# Shopping Cart: signed-in users have one cart; guests use the X-Cart-Token header
+# returned when their cart was created and merge it into their own when they log in
+def _cart_owner():
+    verify_jwt_in_request(optional=True)
+    user_id = get_jwt_identity()
+    return (int(user_id) if user_id else None), request.headers.get('X-Cart-Token')
+
+def _cart_response(cart, status=200):
+    summary = carts.summarize(cart) if cart and cart.items else carts.summarize_empty()
+    if cart and cart.token:
+        summary['cart_token'] = cart.token
+    return json_response(summary, status=status)
+
+def _save_cart(cart, status=200, summary=None):
+    try:
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return error_response("The cart was changed by another request, please retry", 409)
+    return json_response(summary, status=status) if summary else _cart_response(cart, status)
+
+@routes.route('/cart', methods=['GET'])
+def get_cart():
+    user_id, token = _cart_owner()
+    return _cart_response(carts.find_cart(user_id, token))
+
+@routes.route('/cart/items', methods=['POST'])
+def add_cart_item():
+    user_id, token = _cart_owner()
+    data = request.get_json()
+    if not isinstance(data, dict) or not isinstance(data.get('product_id'), int):
+        return error_response("product_id is required", 400)
+    cart = carts.find_cart(user_id, token) or carts.create_cart(user_id)
+    try:
+        carts.set_item(cart, data['product_id'], data.get('quantity', 1), add=True)
+    except carts.CartError as e:
+        db.session.rollback()
+        return error_response(str(e), 400)
+    return _save_cart(cart, 201)
+
+@routes.route('/cart/items/<int:product_id>', methods=['PUT'])
+def update_cart_item(product_id):
+    user_id, token = _cart_owner()
+    data = request.get_json()
+    cart = carts.find_cart(user_id, token)
+    if not cart:
+        return error_response("Cart not found", 404)
+    try:
+        carts.set_item(cart, product_id, (data or {}).get('quantity'))
+    except carts.CartError as e:
+        db.session.rollback()
+        return error_response(str(e), 400)
+    return _save_cart(cart)
+
+@routes.route('/cart/items/<int:product_id>', methods=['DELETE'])
+def remove_cart_item(product_id):
+    user_id, token = _cart_owner()
+    cart = carts.find_cart(user_id, token)
+    if not cart:
+        return error_response("Cart not found", 404)
+    carts.remove_item(cart, product_id)
+    return _save_cart(cart)
+
+# Merge a guest cart (X-Cart-Token) into the signed-in user's cart
+@routes.route('/cart/merge', methods=['POST'])
+@jwt_required()
+def merge_cart():
+    user_id = int(get_jwt_identity())
+    guest = carts.find_cart(token=request.headers.get('X-Cart-Token'))
+    cart = carts.find_cart(user_id) or carts.create_cart(user_id)
+    if guest:
+        carts.merge_carts(cart, guest)
+    return _save_cart(cart)
+
+# Check Out the Stored Cart. Price changes or missing stock since the cart was last
+# shown come back as a 409 with the diff; the new prices count as seen, so
+# confirming the checkout again goes through. Answers that depend on the cart
+# rather than on the request body are not kept for the Idempotency-Key, so that
+# confirmation can reuse the key.
+@routes.route('/cart/checkout', methods=['POST'])
+@jwt_required()
+@idempotent
+def checkout_cart():
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+    shipping_address = (data or {}).get('shipping_address')
+    if not isinstance(shipping_address, str) or not shipping_address.strip():
+        return error_response("shipping_address is required", 400)
+    cart = carts.find_cart(user_id)
+    if not cart or not cart.items:
+        return release_key(error_response("The cart is empty", 400))
 
-# Retrieve User Orders
+    summary = carts.summarize(cart)
+    if carts.has_changes(summary):
+        carts.acknowledge_prices(cart, summary)
+        return release_key(_save_cart(cart, 409, summary))
+
+    # The summary may come from a cache that missed another worker's price change,
+    # so the order itself checks that it charges the prices the shopper saw
+    def create_order():
+        order, stock_levels = build_order(user_id, shipping_address, carts.quantities(cart),
+                                          expected_prices=carts.seen_prices(cart))
+        carts.clear(cart)
+        response = store_response((jsonify({"message": "Order placed successfully", "order_id": order.order_id}), 201))
+        db.session.commit()
+        return stock_levels, response
+
+    try:
+        stock_levels, response = retry_on_conflict(create_order)
+    except PriceChanged:
+        db.session.rollback()
+        summary = carts.summarize(cart, fresh=True)
+        carts.acknowledge_prices(cart, summary)
+        return release_key(_save_cart(cart, 409, summary))
+    except (InventoryError, StaleDataError) as e:
+        db.session.rollback()
+        message = str(e) if isinstance(e, InventoryError) else "The cart changed, please retry"
+        return release_key(error_response(message, 409))
+
+    for product_id, stock_quantity in stock_levels.items():
+        product_index.set_stock(product_id, stock_quantity)
+    return response
+
+# Hold Stock for Checkout
+@routes.route('/reservations', methods=['POST'])
+@jwt_required()
+def create_stock_reservation():
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+    if not data or 'items' not in data:
+        return error_response("Items are required", 400)
+
+    try:
+        quantities = parse_items(data['items'])
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    def hold():
+        reservation = create_reservation(user_id, quantities)
+        db.session.commit()
+        return reservation
+
+    try:
+        reservation = retry_on_conflict(hold)
+    except InventoryError as e:
+        db.session.rollback()
+        return error_response(str(e), 400)
+
+    return jsonify({
+        "message": "Stock reserved successfully",
+        "reservation_id": reservation.reservation_id,
+        "expires_at": reservation.expires_at.isoformat()
+    }), 201
+
+# Release a Stock Hold
+@routes.route('/reservations/<int:reservation_id>', methods=['DELETE'])
+@jwt_required()
+def release_stock_reservation(reservation_id):
+    reservation = db.session.get(Reservation, reservation_id)
+    if not reservation or reservation.user_id != int(get_jwt_identity()):
+        return error_response("Reservation not found", 404)
+
+    def release():
+        released = release_reservation(reservation_id)
+        db.session.commit()
+        return released
+
+    if not retry_on_conflict(release):
+        return error_response("Reservation is no longer held", 409)
+    return jsonify({"message": "Reservation released successfully"}), 200
+
+def _optional_datetime(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO 8601 date or datetime")
+
+# Newest orders first; order_id breaks ties between orders created in the same instant
+ORDER_KEYS = [(Order.created_at, True), (Order.order_id, True)]
+
+# Retrieve User Orders (paginated, optionally filtered by ?start_date=&end_date=)
 @routes.route('/orders', methods=['GET'])
 @jwt_required()
+@use_replica
 def get_orders():
     user_id = get_jwt_identity()  # Get the ID of the logged-in user
-    orders = Order.query.filter_by(user_id=user_id).all()
-    return jsonify([{
-        "order_id": order.order_id,
-        "total_price": float(order.total_price),
-        "status": order.status,
-        "items": [{
-            "product_id": item.product_id,
-            "quantity": item.quantity
-        } for item in order.order_items]
-    } for order in orders]), 200
+    try:
+        limit = get_limit(request.args)
+        start_date = _optional_datetime(request.args, 'start_date')
+        end_date = _optional_datetime(request.args, 'end_date')
+
+        # Two queries per page: the orders, then their items joined to the products
+        query = Order.query.filter_by(user_id=user_id).options(
+            selectinload(Order.order_items)
+            .joinedload(OrderItem.product)
+            .load_only(Product.name, Product.price)
+        )
+        if start_date:
+            query = query.filter(Order.created_at >= start_date)
+        if end_date:
+            # A bare date includes the whole of that day
+            if len(request.args['end_date']) == 10:
+                end_date += timedelta(days=1)
+                query = query.filter(Order.created_at < end_date)
+            else:
+                query = query.filter(Order.created_at <= end_date)
+        orders, next_cursor = keyset_paginate(query, ORDER_KEYS, 'orders', request.args.get('cursor'), limit)
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    return json_response({
+        "orders": order_schema.dump_many(orders),
+        "next_cursor": next_cursor
+    })
+
+# Sales Analytics (Admin Only), read from the rollup tables maintained by analytics.py.
+# ?start=&end= are inclusive ISO dates and default to the last 30 days.
+def _analytics_range(args):
+    try:
+        end = date.fromisoformat(args['end']) if args.get('end') else datetime.utcnow().date()
+        start = date.fromisoformat(args['start']) if args.get('start') else end - timedelta(days=29)
+    except ValueError:
+        raise ValueError("start and end must be ISO 8601 dates")
+    if start > end:
+        raise ValueError("start must not be after end")
+    return start, end
 
+@routes.route('/analytics/sales', methods=['GET'])
+@admin_required
+@use_replica
+def get_daily_sales():
+    try:
+        start, end = _analytics_range(request.args)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    return json_response({"start": start, "end": end, "days": analytics.daily_sales(start, end)})
+
+@routes.route('/analytics/statuses', methods=['GET'])
+@admin_required
+@use_replica
+def get_sales_by_status():
+    try:
+        start, end = _analytics_range(request.args)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    return json_response({"start": start, "end": end, "statuses": analytics.sales_by_status(start, end)})
+
+@routes.route('/analytics/products', methods=['GET'])
+@admin_required
+@use_replica
+def get_top_products():
+    try:
+        start, end = _analytics_range(request.args)
+        limit = get_limit(request.args, default=10)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    return json_response({"start": start, "end": end, "products": analytics.top_products(start, end, limit)})
+
+@routes.route('/analytics/categories', methods=['GET'])
+@admin_required
+@use_replica
+def get_sales_by_category():
+    try:
+        start, end = _analytics_range(request.args)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    return json_response({"start": start, "end": end, "categories": analytics.sales_by_category(start, end)})
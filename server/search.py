@@ -0,0 +1,255 @@
+# search.py
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
+from database import db
+from models import Product
+
+# Field weights used when ranking matches
+FIELD_WEIGHTS = {'name': 3, 'category': 2, 'description': 1}
+
+# Exact token matches rank above prefix matches, which rank above typo matches
+EXACT, PREFIX, FUZZY = 1.0, 0.6, 0.4
+
+# Shortest query term that gets typo tolerance (one edit)
+MIN_FUZZY_LENGTH = 4
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    # "Men's Wear" -> ["mens", "wear"]
+    return TOKEN_RE.findall((text or '').lower().replace("'", ""))
+
+
+def _deletes(token):
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _within_one_edit(a, b):
+    # Damerau-Levenshtein distance <= 1
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    for i in range(len(b)):
+        if b[:i] + b[i + 1:] == a:
+            return True
+    return False
+
+
+def _indexed_products():
+    return Product.query.options(load_only(
+        Product.name, Product.description, Product.category, Product.category_id, Product.price,
+        Product.stock_quantity))
+
+
+# In-process inverted index over product name, description and category.
+# Built from the products table on first use. The product write routes update
+# the copy in their own process right away; writes made by other workers (or by
+# stock movements and imports) reach it through refresh(), which re-reads the
+# products whose updated_at moved at most every SEARCH_INDEX_REFRESH_SECONDS.
+class ProductIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._postings = {}   # token -> {product_id: weight}
+        self._docs = {}       # product_id -> (tokens, price, stock_quantity, category, category_id)
+        self._vocabulary = []  # sorted tokens, for prefix lookups
+        self._deletions = {}  # one-character deletion -> tokens, for typo lookups
+        self._synced_at = None  # newest products.updated_at read so far
+        self._checked_at = None  # time.monotonic() of the last refresh
+
+    def refresh(self):
+        interval = current_app.config['SEARCH_INDEX_REFRESH_SECONDS']
+        if self._built and time.monotonic() - self._checked_at < interval:
+            return
+        with self._lock:
+            if self._built and time.monotonic() - self._checked_at < interval:
+                return
+            checked_at = time.monotonic()
+            if self._built:
+                self._sync()
+            if not self._built:
+                self._build()
+            self._checked_at = checked_at
+
+    def _build(self):
+        self._postings, self._docs, self._vocabulary, self._deletions = {}, {}, [], {}
+        # Read before the scan, so rows changing during it are picked up by the next sync
+        self._synced_at = db.session.query(func.max(Product.updated_at)).scalar()
+        for product in _indexed_products().yield_per(1000):
+            self._add(product, bulk=True)
+        self._vocabulary = sorted(self._postings)
+        self._built = True
+
+    # Re-read the products changed since the last sync. The window reaches back
+    # SEARCH_INDEX_SYNC_OVERLAP seconds further, for transactions that committed
+    # after a newer one and for clock differences between hosts. Deletions leave
+    # no row behind, so the count and sum of the product ids are compared with the
+    # index: new products get ids above every existing one, so a deletion always
+    # moves at least one of the two, even when an insert evens out the count.
+    def _sync(self):
+        latest = db.session.query(func.max(Product.updated_at)).scalar()
+        changed = _indexed_products()
+        if self._synced_at is not None:
+            overlap = timedelta(seconds=current_app.config['SEARCH_INDEX_SYNC_OVERLAP'])
+            changed = changed.filter(Product.updated_at >= self._synced_at - overlap)
+        for product in changed:
+            self._remove(product.product_id)
+            self._add(product)
+        count, id_sum = db.session.query(func.count(Product.product_id), func.sum(Product.product_id)).one()
+        if (count, id_sum or 0) != (len(self._docs), sum(self._docs)):
+            # Drop the deleted products; a product missing from the index instead
+            # (e.g. inserted with an explicit id and an old updated_at) means a rebuild
+            existing = {product_id for product_id, in db.session.query(Product.product_id)}
+            for product_id in set(self._docs) - existing:
+                self._remove(product_id)
+            if len(existing) != len(self._docs):
+                self._built = False
+                return
+        self._synced_at = latest
+
+    # Drop everything; the next search rebuilds from the database
+    def reset(self):
+        with self._lock:
+            self._built = False
+            self._postings, self._docs, self._vocabulary, self._deletions = {}, {}, [], {}
+
+    # Incremental updates, called after the product write has committed
+    def add(self, product):
+        if not self._built:
+            return
+        with self._lock:
+            self._remove(product.product_id)
+            self._add(product)
+
+    def remove(self, product_id):
+        if not self._built:
+            return
+        with self._lock:
+            self._remove(product_id)
+
+    def set_stock(self, product_id, stock_quantity):
+        if not self._built:
+            return
+        with self._lock:
+            doc = self._docs.get(product_id)
+            if doc:
+                self._docs[product_id] = doc[:2] + (stock_quantity,) + doc[3:]
+
+    def _add(self, product, bulk=False):
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(getattr(product, field)):
+                weights[token] = weights.get(token, 0) + weight
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                if not bulk:
+                    self._vocabulary.insert(bisect_left(self._vocabulary, token), token)
+                if len(token) >= MIN_FUZZY_LENGTH:
+                    for deletion in _deletes(token):
+                        self._deletions.setdefault(deletion, set()).add(token)
+            postings[product.product_id] = weight
+        self._docs[product.product_id] = (
+            frozenset(weights), float(product.price), product.stock_quantity, product.category, product.category_id)
+
+    def _remove(self, product_id):
+        doc = self._docs.pop(product_id, None)
+        if not doc:
+            return
+        for token in doc[0]:
+            postings = self._postings[token]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+                if len(token) >= MIN_FUZZY_LENGTH:
+                    for deletion in _deletes(token):
+                        tokens = self._deletions[deletion]
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._deletions[deletion]
+
+    def _expand(self, term):
+        # Map a query term to {token: match quality}
+        matches = {}
+        if term in self._postings:
+            matches[term] = EXACT
+        i = bisect_left(self._vocabulary, term)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(term):
+            matches.setdefault(self._vocabulary[i], PREFIX)
+            i += 1
+        if len(term) >= MIN_FUZZY_LENGTH:
+            candidates = set(self._deletions.get(term, ()))
+            for deletion in _deletes(term):
+                if deletion in self._postings:
+                    candidates.add(deletion)
+                candidates |= self._deletions.get(deletion, set())
+            for token in candidates:
+                if token not in matches and _within_one_edit(term, token):
+                    matches[token] = FUZZY
+        return matches
+
+    # Returns (ranked product ids, category facet counts). Every query term has to
+    # match exactly, by prefix or within one typo. Facet counts honour the price and
+    # stock filters but not the category filter, so clients can offer the other
+    # categories alongside the selected one. category_ids limits the results to
+    # those categories, e.g. a category and its subcategories.
+    def search(self, query, min_price=None, max_price=None, in_stock=False, category_ids=None):
+        self.refresh()
+        with self._lock:
+            terms = tokenize(query)
+            if terms:
+                scores = None
+                for term in terms:
+                    term_scores = {}
+                    for token, quality in self._expand(term).items():
+                        for product_id, weight in self._postings[token].items():
+                            score = weight * quality
+                            if score > term_scores.get(product_id, 0):
+                                term_scores[product_id] = score
+                    if scores is None:
+                        scores = term_scores
+                    else:
+                        scores = {pid: scores[pid] + s for pid, s in term_scores.items() if pid in scores}
+                    if not scores:
+                        break
+            else:
+                scores = dict.fromkeys(self._docs, 0)
+
+            facets = Counter()
+            ranked = []
+            for product_id, score in scores.items():
+                _, price, stock, product_category, category_id = self._docs[product_id]
+                if min_price is not None and price < min_price:
+                    continue
+                if max_price is not None and price > max_price:
+                    continue
+                if in_stock and stock <= 0:
+                    continue
+                facets[product_category] += 1
+                if category_ids is None or category_id in category_ids:
+                    ranked.append((-score, product_id))
+
+        ranked.sort()
+        return [product_id for _, product_id in ranked], dict(facets)
+
+
+product_index = ProductIndex()
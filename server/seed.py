@@ -1,34 +1,38 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash
 from app import create_app
 from database import db
 from models import User, Product, Review, Order, OrderItem
+from ratings import rebuild_ratings
+from categories import get_or_create_category, file_product, rebuild_category_counts
+from analytics import rebuild_sales_rollups
+from passwords import password_hasher
 
-app = create_app()
 
-with app.app_context():
+def seed():
     # Drop all tables and recreate them for clean seeding (optional, use with caution)
     db.drop_all()
     db.create_all()
 
-    # Seed Users
+    # Seed Users, hashing their passwords in parallel
+    password1, password2, admin_password = password_hasher.hash_many(
+        ["password123", "securepassword", "adminpassword"])
     user1 = User(
         name="John Doe",
         email="john@example.com",
         phone_number="1234567890",
-        password_hash=generate_password_hash("password123"),
+        password_hash=password1,
     )
     user2 = User(
         name="Jane Smith",
         email="jane@example.com",
         phone_number="0987654321",
-        password_hash=generate_password_hash("securepassword"),
+        password_hash=password2,
     )
     admin = User(
         name="Admin User",
         email="admin@example.com",
         phone_number="1112223333",
-        password_hash=generate_password_hash("adminpassword"),
+        password_hash=admin_password,
     )
     db.session.add_all([user1, user2, admin])
     db.session.commit()  # Commit here to ensure users have IDs assigned
@@ -269,40 +273,45 @@ with app.app_context():
         ),
     ]
 
-    # Add all products to the session and commit
+    # File each product under its normalized category
+    for product in products:
+        file_product(product, get_or_create_category(product.category))
+
+    # Add all products to the session
     db.session.add_all(products)
-    db.session.commit()  # Commit products to ensure they have IDs
+    db.session.flush()  # Flush products to assign IDs without re-querying them
 
-    # Retrieve product IDs after committing
-    product1 = Product.query.filter_by(name="Vintage Leather Jacket").first()
-    product2 = Product.query.filter_by(name="Handmade Silver Necklace").first()
-    product3 = Product.query.filter_by(name="Running Shoes").first()
-    product4 = Product.query.filter_by(name="Classic White T-Shirt").first()
-    product5 = Product.query.filter_by(name="Blue Denim Jeans").first()
-    product6 = Product.query.filter_by(name="Leather Backpack").first()
-    product7 = Product.query.filter_by(name="Sports Watch").first()
-    product8 = Product.query.filter_by(name="Summer Dress").first()
-    product9 = Product.query.filter_by(name="Canvas Sneakers").first()
-    product10 = Product.query.filter_by(name="Silk Scarf").first()
-    product11 = Product.query.filter_by(name="Floral Print Blouse").first()
-    product12 = Product.query.filter_by(name="Wool Sweater").first()
-    product13 = Product.query.filter_by(name="Classic Sunglasses").first()
-    product14 = Product.query.filter_by(name="Leather Wallet").first()
-    product15 = Product.query.filter_by(name="Winter Coat").first()
-    product16 = Product.query.filter_by(name="Casual Shorts").first()
-    product17 = Product.query.filter_by(name="Yoga Mat").first()
-    product18 = Product.query.filter_by(name="Bluetooth Headphones").first()
-    product19 = Product.query.filter_by(name="Smartphone Stand").first()
-    product20 = Product.query.filter_by(name="Cookbook").first()
-    product21 = Product.query.filter_by(name="Ceramic Mug").first()
-    product22 = Product.query.filter_by(name="Wall Art").first()
-    product23 = Product.query.filter_by(name="Guitar").first()
-    product24 = Product.query.filter_by(name="Fitness Tracker").first()
-    product25 = Product.query.filter_by(name="Table Lamp").first()
-    product26 = Product.query.filter_by(name="Pet Bed").first()
-    product27 = Product.query.filter_by(name="Gardening Tools Set").first()
-    product28 = Product.query.filter_by(name="Wireless Charger").first()
-    product29 = Product.query.filter_by(name="Board Game").first()
+    # Look the products up by name from the objects already in memory
+    products_by_name = {product.name: product for product in products}
+    product1 = products_by_name["Vintage Leather Jacket"]
+    product2 = products_by_name["Handmade Silver Necklace"]
+    product3 = products_by_name["Running Shoes"]
+    product4 = products_by_name["Classic White T-Shirt"]
+    product5 = products_by_name["Blue Denim Jeans"]
+    product6 = products_by_name["Leather Backpack"]
+    product7 = products_by_name["Sports Watch"]
+    product8 = products_by_name["Summer Dress"]
+    product9 = products_by_name["Canvas Sneakers"]
+    product10 = products_by_name["Silk Scarf"]
+    product11 = products_by_name["Floral Print Blouse"]
+    product12 = products_by_name["Wool Sweater"]
+    product13 = products_by_name["Classic Sunglasses"]
+    product14 = products_by_name["Leather Wallet"]
+    product15 = products_by_name["Winter Coat"]
+    product16 = products_by_name["Casual Shorts"]
+    product17 = products_by_name["Yoga Mat"]
+    product18 = products_by_name["Bluetooth Headphones"]
+    product19 = products_by_name["Smartphone Stand"]
+    product20 = products_by_name["Cookbook"]
+    product21 = products_by_name["Ceramic Mug"]
+    product22 = products_by_name["Wall Art"]
+    product23 = products_by_name["Guitar"]
+    product24 = products_by_name["Fitness Tracker"]
+    product25 = products_by_name["Table Lamp"]
+    product26 = products_by_name["Pet Bed"]
+    product27 = products_by_name["Gardening Tools Set"]
+    product28 = products_by_name["Wireless Charger"]
+    product29 = products_by_name["Board Game"]
     
     # Seed Reviews
     review1 = Review(
@@ -310,6 +319,7 @@ with app.app_context():
         user_id=user1.user_id,
         rating=5,
         review_text="Amazing quality and perfect fit!",
+        status="approved",
         created_at=datetime.utcnow(),
     )
     review2 = Review(
@@ -317,6 +327,7 @@ with app.app_context():
         user_id=user2.user_id,
         rating=4,
         review_text="Beautiful necklace, but a bit overpriced.",
+        status="approved",
         created_at=datetime.utcnow(),
     )
     # Add more reviews as needed, using other products and users
@@ -325,11 +336,14 @@ with app.app_context():
         user_id=user1.user_id,
         rating=5,
         review_text="These running shoes are super comfortable!",
+        status="approved",
         created_at=datetime.utcnow(),
     )
     
     db.session.add_all([review1, review2, review3])
     db.session.commit()  # Commit reviews
+    rebuild_ratings()  # Fill in the product rating aggregates
+    rebuild_category_counts()  # And the per-category product counts
 
     # Seed Orders and Order Items
     order1 = Order(
@@ -372,4 +386,16 @@ with app.app_context():
 
     # Commit all orders and order items
     db.session.commit()
+    rebuild_sales_rollups()  # Count them in the sales analytics, as their rollup jobs would
     print("Database seeded successfully!")
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        seed()
+
+
+# Guarded because the password hashing pool's worker processes import this module
+if __name__ == '__main__':
+    main()
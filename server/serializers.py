@@ -0,0 +1,155 @@
+# serializers.py
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Response, stream_with_context
+from models import User, Product, Review, Order, OrderItem, Job
+from ratings import rating_summary
+from instrumentation import instrumentation
+from images import image_store
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, the standard library encoder is used without it
+    orjson = None
+
+
+def _default(value):
+    # Numeric columns come back as Decimal; at scale 2 the shortest float repr is exact
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(data):
+        return orjson.dumps(data, default=_default)
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(',', ':'), ensure_ascii=False)
+
+    def dumps(data):
+        return _encoder.encode(data).encode('utf-8')
+
+
+def json_response(data, status=200):
+    with instrumentation.timed_serialization():
+        body = dumps(data)
+    return Response(body, status=status, mimetype='application/json')
+
+
+# Stream a JSON array of serialized objects in chunks, so neither the full list of
+# dicts nor the full response body is ever held in memory
+def stream_json_array(objects, schema, fields=None, chunk_size=500):
+    def generate():
+        yield b'['
+        chunk = []
+        first = True
+        for obj in objects:
+            chunk.append(dumps(schema.dump(obj, fields)))
+            if len(chunk) >= chunk_size:
+                yield (b'' if first else b',') + b','.join(chunk)
+                first = False
+                chunk = []
+        if chunk:
+            yield (b'' if first else b',') + b','.join(chunk)
+        yield b']'
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+# A field computed from one or more columns
+class Field:
+    def __init__(self, dump, columns=()):
+        self.dump = dump
+        self.columns = columns
+
+
+# A nested collection serialized with another schema
+class Nested:
+    def __init__(self, attribute, schema):
+        self.attribute = attribute
+        self.schema = schema
+        self.columns = ()
+
+    def dump(self, obj):
+        return [self.schema.dump(child) for child in getattr(obj, self.attribute)]
+
+
+# Declarative field list for a model. Plain names are copied from the attribute of
+# the same name; Field and Nested entries compute their value.
+class Schema:
+    def __init__(self, model, *names, **computed):
+        self.model = model
+        self.fields = {name: None for name in names}
+        self.fields.update(computed)
+
+    def dump(self, obj, fields=None):
+        data = {}
+        for name in fields or self.fields:
+            field = self.fields[name]
+            data[name] = getattr(obj, name) if field is None else field.dump(obj)
+        return data
+
+    def dump_many(self, objs, fields=None):
+        with instrumentation.timed_serialization():
+            return [self.dump(obj, fields) for obj in objs]
+
+    # Parse ?fields=a,b into a validated list that always starts with the primary key
+    def parse_fields(self, raw):
+        if not raw:
+            return list(self.fields)
+        fields = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = [name for name in fields if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        primary_key = self.model.__mapper__.primary_key[0].key
+        if primary_key not in fields:
+            fields.insert(0, primary_key)
+        return fields
+
+    # The model columns needed to dump the given fields, for load_only()
+    def columns(self, fields=None):
+        columns = set()
+        for name in fields or self.fields:
+            field = self.fields[name]
+            if field is None:
+                columns.add(getattr(self.model, name))
+            else:
+                columns.update(field.columns)
+        return columns
+
+
+product_schema = Schema(
+    Product,
+    'product_id', 'name', 'description', 'price', 'stock_quantity', 'category',
+    # Uploaded images replace the legacy image_url with the default-size variant
+    image_url=Field(lambda product: image_store.default_url(product.image_hash) if product.image_hash
+                    else product.image_url, columns=(Product.image_url, Product.image_hash)),
+    image=Field(lambda product: image_store.srcset(product.image_hash) if product.image_hash else None,
+                columns=(Product.image_hash,)),
+    rating=Field(rating_summary, columns=(
+        Product.rating_average, Product.rating_count, Product.rating_1, Product.rating_2,
+        Product.rating_3, Product.rating_4, Product.rating_5))
+)
+
+user_schema = Schema(User, 'user_id', 'name', 'email', 'phone_number', 'role')
+
+review_schema = Schema(
+    Review, 'review_id', 'product_id', 'user_id', 'rating', 'review_text', 'status', 'created_at')
+
+order_item_schema = Schema(
+    OrderItem, 'product_id', 'quantity', 'price_at_purchase',
+    name=Field(lambda item: item.product.name),
+    price=Field(lambda item: item.product.price)
+)
+
+order_schema = Schema(
+    Order, 'order_id', 'status', 'shipping_address', 'created_at',
+    total_price=Field(lambda order: order.total_amount),
+    items=Nested('order_items', order_item_schema)
+)
+
+job_schema = Schema(
+    Job, 'job_id', 'name', 'payload', 'status', 'attempts', 'max_attempts', 'run_at', 'last_error',
+    'created_at', 'finished_at')
@@ -0,0 +1,82 @@
+# serving.py
+import gc
+import os
+from config import Config
+from database import db
+from jobs import job_queue
+from passwords import password_hasher
+
+
+def usable_cores():
+    try:
+        return len(os.sched_getaffinity(0))  # honours CPU pinning, e.g. in containers
+    except AttributeError:  # not available on macOS
+        return os.cpu_count() or 1
+
+
+# Gunicorn settings for serving web:app on every core, loaded by gunicorn.conf.py.
+# - One process per core, since the GIL lets each run Python on one core at a time,
+#   and a few threads per process to overlap database and network waits. Threads
+#   are capped at DB_POOL_SIZE so they never queue for a pooled connection.
+# - preload_app imports the app once in the master; the workers are forked from it
+#   and share those pages copy-on-write instead of each importing everything again.
+# - Graceful reloads: SIGHUP replaces the workers one by one with the same preloaded
+#   code (e.g. for new settings). To deploy new code without dropping requests,
+#   send SIGUSR2 (a new master starts next to the old one on the same socket), then
+#   SIGWINCH and SIGQUIT to the old master once /health/ready answers on the new one.
+#   Old workers finish their requests for up to SERVER_GRACEFUL_TIMEOUT seconds.
+def gunicorn_settings(config=Config):
+    return {
+        'bind': config.SERVER_BIND,
+        'workers': config.SERVER_WORKERS or usable_cores(),
+        'worker_class': 'gthread',
+        'threads': config.SERVER_THREADS or min(4, config.DB_POOL_SIZE),
+        'preload_app': True,
+        'timeout': config.SERVER_TIMEOUT,
+        'graceful_timeout': config.SERVER_GRACEFUL_TIMEOUT,
+        'keepalive': config.SERVER_KEEPALIVE,
+        # Recycling workers bounds slow memory growth; the jitter keeps them from all restarting at once
+        'max_requests': config.SERVER_MAX_REQUESTS,
+        'max_requests_jitter': config.SERVER_MAX_REQUESTS // 10,
+        'accesslog': '-',
+        'when_ready': when_ready,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+    }
+
+
+def _dispose_engines(app, close):
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+# In the master, after the app was preloaded and before any worker is forked
+def when_ready(server):
+    if server.cfg.workers > 1 and Config.CACHE_BACKEND == 'memory':
+        server.log.warning("CACHE_BACKEND is 'memory' with %d workers: each worker caches apart and "
+                           "misses the others' writes for up to CACHE_DEFAULT_TTL seconds; "
+                           "set CACHE_BACKEND=redis", server.cfg.workers)
+    if not server.cfg.preload_app:
+        return
+    app = server.app.wsgi()
+    # Connections opened while loading must not be shared by the forked workers
+    _dispose_engines(app, close=True)
+    # Job threads would not survive the fork; each worker starts its own (post_fork)
+    job_queue.stop()
+    # Keep the garbage collector from touching, and so copying, the preloaded objects
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    app = server.app.wsgi()
+    _dispose_engines(app, close=False)
+    if app.config['JOB_WORKERS_IN_PROCESS']:
+        job_queue.start(app.config['JOB_WORKERS_IN_PROCESS'])
+
+
+def worker_exit(server, worker):
+    job_queue.stop(timeout=server.cfg.graceful_timeout)
+    password_hasher.shutdown()
@@ -0,0 +1,79 @@
+# conftest.py
+import os
+
+# Set before config.py is imported: an in-memory database and cheap, inline password hashing
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+
+import pytest
+from flask_jwt_extended import create_access_token
+from app import create_app
+from database import db
+from identity import identity_cache, identity_claims
+from categories import file_product, get_or_create_category
+from models import Product, User
+from search import product_index
+
+
+@pytest.fixture
+def app():
+    app = create_app(cli=False)
+    app.config['TESTING'] = True
+    identity_cache.reset()
+    product_index.reset()
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+# Add a user with the password "secret"; returns its id
+@pytest.fixture
+def make_user(app):
+    def make(email, role='user'):
+        with app.app_context():
+            user = User(name=email.split('@')[0], email=email, phone_number=1, role=role)
+            user.set_password('secret')
+            db.session.add(user)
+            db.session.commit()
+            return user.user_id
+    return make
+
+
+# A bearer header for a user's token, signed with their current claims unless
+# `claims` overrides them (e.g. a past iat)
+@pytest.fixture
+def auth_header(app):
+    def header(user_id, **claims):
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            claims = {**identity_claims(user), **claims}
+            token = create_access_token(identity=str(user_id), additional_claims=claims)
+        return {'Authorization': f'Bearer {token}'}
+    return header
+
+
+@pytest.fixture
+def admin(make_user, auth_header):
+    return auth_header(make_user('admin@example.com', role='admin'))
+
+
+# Add a product; returns its id
+@pytest.fixture
+def make_product(app):
+    def make(name='Mug', price='10.00', stock=10, category='Kitchen'):
+        with app.app_context():
+            product = Product(name=name, description=f'A {name}', price=price, stock_quantity=stock)
+            file_product(product, get_or_create_category(category))
+            db.session.add(product)
+            db.session.commit()
+            return product.product_id
+    return make
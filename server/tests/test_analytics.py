@@ -0,0 +1,85 @@
+# test_analytics.py
+import pytest
+from analytics import rebuild_sales_rollups
+from database import db
+from jobs import job_queue
+from models import Order, Product
+
+
+@pytest.fixture
+def headers(make_user, auth_header):
+    return auth_header(make_user('user@example.com'))
+
+
+def place(client, headers, *items):
+    order = {'items': [{'product_id': product_id, 'quantity': quantity} for product_id, quantity in items],
+             'shipping_address': '1 Main St'}
+    response = client.post('/orders', json=order, headers=headers)
+    assert response.status_code == 201
+    return response.get_json()['order_id']
+
+
+def report(client, admin):
+    return {name: client.get(f'/analytics/{name}', headers=admin).get_json()[key]
+            for name, key in (('sales', 'days'), ('statuses', 'statuses'),
+                              ('products', 'products'), ('categories', 'categories'))}
+
+
+def test_rollups_follow_orders_and_status_changes(app, client, make_product, headers, admin):
+    mug = make_product('Mug', '10.00')
+    lamp = make_product('Lamp', '25.00', category='Home')
+    first = place(client, headers, (mug, 2), (lamp, 1))
+    second = place(client, headers, (mug, 1))
+    assert job_queue.run_pending() >= 2
+
+    rollups = report(client, admin)
+    assert [(day['orders'], day['units'], day['revenue']) for day in rollups['sales']] == [(2, 4, 55.0)]
+    assert [(row['status'], row['orders']) for row in rollups['statuses']] == [('pending', 2)]
+    assert [(row['name'], row['units'], row['revenue']) for row in rollups['products']] == \
+        [('Mug', 3, 30.0), ('Lamp', 1, 25.0)]
+    assert [(row['category'], row['revenue']) for row in rollups['categories']] == \
+        [('Kitchen', 30.0), ('Home', 25.0)]
+
+    assert client.patch(f'/orders/{first}/status', json={'status': 'cancelled'}, headers=admin).status_code == 200
+    assert client.patch(f'/orders/{second}/status', json={'status': 'shipped'}, headers=admin).status_code == 200
+    job_queue.run_pending()
+    job_queue.run_pending()  # a rerun changes nothing
+
+    rollups = report(client, admin)
+    assert [(day['orders'], day['revenue']) for day in rollups['sales']] == [(1, 10.0)]
+    assert [(row['status'], row['orders']) for row in rollups['statuses']] == [('cancelled', 1), ('shipped', 1)]
+    assert [(row['name'], row['units']) for row in rollups['products']] == [('Mug', 1)]
+    assert [row['category'] for row in rollups['categories']] == ['Kitchen']
+
+    # The rebuild recomputes the same figures from the order items
+    with app.app_context():
+        rebuild_sales_rollups(batch_size=1)
+        assert {order.rolled_up_status for order in Order.query} == {'cancelled', 'shipped'}
+    assert report(client, admin) == rollups
+
+
+def test_order_status_transitions(app, client, make_product, headers, admin):
+    product_id = make_product(stock=5)
+    order_id = place(client, headers, (product_id, 2))
+
+    def patch(status):
+        return client.patch(f'/orders/{order_id}/status', json={'status': status}, headers=admin)
+
+    assert patch('pending').status_code == 400
+    assert patch('completed').status_code == 409
+    assert client.patch(f'/orders/{order_id}/status', json={'status': 'shipped'}, headers=headers).status_code == 403
+    assert client.patch('/orders/999/status', json={'status': 'shipped'}, headers=admin).status_code == 404
+
+    assert patch('cancelled').status_code == 200
+    assert patch('cancelled').status_code == 409  # restocked only once
+    with app.app_context():
+        assert db.session.get(Product, product_id).stock_quantity == 5
+        assert db.session.get(Order, order_id).status == 'cancelled'
+
+
+def test_analytics_range_is_validated(client, admin, headers):
+    assert client.get('/analytics/sales?start=2026-02-01&end=2026-01-01', headers=admin).status_code == 400
+    assert client.get('/analytics/sales?start=yesterday', headers=admin).status_code == 400
+    assert client.get('/analytics/sales', headers=headers).status_code == 403
+    body = client.get('/analytics/sales?start=2026-01-01&end=2026-01-31', headers=admin).get_json()
+    assert (body['start'], body['end'], body['days']) == ('2026-01-01', '2026-01-31', [])
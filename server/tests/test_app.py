@@ -0,0 +1,34 @@
+# test_app.py
+import json
+import os
+import subprocess
+import sys
+from app import create_app
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Which of the CLI-only and optional modules a fresh interpreter has imported
+# after building the app and serving one request
+_PROBE = """
+import json, sys
+from app import create_app
+app = create_app(cli=sys.argv[1] == 'cli')
+app.test_client().get('/health/live')
+print(json.dumps({name: name in sys.modules for name in ('alembic', 'flask_migrate', 'flask_mail', 'PIL')}))
+"""
+
+
+def loaded_modules(mode):
+    result = subprocess.run([sys.executable, '-c', _PROBE, mode], cwd=SERVER_DIR, capture_output=True,
+                            text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_web_workers_skip_cli_and_optional_imports():
+    assert loaded_modules('web') == {'alembic': False, 'flask_migrate': False, 'flask_mail': False, 'PIL': False}
+    assert loaded_modules('cli')['flask_migrate'] is True
+
+
+def test_cli_commands_are_only_registered_for_the_cli(app):
+    assert 'rebuild-analytics' not in app.cli.commands
+    assert 'rebuild-analytics' in create_app().cli.commands
@@ -0,0 +1,29 @@
+# test_benchmark.py
+import random
+from benchmark import compare, run_load, seed_data
+from database import db
+from models import Order, Product, Review, User
+
+
+def test_seed_and_run(app):
+    with app.app_context():
+        counts = seed_data(products=30, users=3, orders=10, reviews=20, batch_size=7, rng=random.Random(1))
+        assert counts == {'users': 3, 'products': 30, 'orders': 10, 'reviews': 20}
+        assert [model.query.count() for model in (User, Product, Order, Review)] == [3, 30, 10, 20]
+        # The rating aggregates are rebuilt from the seeded reviews
+        assert db.session.query(db.func.sum(Product.rating_count)).scalar() == 20
+
+    report = run_load(app, users=1, duration=0.5)
+    assert 'POST /login' in report['endpoints']
+    assert all(row['errors'] == 0 for row in report['endpoints'].values())
+
+
+def test_regressions_are_reported_against_a_baseline():
+    def report(p95, queries):
+        return {'endpoints': {'GET /products': {'p95_ms': p95, 'queries': queries}}}
+
+    baseline = report(10.0, 2.0)
+    assert compare(report(11.9, 2.4), baseline) == []
+    assert compare(report(12.1, 2.0), baseline) == ['GET /products: p95 10.0ms -> 12.1ms']
+    assert compare(report(10.0, 2.5), baseline) == ['GET /products: queries 2.0 -> 2.5']
+    assert compare({'endpoints': {'GET /jobs': {'p95_ms': 99, 'queries': 9}}}, baseline) == []
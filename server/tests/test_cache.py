@@ -0,0 +1,53 @@
+# test_cache.py
+from sqlalchemy import text
+from cache import response_cache
+from database import db
+
+
+def stock(client, path, product_id):
+    body = client.get(path).get_json()
+    products = body['products'] if 'products' in body else [body]
+    return {product['product_id']: product['stock_quantity'] for product in products}[product_id]
+
+
+def test_catalog_reads_are_cached_with_an_etag(app, client, make_product):
+    mug = make_product(name='Mug')
+    first = client.get(f'/products/{mug}')
+    assert first.status_code == 200 and first.headers['ETag']
+
+    # A write the session hooks cannot see is not picked up until the entry goes
+    with app.app_context():
+        db.session.execute(text("UPDATE products SET name = 'Cup'"))
+        db.session.commit()
+    assert client.get(f'/products/{mug}').get_json()['name'] == 'Mug'
+
+    revalidated = client.get(f'/products/{mug}', headers={'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 304 and revalidated.data == b''
+
+
+def test_order_only_invalidates_the_products_it_took_stock_from(app, client, make_user, make_product, auth_header):
+    headers = auth_header(make_user('user@example.com'))
+    mug, cup = make_product(name='Mug'), make_product(name='Cup')
+    assert stock(client, '/products', mug) == 10
+    assert stock(client, f'/products/{mug}', mug) == 10
+    assert client.get(f'/products/{cup}').status_code == 200
+    with app.app_context():
+        generation = response_cache.generation('catalog')
+
+    order = {'items': [{'product_id': mug, 'quantity': 3}], 'shipping_address': '1 Main St'}
+    assert client.post('/orders', json=order, headers=headers).status_code == 201
+
+    with app.app_context():
+        assert response_cache.generation('catalog') == generation
+        cup_entry = response_cache.get(f'catalog:{generation}:/products/{cup}?')
+        assert cup_entry is not None and response_cache.rows_current(cup_entry[-1])
+    assert stock(client, '/products', mug) == 7
+    assert stock(client, f'/products/{mug}', mug) == 7
+
+
+def test_product_edit_invalidates_the_catalog(app, client, make_user, make_product, auth_header):
+    headers = auth_header(make_user('admin@example.com', role='admin'))
+    mug = make_product(name='Mug')
+    assert client.get('/products').get_json()['products'][0]['name'] == 'Mug'
+    assert client.put(f'/products/{mug}', json={'name': 'Big Mug'}, headers=headers).status_code == 200
+    assert client.get('/products').get_json()['products'][0]['name'] == 'Big Mug'
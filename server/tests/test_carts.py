@@ -0,0 +1,93 @@
+# test_carts.py
+import pytest
+from sqlalchemy import text
+from database import db
+from models import Cart, Order, Product
+
+
+@pytest.fixture
+def headers(make_user, auth_header):
+    return auth_header(make_user('user@example.com'))
+
+
+def add(client, product_id, quantity, headers):
+    response = client.post('/cart/items', json={'product_id': product_id, 'quantity': quantity}, headers=headers)
+    assert response.status_code == 201
+    return response.get_json()
+
+
+# A price change made by another worker: this process's catalog generation does not move
+def change_price_elsewhere(app, product_id, price):
+    with app.app_context():
+        db.session.execute(text("UPDATE products SET price = :price WHERE product_id = :id"),
+                           {'price': price, 'id': product_id})
+        db.session.commit()
+
+
+@pytest.mark.parametrize('idempotency_key', [None, 'checkout-1'])
+def test_checkout_rechecks_prices_a_cached_summary_missed(app, client, make_product, headers, idempotency_key):
+    if idempotency_key:
+        headers = {**headers, 'Idempotency-Key': idempotency_key}
+    product_id = make_product(price='10.00')
+    add(client, product_id, 2, headers)
+    assert client.get('/cart', headers=headers).get_json()['subtotal'] == 20
+    change_price_elsewhere(app, product_id, '12.50')
+
+    checkout = {'shipping_address': '1 Main St'}
+    response = client.post('/cart/checkout', json=checkout, headers=headers)
+    assert response.status_code == 409
+    assert response.get_json()['changes']['price_changed'] == [
+        {'product_id': product_id, 'old_price': 10, 'new_price': 12.5}]
+
+    # Confirming goes through, with the same Idempotency-Key too
+    response = client.post('/cart/checkout', json=checkout, headers=headers)
+    assert response.status_code == 201
+    with app.app_context():
+        assert db.session.get(Order, response.get_json()['order_id']).total_amount == 25
+    if idempotency_key:
+        replay = client.post('/cart/checkout', json=checkout, headers=headers)
+        assert replay.headers['Idempotent-Replayed'] == 'true' and replay.get_json() == response.get_json()
+
+
+def test_empty_cart_checkout_can_be_retried_with_the_same_key(client, make_product, headers):
+    headers = {**headers, 'Idempotency-Key': 'checkout-1'}
+    checkout = {'shipping_address': '1 Main St'}
+    assert client.post('/cart/checkout', json=checkout, headers=headers).status_code == 400
+    add(client, make_product(), 1, headers)
+    assert client.post('/cart/checkout', json=checkout, headers=headers).status_code == 201
+
+
+def test_cart_lists_missing_stock(app, client, make_product, headers):
+    mug = make_product(stock=5)
+    add(client, mug, 3, headers)
+    with app.app_context():
+        db.session.get(Product, mug).stock_quantity = 2
+        db.session.commit()
+    summary = client.get('/cart', headers=headers).get_json()
+    assert summary['changes']['unavailable'] == [{'product_id': mug, 'requested': 3, 'available': 2}]
+    response = client.post('/cart/checkout', json={'shipping_address': '1 Main St'}, headers=headers)
+    assert response.status_code == 409
+
+
+def test_guest_cart_merges_into_the_users_cart(app, client, make_product, headers):
+    mug, cup = make_product(name='Mug'), make_product(name='Cup')
+    add(client, mug, 1, headers)
+    token = add(client, mug, 2, {})['cart_token']
+    guest = {'X-Cart-Token': token}
+    add(client, cup, 1, guest)
+    assert client.get('/cart', headers=guest).get_json()['item_count'] == 3
+
+    merged = client.post('/cart/merge', headers={**headers, **guest}).get_json()
+    assert {line['product_id']: line['quantity'] for line in merged['items']} == {mug: 3, cup: 1}
+    assert client.get('/cart', headers=guest).get_json()['item_count'] == 0
+    with app.app_context():
+        assert Cart.query.count() == 1
+
+
+def test_cart_lines_can_be_changed_and_removed(client, make_product, headers):
+    mug = make_product()
+    add(client, mug, 1, headers)
+    assert client.put(f'/cart/items/{mug}', json={'quantity': 4}, headers=headers).get_json()['item_count'] == 4
+    assert client.put(f'/cart/items/{mug}', json={'quantity': -1}, headers=headers).status_code == 400
+    assert client.delete(f'/cart/items/{mug}', headers=headers).get_json()['item_count'] == 0
+    assert client.post('/cart/items', json={'product_id': 999}, headers=headers).status_code == 400
@@ -0,0 +1,85 @@
+# test_catalog_io.py
+import csv
+import io
+import json
+from database import db
+from models import Product
+
+HEADER = 'sku,name,description,price,stock_quantity,category\n'
+
+
+def import_csv(client, admin, body, **params):
+    response = client.post('/products/import', query_string={'format': 'csv', **params},
+                           data=(HEADER + body).encode(), headers=admin)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def catalog(app):
+    with app.app_context():
+        return {p.name: (p.sku, str(p.price), p.stock_quantity) for p in Product.query}
+
+
+def test_import_upserts_by_sku_then_name(app, client, make_product, admin):
+    make_product(name='Mug', price='10.00', stock=5)
+    assert len(client.get('/products').get_json()['products']) == 1  # cached
+
+    result = import_csv(client, admin, 'CUP-1,Cup,A cup,4.50,3,Kitchen\n'
+                                       ',Mug,A mug,12.00,7,Kitchen\n'
+                                       'CUP-1,Cup,A cup,5.00,2,Kitchen\n')  # the last row wins
+    assert (result['inserted'], result['updated'], result['failed']) == (1, 1, 0)
+    assert catalog(app) == {'Mug': (None, '12.00', 7), 'Cup': ('CUP-1', '5.00', 2)}
+
+    result = import_csv(client, admin, 'CUP-1,Big Cup,A cup,6.00,1,Kitchen\n')
+    assert (result['inserted'], result['updated']) == (0, 1)
+    assert catalog(app)['Big Cup'] == ('CUP-1', '6.00', 1)
+    # Bulk INSERT/UPDATE statements invalidate the cached listing
+    assert {p['name'] for p in client.get('/products').get_json()['products']} == {'Mug', 'Big Cup'}
+
+
+def test_bad_rows_are_reported_without_aborting(app, client, admin):
+    result = import_csv(client, admin, 'A,Plate,A plate,3.00,4,Kitchen\n'
+                                       'B,Bowl,A bowl,cheap,4,Kitchen\n'
+                                       'C,Fork,,1.00,4,Kitchen\n'
+                                       'D,Spoon,A spoon,1.00,-1,Kitchen\n'
+                                       'E,Knife,A knife,2.00,4,Kitchen\n')
+    assert (result['inserted'], result['failed']) == (2, 3)
+    assert [error['row'] for error in result['errors']] == [2, 3, 4]
+    assert set(catalog(app)) == {'Plate', 'Knife'}
+
+
+def test_a_failed_batch_is_retried_row_by_row(app, client, admin):
+    # The database rejects the oversized stock, which fails the whole executemany
+    result = import_csv(client, admin, 'A,Plate,A plate,3.00,4,Kitchen\n'
+                                       f'B,Bowl,A bowl,3.00,{10 ** 20},Kitchen\n'
+                                       'C,Fork,A fork,1.00,4,Kitchen\n')
+    assert (result['inserted'], result['failed']) == (2, 1)
+    assert result['errors'][0]['row'] == 2
+    assert set(catalog(app)) == {'Plate', 'Fork'}
+
+
+def test_export_round_trips(app, client, make_product, admin):
+    make_product(name='Mug', price='10.00', stock=5)
+    make_product(name='Cup', price='4.50', stock=3)
+
+    response = client.get('/products/export?format=csv', headers=admin)
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(row['name'], row['price']) for row in rows] == [('Mug', '10.00'), ('Cup', '4.50')]
+
+    lines = client.get('/products/export?format=jsonl', headers=admin).get_data(as_text=True).splitlines()
+    assert [json.loads(line)['stock_quantity'] for line in lines] == [5, 3]
+
+    with app.app_context():
+        db.session.query(Product).delete()
+        db.session.commit()
+    body = '\n'.join(lines).encode()
+    result = client.post('/products/import', data=body, content_type='application/x-ndjson', headers=admin).get_json()
+    assert result['inserted'] == 2
+    assert catalog(app) == {'Mug': (None, '10.00', 5), 'Cup': (None, '4.50', 3)}
+
+
+def test_import_is_admin_only(client, make_user, auth_header):
+    user = auth_header(make_user('user@example.com'))
+    assert client.post('/products/import', data=b'', headers=user).status_code == 403
+    assert client.get('/products/export', headers=user).status_code == 403
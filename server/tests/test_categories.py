@@ -0,0 +1,68 @@
+# test_categories.py
+from categories import rebuild_category_counts, slugify
+from database import db
+from models import Category
+
+
+def counts(client, slug):
+    category = client.get(f'/categories/{slug}').get_json()['category']
+    return category['product_count'], category['in_stock_count']
+
+
+def test_slugs_fold_case_and_punctuation(app, make_product):
+    assert slugify("Men's Wear") == slugify('mens  wear') == 'mens-wear'
+    make_product('Shirt', category="Men's Wear")
+    make_product('Tie', category='Mens Wear')
+    with app.app_context():
+        assert [(c.name, c.slug) for c in Category.query] == [("Men's Wear", 'mens-wear')]
+
+
+def test_counts_follow_product_writes_and_sales(app, client, make_user, auth_header, admin):
+    product = {'name': 'Mug', 'description': 'A mug', 'price': 10, 'stock_quantity': 1, 'category': 'Kitchen'}
+    assert client.post('/products', json=product, headers=admin).status_code == 201
+    assert client.post('/products', json={**product, 'name': 'Bowl'}, headers=admin).status_code == 201
+    assert counts(client, 'kitchen') == (2, 2)
+
+    # Selling the last mug takes it out of the in-stock count
+    order = {'items': [{'product_id': 1, 'quantity': 1}], 'shipping_address': '1 Main St'}
+    assert client.post('/orders', json=order, headers=auth_header(make_user('user@example.com'))).status_code == 201
+    assert counts(client, 'kitchen') == (2, 1)
+
+    assert client.put('/products/2', json={'category': 'Home'}, headers=admin).status_code == 200
+    assert client.put('/products/1', json={'stock_quantity': 3}, headers=admin).status_code == 200
+    assert counts(client, 'kitchen') == (1, 1)
+    assert counts(client, 'home') == (1, 1)
+    assert client.delete('/products/1', headers=admin).status_code == 200
+    assert counts(client, 'kitchen') == (0, 0)
+
+    with app.app_context():
+        expected = {c.slug: (c.product_count, c.in_stock_count) for c in Category.query}
+        db.session.query(Category).update({'product_count': 7})
+        rebuild_category_counts()
+        assert {c.slug: (c.product_count, c.in_stock_count) for c in Category.query} == expected
+
+
+def test_tree_breadcrumb_and_subtree_filter(app, client, make_product, admin):
+    home = client.post('/categories', json={'name': 'Home'}, headers=admin).get_json()['category_id']
+    response = client.post('/categories', json={'name': 'Lighting', 'parent_id': home}, headers=admin)
+    assert response.get_json()['slug'] == 'lighting'
+    assert client.post('/categories', json={'name': 'home'}, headers=admin).status_code == 409
+    assert client.post('/categories', json={'name': 'Lamps', 'parent_id': 99}, headers=admin).status_code == 400
+    make_product('Lamp', category='Lighting')
+    make_product('Rug', stock=0, category='Home')
+    make_product('Mug', category='Kitchen')
+    with app.app_context():
+        rebuild_category_counts()  # make_product files products without counting them
+
+    tree = client.get('/categories').get_json()['categories']
+    assert [(node['slug'], node['product_count'], node['in_stock_count']) for node in tree] == \
+        [('home', 2, 1), ('kitchen', 1, 1)]
+    assert [child['slug'] for child in tree[0]['children']] == ['lighting']
+
+    landing = client.get('/categories/lighting').get_json()
+    assert [crumb['slug'] for crumb in landing['breadcrumb']] == ['home']
+    assert client.get('/categories/garden').status_code == 404
+
+    listed = client.get('/products?category=home').get_json()['products']
+    assert sorted(product['name'] for product in listed) == ['Lamp', 'Rug']
+    assert client.get('/products?category=garden').status_code == 404
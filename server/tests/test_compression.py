@@ -0,0 +1,64 @@
+# test_compression.py
+import gzip
+import json
+from datetime import datetime, timedelta
+from database import db
+from models import Product
+
+
+def test_large_json_is_gzipped_with_a_weak_etag(client, make_product):
+    for i in range(20):
+        make_product(f'Mug {i}')
+    plain = client.get('/products')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    response = client.get('/products', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+    assert response.headers['ETag'] == 'W/' + plain.headers['ETag']
+
+    # Either validator revalidates the cached listing
+    for etag in (plain.headers['ETag'], response.headers['ETag']):
+        assert client.get('/products', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_small_bodies_are_sent_as_is(client):
+    response = client.get('/categories', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json() == {'categories': []}
+
+
+def test_uncached_views_get_etags_and_304s(client, make_product):
+    product_id = make_product()
+    response = client.get(f'/products/{product_id}/reviews')
+    assert response.headers['ETag'].startswith('W/')
+    assert client.get(f'/products/{product_id}/reviews',
+                      headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_product_detail_answers_if_modified_since(app, client, make_product):
+    product_id = make_product()
+    with app.app_context():
+        product = db.session.get(Product, product_id)
+        product.updated_at = datetime(2026, 1, 1, 12, 0, 0)
+        db.session.commit()
+
+    response = client.get(f'/products/{product_id}')
+    assert response.headers['Last-Modified'] == 'Thu, 01 Jan 2026 12:00:00 GMT'
+    later = (datetime(2026, 1, 1, 12, 0, 0) + timedelta(hours=1)).strftime('%a, %d %b %Y %H:%M:%S GMT')
+    assert client.get(f'/products/{product_id}', headers={'If-Modified-Since': later}).status_code == 304
+    assert client.get(f'/products/{product_id}',
+                      headers={'If-Modified-Since': 'Wed, 31 Dec 2025 12:00:00 GMT'}).status_code == 200
+
+
+def test_streamed_exports_are_compressed_chunk_by_chunk(client, make_product, admin):
+    for i in range(5):
+        make_product(f'Mug {i}')
+    response = client.get('/products/export?format=csv', headers={**admin, 'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert 'ETag' not in response.headers
+    lines = gzip.decompress(response.data).decode().splitlines()
+    assert len(lines) == 6 and lines[0].startswith('product_id')
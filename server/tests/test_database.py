@@ -0,0 +1,48 @@
+# test_database.py
+from flask import Flask
+from sqlalchemy import text
+from config import Config
+from database import db, engine_options, init_db
+
+
+def test_server_databases_get_a_tuned_pool():
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    options = engine_options(config, 'postgresql://trendify@db/trendify')
+    assert options == {
+        'pool_size': Config.DB_POOL_SIZE,
+        'max_overflow': Config.DB_MAX_OVERFLOW,
+        'pool_timeout': Config.DB_POOL_TIMEOUT,
+        'pool_recycle': Config.DB_POOL_RECYCLE,
+        'pool_pre_ping': Config.DB_POOL_PRE_PING,
+    }
+    assert 'pool_size' not in engine_options(config, 'sqlite://')
+    assert 'pool_size' in engine_options(config, 'sqlite:///trendify.db')
+
+
+def _pragmas(uri):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    init_db(app)
+    with app.app_context():
+        with db.engine.connect() as connection:
+            pragmas = {name: connection.execute(text(f'PRAGMA {name}')).scalar()
+                       for name in ('journal_mode', 'synchronous', 'busy_timeout')}
+        db.engine.dispose()
+    return pragmas
+
+
+def test_sqlite_files_use_wal(tmp_path):
+    # synchronous NORMAL is 1
+    assert _pragmas(f"sqlite:///{tmp_path / 'trendify.db'}") == {
+        'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': Config.SQLITE_BUSY_TIMEOUT_MS}
+
+
+def test_in_memory_sqlite_skips_wal():
+    assert _pragmas('sqlite://')['journal_mode'] == 'memory'
+
+
+def test_pool_stats_are_admin_only(client, make_user, auth_header, admin):
+    stats = client.get('/db/pool', headers=admin).get_json()
+    assert set(stats['default']) == {'pool', 'size', 'checked_in', 'checked_out', 'overflow'}
+    assert client.get('/db/pool', headers=auth_header(make_user('user@example.com'))).status_code == 403
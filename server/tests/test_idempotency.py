@@ -0,0 +1,101 @@
+# test_idempotency.py
+from datetime import datetime, timedelta
+import pytest
+from database import db
+from idempotency import _fingerprint
+from models import IdempotencyKey, Order, Product
+from search import product_index
+
+
+def test_order_committed_before_a_crash_is_replayed(app, client, make_user, make_product, auth_header, monkeypatch):
+    headers = {**auth_header(make_user('user@example.com')), 'Idempotency-Key': 'order-1'}
+    product_id = make_product()
+    order = {'items': [{'product_id': product_id, 'quantity': 1}], 'shipping_address': '1 Main St'}
+
+    # The worker fails after the order was committed, before answering
+    def crash(*args):
+        raise RuntimeError('worker died')
+    monkeypatch.setattr(product_index, 'set_stock', crash)
+    with pytest.raises(RuntimeError):
+        client.post('/orders', json=order, headers=headers)
+    monkeypatch.undo()
+
+    response = client.post('/orders', json=order, headers=headers)
+    assert response.status_code == 201
+    assert response.headers['Idempotent-Replayed'] == 'true'
+    with app.app_context():
+        assert Order.query.count() == 1
+        assert response.get_json()['order_id'] == Order.query.one().order_id
+
+
+def test_key_abandoned_in_progress_can_be_retried(app, client, make_user, make_product, auth_header):
+    user_id = make_user('user@example.com')
+    headers = {**auth_header(user_id), 'Idempotency-Key': 'order-1'}
+    product_id = make_product()
+    order = {'items': [{'product_id': product_id, 'quantity': 1}], 'shipping_address': '1 Main St'}
+
+    with app.app_context():
+        started = datetime.utcnow() - timedelta(seconds=app.config['IDEMPOTENCY_IN_PROGRESS_TIMEOUT'] + 1)
+        db.session.add(IdempotencyKey(user_id=user_id, key='order-1', request_hash='', created_at=started,
+                                      expires_at=started + timedelta(days=1)))
+        db.session.commit()
+
+    response = client.post('/orders', json=order, headers=headers)
+    assert response.status_code == 201
+    assert client.post('/orders', json=order, headers=headers).get_json() == response.get_json()
+
+
+@pytest.fixture
+def headers(make_user, auth_header):
+    return {**auth_header(make_user('user@example.com')), 'Idempotency-Key': 'order-1'}
+
+
+def order_for(product_id, quantity=1):
+    return {'items': [{'product_id': product_id, 'quantity': quantity}], 'shipping_address': '1 Main St'}
+
+
+def test_retries_are_replayed_without_a_second_order(app, client, make_product, headers):
+    product_id = make_product(stock=5)
+    first = client.post('/orders', json=order_for(product_id), headers=headers)
+    retry = client.post('/orders', json=order_for(product_id), headers=headers)
+    assert (first.status_code, retry.status_code) == (201, 201)
+    assert retry.get_json() == first.get_json() and retry.headers['Idempotent-Replayed'] == 'true'
+    # The same key for another request is refused
+    assert client.post('/orders', json=order_for(product_id, 2), headers=headers).status_code == 422
+    with app.app_context():
+        assert Order.query.count() == 1
+        assert db.session.get(Product, product_id).stock_quantity == 4
+
+
+def test_key_in_progress_is_refused(app, client, make_user, make_product, auth_header):
+    user_id = make_user('user@example.com')
+    order = order_for(make_product())
+    with app.test_request_context('/orders', method='POST', json=order):
+        fingerprint = _fingerprint()
+    with app.app_context():
+        db.session.add(IdempotencyKey(user_id=user_id, key='order-1', request_hash=fingerprint,
+                                      expires_at=datetime.utcnow() + timedelta(days=1)))
+        db.session.commit()
+    response = client.post('/orders', json=order, headers={**auth_header(user_id), 'Idempotency-Key': 'order-1'})
+    assert response.status_code == 409
+
+
+def test_batches_commit_per_order_or_atomically(app, client, make_product, headers):
+    mug = make_product(stock=3)
+    batch = {'orders': [order_for(mug, 2), order_for(mug, 2), {'items': []}]}
+
+    response = client.post('/orders/batch', json={**batch, 'atomic': True}, headers=headers)
+    assert response.status_code == 400
+    assert [result['status'] for result in response.get_json()['results']] == ['rolled_back', 'error', 'error']
+    with app.app_context():
+        assert (Order.query.count(), db.session.get(Product, mug).stock_quantity) == (0, 3)
+    assert client.post('/orders/batch', json={**batch, 'atomic': True}, headers=headers).status_code == 400
+
+    headers['Idempotency-Key'] = 'order-2'
+    response = client.post('/orders/batch', json=batch, headers=headers)
+    assert response.status_code == 201
+    assert [result['status'] for result in response.get_json()['results']] == ['created', 'error', 'error']
+    replay = client.post('/orders/batch', json=batch, headers=headers)
+    assert replay.headers['Idempotent-Replayed'] == 'true' and replay.get_json() == response.get_json()
+    with app.app_context():
+        assert (Order.query.count(), db.session.get(Product, mug).stock_quantity) == (1, 1)
@@ -0,0 +1,53 @@
+# test_identity.py
+from datetime import timezone
+import pytest
+from identity import identity_cache
+from models import RevokedToken
+
+
+def _login(client, email):
+    response = client.post('/login', json={'email': email, 'password': 'secret'})
+    assert response.status_code == 200
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+
+# Demote an admin and return the revocation cutoff as a whole-second iat
+def _demote(app, client, admin, user_id):
+    assert client.patch(f'/users/{user_id}/role', json={'role': 'user'}, headers=admin).status_code == 200
+    with app.app_context():
+        cutoff = RevokedToken.query.filter_by(user_id=user_id).one().issued_before
+    return int(cutoff.replace(tzinfo=timezone.utc).timestamp())
+
+
+@pytest.mark.parametrize('reload', [False, True])
+def test_role_change_revokes_tokens_with_the_old_role(app, client, make_user, auth_header, admin, reload):
+    demoted = make_user('demoted@example.com', role='admin')
+    cutoff = _demote(app, client, admin, demoted)
+    if reload:
+        identity_cache.reset()  # as seen by another worker, from the table
+
+    # Tokens issued in the revoking second are only valid with the new role
+    assert client.get('/orders', headers=auth_header(demoted, iat=cutoff - 1, role='user')).status_code == 401
+    assert client.get('/users', headers=auth_header(demoted, iat=cutoff, role='admin')).status_code == 401
+    assert client.get('/orders', headers=auth_header(demoted, iat=cutoff, role='user')).status_code == 200
+
+
+def test_login_right_after_role_change_is_accepted(app, client, make_user, admin):
+    demoted = make_user('demoted@example.com', role='admin')
+    old_headers = _login(client, 'demoted@example.com')
+    _demote(app, client, admin, demoted)
+    new_headers = _login(client, 'demoted@example.com')
+
+    assert client.get('/orders', headers=new_headers).status_code == 200
+    assert client.get('/users', headers=new_headers).status_code == 403
+    assert client.get('/users', headers=old_headers).status_code == 401
+
+
+def test_logout_revokes_only_that_token(client, make_user):
+    make_user('user@example.com')
+    first = _login(client, 'user@example.com')
+    second = _login(client, 'user@example.com')
+
+    assert client.post('/logout', headers=first).status_code == 200
+    assert client.get('/orders', headers=first).status_code == 401
+    assert client.get('/orders', headers=second).status_code == 200
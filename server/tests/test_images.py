@@ -0,0 +1,69 @@
+# test_images.py
+import io
+import pytest
+from PIL import Image as PILImage
+from database import db
+from images import image_store
+from jobs import job_queue
+from models import Image, Product
+
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_store, 'root', str(tmp_path))
+    return tmp_path
+
+
+def png(width=800, height=600, color='red'):
+    buffer = io.BytesIO()
+    PILImage.new('RGB', (width, height), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def upload(client, product_id, data, headers):
+    return client.post(f'/products/{product_id}/image', data={'image': (io.BytesIO(data), 'photo.png')},
+                       headers=headers, content_type='multipart/form-data')
+
+
+def test_upload_generates_immutable_variants(app, client, make_product, admin):
+    product_id = make_product()
+    response = upload(client, product_id, png(), admin)
+    assert (response.status_code, response.get_json()['status']) == (202, 'pending')
+    assert client.get(f'/products/{product_id}').get_json()['image'] is None  # until the variants exist
+
+    assert job_queue.run_pending() == 1
+    product = client.get(f'/products/{product_id}').get_json()
+    with app.app_context():
+        image = Image.query.one()
+        assert (image.status, image.width, image.height) == ('ready', 800, 600)
+        sha256 = image.sha256
+    assert product['image']['src'] == f'/images/{sha256}/320.jpg'
+    assert product['image_url'] == product['image']['src']
+    assert f'/images/{sha256}/640.webp 640w' in product['image']['srcset']['webp']
+
+    variant = client.get(f'/images/{sha256}/320.webp')
+    assert variant.status_code == 200
+    assert 'immutable' in variant.headers['Cache-Control']
+    assert PILImage.open(io.BytesIO(variant.data)).size == (320, 240)
+    assert client.get(f'/images/{sha256}/321.webp').status_code == 404
+    assert client.get(f'/images/{sha256}/320.png').status_code == 404
+
+
+def test_identical_uploads_share_one_image(app, client, make_product, admin):
+    first, second = make_product('Mug'), make_product('Cup')
+    assert upload(client, first, png(), admin).status_code == 202
+    job_queue.run_pending()
+    # Already on file and ready: no new job, and the product switches at once
+    assert upload(client, second, png(), admin).status_code == 200
+    assert job_queue.run_pending() == 0
+    with app.app_context():
+        assert Image.query.count() == 1
+        assert db.session.get(Product, second).image_hash == Image.query.one().sha256
+
+
+def test_uploads_are_checked(client, make_product, admin, make_user, auth_header):
+    product_id = make_product()
+    assert upload(client, product_id, b'not an image at all', admin).status_code == 400
+    assert upload(client, 999, png(), admin).status_code == 404
+    assert upload(client, product_id, png(), auth_header(make_user('user@example.com'))).status_code == 403
+    assert client.post(f'/products/{product_id}/image', json={}, headers=admin).status_code == 400
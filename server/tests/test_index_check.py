@@ -0,0 +1,23 @@
+# test_index_check.py
+import os
+from index_check import find_unindexed_filters
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_every_query_filter_in_the_app_is_indexed(app):
+    with app.app_context():
+        assert find_unindexed_filters(SERVER_DIR) == []
+
+
+def test_unindexed_filter_is_reported(app, tmp_path):
+    (tmp_path / 'reports.py').write_text(
+        "def by_address(address):\n"
+        "    return Order.query.filter_by(shipping_address=address).all()\n"
+        "\n"
+        "def by_user(user_id):\n"
+        "    return Order.query.filter(Order.user_id == user_id).all()\n"
+    )
+    with app.app_context():
+        assert find_unindexed_filters(str(tmp_path)) == [
+            ('reports.py', 2, 'by_address', 'orders', ['shipping_address'])]
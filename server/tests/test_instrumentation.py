@@ -0,0 +1,47 @@
+# test_instrumentation.py
+import logging
+from database import db
+from models import Product
+
+
+def test_server_timing_counts_the_queries(client, make_product):
+    product_id = make_product()
+    timing = client.get(f'/products/{product_id}').headers['Server-Timing']
+    db_timing, serialize_timing, app_timing = timing.split(', ')
+    assert db_timing.startswith('db;dur=') and db_timing.endswith('desc="1 queries"')
+    assert serialize_timing.startswith('serialize;dur=') and app_timing.startswith('app;dur=')
+
+
+def test_metrics(app, client, make_product):
+    client.get(f'/products/{make_product()}')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'trendify_http_requests_total{method="GET",endpoint="/products/<int:product_id>",status="200"}' in body
+    assert 'trendify_db_queries_total{endpoint="/products/<int:product_id>"}' in body
+    assert 'trendify_http_request_duration_seconds_bucket{method="GET",endpoint="/products/<int:product_id>",' \
+           'le="+Inf"}' in body
+
+    app.config['METRICS_TOKEN'] = 'scrape'
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape'}).status_code == 200
+
+
+def test_slow_queries_are_logged_with_their_plan(app, client, make_product, caplog):
+    app.config['SLOW_QUERY_MS'] = 0
+    product_id = make_product()
+    with caplog.at_level(logging.WARNING, logger='trendify.profiling'):
+        client.get(f'/products/{product_id}')
+    slow = [record.getMessage() for record in caplog.records if record.getMessage().startswith('Slow query')]
+    assert len(slow) == 1 and 'FROM products' in slow[0] and 'SEARCH products' in slow[0]
+
+
+def test_repeated_statements_are_flagged(app, client, make_product, caplog):
+    product_ids = [make_product(name=f'Mug {i}') for i in range(app.config['N_PLUS_ONE_THRESHOLD'])]
+
+    @app.route('/test/n-plus-one')
+    def n_plus_one():
+        return {'names': [db.session.get(Product, product_id).name for product_id in product_ids]}
+
+    with caplog.at_level(logging.WARNING, logger='trendify.profiling'):
+        client.get('/test/n-plus-one')
+    assert any(record.getMessage().startswith('Possible N+1 in GET /test/n-plus-one') for record in caplog.records)
+    assert 'trendify_n_plus_one_total{endpoint="/test/n-plus-one"}' in client.get('/metrics').get_data(as_text=True)
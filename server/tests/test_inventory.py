@@ -0,0 +1,79 @@
+# test_inventory.py
+from datetime import datetime, timedelta
+import pytest
+from database import db
+from inventory import release_expired_reservations
+from models import Order, Product, Reservation
+
+
+def stock(app, product_id):
+    with app.app_context():
+        return db.session.get(Product, product_id).stock_quantity
+
+
+@pytest.fixture
+def headers(make_user, auth_header):
+    return auth_header(make_user('user@example.com'))
+
+
+def order(product_id, quantity):
+    return {'items': [{'product_id': product_id, 'quantity': quantity}], 'shipping_address': '1 Main St'}
+
+
+def test_order_takes_stock_and_never_oversells(app, client, make_product, headers):
+    mug = make_product(stock=3)
+    assert client.post('/orders', json=order(mug, 2), headers=headers).status_code == 201
+    response = client.post('/orders', json=order(mug, 2), headers=headers)
+    assert response.status_code == 400
+    assert 'Insufficient stock' in response.get_json()['error']
+    assert stock(app, mug) == 1
+    with app.app_context():
+        assert Order.query.count() == 1
+
+
+def test_order_with_an_unknown_product_changes_nothing(app, client, make_product, headers):
+    mug = make_product(stock=3)
+    items = {'items': [{'product_id': mug, 'quantity': 1}, {'product_id': 999, 'quantity': 1}],
+             'shipping_address': '1 Main St'}
+    assert client.post('/orders', json=items, headers=headers).status_code == 400
+    assert stock(app, mug) == 3
+
+
+def test_reservation_holds_stock_until_the_order_uses_it(app, client, make_product, headers):
+    mug = make_product(stock=3)
+    response = client.post('/reservations', json={'items': [{'product_id': mug, 'quantity': 2}]}, headers=headers)
+    assert response.status_code == 201
+    reservation_id = response.get_json()['reservation_id']
+    assert stock(app, mug) == 1
+
+    placed = {'reservation_id': reservation_id, 'shipping_address': '1 Main St'}
+    assert client.post('/orders', json=placed, headers=headers).status_code == 201
+    assert stock(app, mug) == 1
+    # A reservation is used once
+    assert client.post('/orders', json=placed, headers=headers).status_code == 400
+
+
+def test_released_reservation_returns_its_stock(app, client, make_product, headers):
+    mug = make_product(stock=3)
+    reservation_id = client.post('/reservations', json={'items': [{'product_id': mug, 'quantity': 2}]},
+                                 headers=headers).get_json()['reservation_id']
+    assert client.delete(f'/reservations/{reservation_id}', headers=headers).status_code == 200
+    assert stock(app, mug) == 3
+    assert client.delete(f'/reservations/{reservation_id}', headers=headers).status_code == 409
+
+
+def test_expired_reservation_cannot_be_ordered_and_is_released(app, client, make_product, headers):
+    mug = make_product(stock=3)
+    reservation_id = client.post('/reservations', json={'items': [{'product_id': mug, 'quantity': 2}]},
+                                 headers=headers).get_json()['reservation_id']
+    with app.app_context():
+        db.session.get(Reservation, reservation_id).expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+
+    placed = {'reservation_id': reservation_id, 'shipping_address': '1 Main St'}
+    assert client.post('/orders', json=placed, headers=headers).status_code == 400
+    with app.app_context():
+        assert release_expired_reservations() == 1
+        db.session.commit()
+        assert db.session.get(Reservation, reservation_id).status == 'released'
+    assert stock(app, mug) == 3
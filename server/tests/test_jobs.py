@@ -0,0 +1,86 @@
+# test_jobs.py
+from datetime import datetime, timedelta
+import pytest
+from flask_mail import Mail
+from database import db
+from jobs import enqueue, job_queue, task
+from models import Job
+
+# Outcomes for the next runs of the 'test_flaky' job; True fails the run
+failures = []
+
+
+@task('test_flaky')
+def flaky(value):
+    if failures.pop(0):
+        raise RuntimeError(f"flaky {value}")
+
+
+def job(app, job_id):
+    with app.app_context():
+        return db.session.get(Job, job_id)
+
+
+# Make a job due now instead of after its backoff
+def make_due(app, job_id):
+    with app.app_context():
+        db.session.get(Job, job_id).run_at = datetime.utcnow()
+        db.session.commit()
+
+
+def test_failed_jobs_back_off_into_the_dead_letter_queue(app, client, admin):
+    with app.app_context():
+        queued = enqueue('test_flaky', max_attempts=2, value=1)
+        db.session.commit()
+        job_id = queued.job_id
+
+    failures[:] = [True, True, False]
+    assert job_queue.run_pending() == 1
+    failed = job(app, job_id)
+    assert (failed.status, failed.attempts) == ('queued', 1)
+    assert failed.run_at >= datetime.utcnow() + timedelta(seconds=app.config['JOB_RETRY_BACKOFF'] - 5)
+    assert 'flaky 1' in failed.last_error
+    assert job_queue.run_pending() == 0  # not due yet
+
+    make_due(app, job_id)
+    assert job_queue.run_pending() == 1
+    assert job(app, job_id).status == 'dead'
+    dead = client.get('/jobs?status=dead', headers=admin).get_json()['jobs']
+    assert [entry['job_id'] for entry in dead] == [job_id]
+
+    assert client.post(f'/jobs/{job_id}/retry', headers=admin).status_code == 200
+    assert client.post(f'/jobs/{job_id}/retry', headers=admin).status_code == 400
+    assert job_queue.run_pending() == 1
+    done = job(app, job_id)
+    assert (done.status, done.attempts, done.last_error) == ('done', 1, None)
+
+
+def test_rolled_back_jobs_never_run(app):
+    with app.app_context():
+        enqueue('test_flaky', value=1)
+        db.session.rollback()
+        assert Job.query.count() == 0
+
+
+def test_jobs_of_dead_workers_are_requeued(app):
+    with app.app_context():
+        stale = Job(name='test_flaky', payload={'value': 1}, status='running',
+                    locked_at=datetime.utcnow() - timedelta(seconds=app.config['JOB_LOCK_TIMEOUT'] + 1))
+        db.session.add(stale)
+        db.session.commit()
+        assert job_queue.recover_stale() == 1
+        assert db.session.get(Job, stale.job_id).status == 'queued'
+
+
+def test_orders_send_their_emails_from_jobs(app, client, make_user, auth_header, make_product):
+    mail = Mail(app)  # what notifications would set up on its first email; suppressed when TESTING
+    app.config['STOCK_ALERT_RECIPIENTS'] = ['stock@example.com']
+    headers = auth_header(make_user('user@example.com'))
+    mug = make_product(stock=app.config['LOW_STOCK_THRESHOLD'] + 1)
+
+    order = {'items': [{'product_id': mug, 'quantity': 2}], 'shipping_address': '1 Main St'}
+    with mail.record_messages() as outbox:
+        assert client.post('/orders', json=order, headers=headers).status_code == 201
+        assert outbox == []  # sent by the workers, not the request
+        assert job_queue.run_pending() == 3  # the two emails and the sales rollup
+    assert sorted(message.recipients[0] for message in outbox) == ['stock@example.com', 'user@example.com']
@@ -0,0 +1,63 @@
+# test_orders.py
+import pytest
+from sqlalchemy import event
+from database import db
+from models import Order, OrderItem
+
+
+@pytest.fixture
+def make_orders(app):
+    def make(user_id, product_ids, orders, items):
+        with app.app_context():
+            for _ in range(orders):
+                order = Order(user_id=user_id, total_amount=10 * items, shipping_address='1 Main St')
+                for index in range(items):
+                    order.order_items.append(OrderItem(product_id=product_ids[index % len(product_ids)],
+                                                       quantity=1, price_at_purchase=10))
+                db.session.add(order)
+            db.session.commit()
+    return make
+
+
+@pytest.mark.parametrize('orders, items', [(1, 1), (5, 3), (20, 6)])
+def test_order_history_takes_two_queries(app, client, make_user, make_product, auth_header, make_orders,
+                                         orders, items):
+    user_id = make_user('user@example.com')
+    headers = auth_header(user_id)
+    product_ids = [make_product(name=f'Product {index}') for index in range(3)]
+    make_orders(user_id, product_ids, orders, items)
+
+    # Statements reading the order history; the token's revocation check is authentication's
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if any(f'FROM {table}' in statement for table in ('orders', 'order_items', 'products')):
+            statements.append(statement)
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = client.get('/orders?limit=50', headers=headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body['orders']) == orders
+    assert all(len(order['items']) == items for order in body['orders'])
+    assert len(statements) == 2
+
+
+def test_order_history_pages_and_date_filter(app, client, make_user, make_product, auth_header, make_orders):
+    user_id = make_user('user@example.com')
+    headers = auth_header(user_id)
+    make_orders(user_id, [make_product()], 3, 1)
+    make_orders(make_user('other@example.com'), [make_product()], 2, 1)
+
+    first = client.get('/orders?limit=2', headers=headers).get_json()
+    second = client.get(f"/orders?limit=2&cursor={first['next_cursor']}", headers=headers).get_json()
+    order_ids = [order['order_id'] for order in first['orders'] + second['orders']]
+    assert order_ids == sorted(order_ids, reverse=True) and len(order_ids) == 3
+    assert second['next_cursor'] is None
+
+    assert client.get('/orders?end_date=2000-01-01', headers=headers).get_json()['orders'] == []
+    assert client.get('/orders?start_date=yesterday', headers=headers).status_code == 400
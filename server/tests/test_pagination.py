@@ -0,0 +1,53 @@
+# test_pagination.py
+import base64
+import json
+import pytest
+
+
+def cursor(sort, values):
+    raw = json.dumps({'s': sort, 'k': values}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('sort', ['id', 'newest'])
+def test_pages_follow_the_cursor_without_gaps(client, make_product, sort):
+    product_ids = {make_product(name=f'Product {index}') for index in range(5)}
+    seen, token = [], None
+    while True:
+        url = f'/products?sort={sort}&limit=2' + (f'&cursor={token}' if token else '')
+        body = client.get(url).get_json()
+        seen += [product['product_id'] for product in body['products']]
+        token = body['next_cursor']
+        if token is None:
+            break
+    assert sorted(seen) == sorted(product_ids) and len(seen) == len(product_ids)
+    assert seen == (sorted(seen) if sort == 'id' else sorted(seen, reverse=True))
+
+
+def test_sparse_fieldset(client, make_product):
+    make_product()
+    product = client.get('/products?fields=name,price').get_json()['products'][0]
+    assert set(product) == {'product_id', 'name', 'price'}
+    assert client.get('/products?fields=name,password').status_code == 400
+
+
+def test_cursor_of_another_sort_is_rejected(client, make_product):
+    make_product()
+    assert client.get(f"/products?sort=newest&cursor={cursor('id', [1])}").status_code == 400
+
+
+@pytest.mark.parametrize('sort, values', [
+    ('id', [[1]]),
+    ('id', [{'product_id': 1}]),
+    ('id', ['1']),
+    ('id', [True]),
+    ('id', [None]),
+    ('id', [1.5]),
+    ('newest', [12345, 1]),
+    ('newest', ['2024-01-01T00:00:00', [1]]),
+])
+def test_tampered_cursor_is_a_bad_request(client, make_product, sort, values):
+    make_product()
+    response = client.get(f'/products?sort={sort}&cursor={cursor(sort, values)}')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid cursor'
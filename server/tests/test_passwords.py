@@ -0,0 +1,66 @@
+# test_passwords.py
+import logging
+import threading
+import pytest
+from werkzeug.security import generate_password_hash
+import passwords
+from database import db
+from models import User
+from passwords import login_throttle, password_hasher
+
+
+@pytest.fixture(autouse=True)
+def fresh_throttle(monkeypatch):
+    monkeypatch.setattr(login_throttle, '_failures', {})
+
+
+def login(client, email, password):
+    return client.post('/login', json={'email': email, 'password': password})
+
+
+def test_failed_logins_are_throttled(app, client, make_user):
+    make_user('user@example.com')
+    for _ in range(app.config['LOGIN_MAX_FAILURES_PER_EMAIL']):
+        assert login(client, 'user@example.com', 'wrong').status_code == 401
+    response = login(client, 'User@Example.com', 'secret')
+    assert response.status_code == 429
+    assert 0 < int(response.headers['Retry-After']) <= app.config['LOGIN_FAILURE_WINDOW'] + 1
+    # Unknown emails are checked against a dummy hash and counted the same way
+    assert login(client, 'nobody@example.com', 'secret').status_code == 401
+
+
+def test_a_successful_login_clears_the_count(app, client, make_user):
+    make_user('user@example.com')
+    for _ in range(app.config['LOGIN_MAX_FAILURES_PER_EMAIL'] - 1):
+        login(client, 'user@example.com', 'wrong')
+    assert login(client, 'user@example.com', 'secret').status_code == 200
+    assert login(client, 'user@example.com', 'wrong').status_code == 401
+    assert login(client, 'user@example.com', 'secret').status_code == 200
+
+
+def test_old_hashes_are_upgraded_on_login(app, client, make_user):
+    user_id = make_user('user@example.com')
+    with app.app_context():
+        db.session.get(User, user_id).password_hash = generate_password_hash('secret', 'pbkdf2:sha256:500')
+        db.session.commit()
+    assert login(client, 'user@example.com', 'secret').status_code == 200
+    with app.app_context():
+        assert db.session.get(User, user_id).password_hash.startswith('pbkdf2:sha256:1000$')
+
+
+def test_saturated_hashing_answers_503(client, make_user, monkeypatch):
+    make_user('user@example.com')
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr(password_hasher, 'workers', 1)
+    monkeypatch.setattr(password_hasher, 'timeout', 0.01)
+    monkeypatch.setattr(password_hasher, '_slots', slots)
+    response = login(client, 'user@example.com', 'secret')
+    assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+
+
+def test_unusable_argon2_hashes_fail_closed(caplog):
+    with caplog.at_level(logging.ERROR, logger='passwords'):
+        assert passwords._verify('$argon2id$v=19$m=65536,t=3,p=4$not-a-hash', 'secret') is False
+    if passwords.argon2 is None:
+        assert 'argon2-cffi is not installed' in caplog.text
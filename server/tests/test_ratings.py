@@ -0,0 +1,66 @@
+# test_ratings.py
+import pytest
+from database import db
+from models import Product, Review
+from ratings import rebuild_ratings
+
+
+@pytest.fixture
+def make_review(app, make_user):
+    user_id = make_user('user@example.com')
+
+    def make(product_id, rating):
+        with app.app_context():
+            review = Review(product_id=product_id, user_id=user_id, rating=rating, status='pending')
+            db.session.add(review)
+            db.session.commit()
+            return review.review_id
+    return make
+
+
+def rating(client, product_id):
+    return client.get(f'/products/{product_id}').get_json()['rating']
+
+
+def test_moderation_keeps_the_aggregates_in_step(app, client, make_product, make_review, admin):
+    mug = make_product()
+    five, three = make_review(mug, 5), make_review(mug, 3)
+    assert rating(client, mug)['count'] == 0  # pending reviews don't count
+
+    for review_id in (five, three, five):  # approving twice counts once
+        assert client.patch(f'/reviews/{review_id}/approve', headers=admin).status_code == 200
+    summary = rating(client, mug)
+    assert (summary['count'], summary['average']) == (2, 4)
+    assert summary['histogram'] == {'1': 0, '2': 0, '3': 1, '4': 0, '5': 1}
+
+    assert client.patch(f'/reviews/{five}/reject', headers=admin).status_code == 200
+    assert client.patch(f'/reviews/{five}/reject', headers=admin).status_code == 200
+    summary = rating(client, mug)
+    assert (summary['count'], summary['average'], summary['histogram']['5']) == (1, 3, 0)
+
+    assert client.patch(f'/reviews/{three}/reject', headers=admin).status_code == 200
+    assert rating(client, mug) == {'average': 0, 'count': 0, 'histogram': dict.fromkeys('12345', 0)}
+
+
+def test_rebuild_matches_the_incremental_aggregates(app, client, make_product, make_review, admin):
+    mug, cup = make_product(name='Mug'), make_product(name='Cup')
+    for product_id, stars in ((mug, 4), (mug, 5), (cup, 2)):
+        client.patch(f'/reviews/{make_review(product_id, stars)}/approve', headers=admin)
+    make_review(cup, 5)  # pending
+    incremental = {product_id: rating(client, product_id) for product_id in (mug, cup)}
+
+    with app.app_context():
+        db.session.query(Product).update({'rating_count': 0, 'rating_sum': 0, 'rating_average': 0})
+        db.session.commit()
+        assert rebuild_ratings() == 2
+    assert {product_id: rating(client, product_id) for product_id in (mug, cup)} == incremental
+
+
+def test_products_sort_by_rating(client, make_product, make_review, admin):
+    low, high, unrated = make_product(name='Low'), make_product(name='High'), make_product(name='None')
+    client.patch(f'/reviews/{make_review(low, 2)}/approve', headers=admin)
+    client.patch(f'/reviews/{make_review(high, 5)}/approve', headers=admin)
+    body = client.get('/products?sort=rating&limit=2').get_json()
+    assert [product['product_id'] for product in body['products']] == [high, low]
+    rest = client.get(f"/products?sort=rating&cursor={body['next_cursor']}").get_json()
+    assert [product['product_id'] for product in rest['products']] == [unrated]
@@ -0,0 +1,70 @@
+# test_replicas.py
+import pytest
+from app import create_app
+from config import Config
+from database import PRIMARY_PIN_COOKIE, db, sync_sqlite_replicas
+from identity import identity_cache
+from models import Product
+from search import product_index
+
+
+# A SQLite primary with one SQLite replica file, synced once after the setup so it
+# lags behind any later write
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'primary.db'}")
+    monkeypatch.setattr(Config, 'DATABASE_REPLICA_URLS', [f"sqlite:///{tmp_path / 'replica.db'}"])
+    app = create_app()
+    app.config['TESTING'] = True
+    identity_cache.reset()
+    product_index.reset()
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    # init_app registered a MetaData for the replica bind on the shared extension
+    db.metadatas.pop('replica_0', None)
+
+
+@pytest.fixture
+def mug(app, make_product):
+    product_id = make_product(name='Mug')
+    with app.app_context():
+        sync_sqlite_replicas()
+    return product_id
+
+
+def name(client, product_id):
+    return client.get(f'/products/{product_id}').get_json()['name']
+
+
+def test_reads_go_to_the_replica(app, client, mug):
+    with app.app_context():
+        db.session.query(Product).filter_by(product_id=mug).update({'name': 'Cup'})
+        db.session.commit()
+    assert name(client, mug) == 'Mug'
+    assert client.get_cookie(PRIMARY_PIN_COOKIE) is None
+
+
+def test_writers_read_their_writes(app, client, mug, admin):
+    assert name(client, mug) == 'Mug'  # cached from the replica
+
+    response = client.put(f'/products/{mug}', json={'name': 'Cup'}, headers=admin)
+    assert response.status_code == 200
+    assert client.get_cookie(PRIMARY_PIN_COOKIE) is not None
+    # The pinned client skips both the replica and the response cache
+    assert name(client, mug) == 'Cup'
+    assert name(app.test_client(), mug) == 'Mug'
+
+
+def test_writes_within_a_replica_view_go_to_the_primary(app, client, mug):
+    with app.test_request_context():
+        db.session.info['use_replica'] = True
+        assert db.session.get(Product, mug).name == 'Mug'
+        db.session.query(Product).filter_by(product_id=mug).update({'name': 'Cup'})
+        # After a write the session reads from the primary
+        assert db.session.query(Product.name).filter_by(product_id=mug).scalar() == 'Cup'
+        db.session.rollback()
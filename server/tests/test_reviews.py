@@ -0,0 +1,75 @@
+# test_reviews.py
+import pytest
+
+
+@pytest.fixture
+def post_review(client, make_user):
+    user_id = make_user('user@example.com')
+
+    def post(product_id, rating, text=None):
+        response = client.post(f'/products/{product_id}/reviews',
+                               json={'user_id': user_id, 'rating': rating, 'review_text': text})
+        assert response.status_code == 201
+    return post
+
+
+def review_ids(response):
+    assert response.status_code == 200
+    return [review['review_id'] for review in response.get_json()['reviews']]
+
+
+def queue(client, admin, **params):
+    return review_ids(client.get('/reviews', query_string=params, headers=admin))
+
+
+@pytest.mark.parametrize('rating', [0, 6, 4.5, '5'])
+def test_rating_must_be_one_to_five(client, make_user, make_product, rating):
+    user_id = make_user('user@example.com')
+    response = client.post(f'/products/{make_product()}/reviews', json={'user_id': user_id, 'rating': rating})
+    assert response.status_code == 400
+
+
+def test_only_approved_reviews_are_listed(client, make_product, post_review, admin):
+    mug = make_product()
+    for stars in (3, 5, 1):
+        post_review(mug, stars)
+    assert review_ids(client.get(f'/products/{mug}/reviews')) == []
+
+    pending = queue(client, admin)
+    assert len(pending) == 3 and pending == sorted(pending)  # oldest first
+    response = client.patch('/reviews/moderate', headers=admin,
+                            json={'review_ids': pending[:2] + [999], 'status': 'approved'})
+    assert response.get_json()['results'] == {
+        str(pending[0]): 'approved', str(pending[1]): 'approved', '999': 'not_found'}
+    response = client.patch('/reviews/moderate', headers=admin, json={'review_ids': pending, 'status': 'approved'})
+    assert list(response.get_json()['results'].values()) == ['unchanged', 'unchanged', 'approved']
+    client.patch('/reviews/moderate', headers=admin, json={'review_ids': pending[2:], 'status': 'rejected'})
+
+    assert queue(client, admin) == []
+    assert queue(client, admin, status='rejected') == pending[2:]
+    assert review_ids(client.get(f'/products/{mug}/reviews')) == pending[1::-1]  # newest first
+    assert client.get(f'/products/{mug}').get_json()['rating']['count'] == 2
+
+
+def test_reviews_page_by_rating(client, make_product, post_review, admin):
+    mug = make_product()
+    for stars in (3, 5, 1, 5):
+        post_review(mug, stars)
+    client.patch('/reviews/moderate', headers=admin, json={'review_ids': queue(client, admin), 'status': 'approved'})
+
+    ratings, cursor = [], None
+    while True:
+        params = {'sort': 'highest', 'limit': 3, **({'cursor': cursor} if cursor else {})}
+        body = client.get(f'/products/{mug}/reviews', query_string=params).get_json()
+        ratings += [review['rating'] for review in body['reviews']]
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    assert ratings == [5, 5, 3, 1]
+    assert client.get(f'/products/{mug}/reviews?sort=best').status_code == 400
+
+
+def test_moderation_is_admin_only(client, make_user, auth_header):
+    user = auth_header(make_user('user@example.com'))
+    assert client.get('/reviews', headers=user).status_code == 403
+    assert client.patch('/reviews/moderate', headers=user, json={'review_ids': [], 'status': 'approved'}).status_code == 403
@@ -0,0 +1,102 @@
+# test_search.py
+import pytest
+from sqlalchemy import delete
+from database import db
+from models import Product
+from search import product_index
+
+
+@pytest.fixture
+def catalog(make_product):
+    return {
+        'boots': make_product(name='Leather Boots', price='90.00', category='Footwear'),
+        'jacket': make_product(name='Leather Jacket', price='120.00', category="Men's Wear"),
+        'wallet': make_product(name='Wallet', price='40.00', stock=0, category='Accessories'),
+        'sneakers': make_product(name='Canvas Sneakers', price='45.00', category='Footwear'),
+    }
+
+
+def search(client, query=''):
+    return client.get(f'/products/search?{query}').get_json()
+
+
+def ids(body):
+    return [product['product_id'] for product in body['results']]
+
+
+def test_name_matches_rank_above_description_matches(client, make_product):
+    in_description = make_product(name='Bag')  # described as "A Bag"
+    in_name = make_product(name='Bag Strap')
+    assert ids(search(client, 'q=strap')) == [in_name]
+    assert ids(search(client, 'q=bag'))[0] in (in_description, in_name)
+    assert set(ids(search(client, 'q=bag'))) == {in_description, in_name}
+
+
+def test_prefix_typo_and_every_term_must_match(client, catalog):
+    assert set(ids(search(client, 'q=leath'))) == {catalog['boots'], catalog['jacket']}
+    assert ids(search(client, 'q=lether jacket')) == [catalog['jacket']]
+    assert ids(search(client, 'q=leather wallet')) == []
+
+
+def test_filters_and_category_facets(client, catalog):
+    body = search(client, 'max_price=100&in_stock=true&category=footwear')
+    assert set(ids(body)) == {catalog['boots'], catalog['sneakers']}
+    # The category filter does not narrow the facets, the price and stock filters do
+    assert body['facets']['category'] == {'Footwear': 2}
+    assert search(client, 'min_price=100')['facets']['category'] == {"Men's Wear": 1}
+    assert ids(search(client, 'q=leather&category=mens-wear')) == [catalog['jacket']]
+    assert client.get('/products/search?category=Footwear').status_code == 404
+
+
+def test_category_filter_includes_subcategories(client, make_product, admin):
+    shoes = client.post('/categories', json={'name': 'Shoes'}, headers=admin).get_json()['category_id']
+    client.post('/categories', json={'name': 'Boots', 'parent_id': shoes}, headers=admin)
+    boots = make_product(name='Leather Boots', category='Boots')
+    make_product(name='Leather Belt', category='Accessories')
+    assert ids(search(client, 'q=leather&category=shoes')) == [boots]
+
+
+def test_product_writes_update_the_index(client, catalog, make_user, auth_header):
+    headers = auth_header(make_user('admin@example.com', role='admin'))
+    assert ids(search(client, 'q=boots')) == [catalog['boots']]
+
+    response = client.post('/products', headers=headers, json={
+        'name': 'Rain Boots', 'description': 'Rubber', 'price': 30, 'stock_quantity': 5, 'category': 'Footwear'})
+    assert response.status_code == 201
+    assert search(client, 'q=boots')['total'] == 2
+
+    assert client.put(f"/products/{catalog['boots']}", json={'name': 'Hiking Shoes'},
+                      headers=headers).status_code == 200
+    assert ids(search(client, 'q=hiking')) == [catalog['boots']]
+    assert client.delete(f"/products/{catalog['jacket']}", headers=headers).status_code == 200
+    assert search(client, 'q=jacket')['total'] == 0
+
+
+# Writes made by another worker process reach this one's index on its next refresh
+def test_writes_from_other_workers_are_synced(app, client, catalog, make_product):
+    app.config['SEARCH_INDEX_REFRESH_SECONDS'] = 0
+    assert search(client, 'q=leather')['total'] == 2
+
+    with app.app_context():
+        boots = db.session.get(Product, catalog['boots'])
+        boots.name, boots.description = 'Hiking Shoes', 'Waterproof'
+        db.session.commit()
+    added = make_product(name='Leather Gloves')
+    assert set(ids(search(client, 'q=leather'))) == {catalog['jacket'], added}
+    assert ids(search(client, 'q=hiking')) == [catalog['boots']]
+
+
+def test_deletions_elsewhere_leave_the_index(app, client, catalog, make_product, monkeypatch):
+    app.config['SEARCH_INDEX_REFRESH_SECONDS'] = 0
+    assert search(client)['total'] == 4
+    builds = []
+    monkeypatch.setattr(product_index, '_build', lambda: builds.append(1))
+
+    # One product deleted and another added: the product count is unchanged
+    with app.app_context():
+        db.session.execute(delete(Product).where(Product.product_id == catalog['jacket']))
+        db.session.commit()
+    added = make_product(name='Leather Belt')
+    assert set(ids(search(client, 'q=leather'))) == {catalog['boots'], added}
+    assert search(client)['total'] == 4
+    assert builds == []  # the deleted product was dropped without a rebuild
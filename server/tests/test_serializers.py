@@ -0,0 +1,44 @@
+# test_serializers.py
+import json
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from models import User
+from serializers import dumps, stream_json_array, user_schema, product_schema
+
+
+def test_decimals_and_datetimes_are_encoded():
+    data = {'price': Decimal('19.99'), 'at': datetime(2026, 1, 2, 3, 4, 5), 'name': 'Café'}
+    assert json.loads(dumps(data)) == {'price': 19.99, 'at': '2026-01-02T03:04:05', 'name': 'Café'}
+
+
+@pytest.mark.parametrize('count', [0, 1, 2, 5])
+def test_streamed_arrays_are_valid_json(app, count):
+    users = [User(user_id=i, name=f'u{i}', email=f'u{i}@example.com', phone_number=i, role='user')
+             for i in range(count)]
+    with app.test_request_context():
+        response = stream_json_array(users, user_schema, fields=['user_id', 'name'], chunk_size=2)
+        body = b''.join(response.response)
+    assert json.loads(body) == [{'user_id': i, 'name': f'u{i}'} for i in range(count)]
+
+
+def test_users_are_streamed(client, make_user, admin):
+    for i in range(3):
+        make_user(f'u{i}@example.com')
+    response = client.get('/users', headers=admin)
+    assert response.is_streamed
+    users = response.get_json()
+    assert [user['email'] for user in users] == ['admin@example.com', 'u0@example.com', 'u1@example.com',
+                                                 'u2@example.com']
+    assert set(users[0]) == {'user_id', 'name', 'email', 'phone_number', 'role'}
+
+
+def test_fields_are_validated_against_the_schema():
+    assert product_schema.parse_fields('name, price') == ['product_id', 'name', 'price']
+    with pytest.raises(ValueError):
+        product_schema.parse_fields('name,password')
+
+
+def test_product_prices_are_numbers(client, make_product):
+    product_id = make_product(price='12.50')
+    assert client.get(f'/products/{product_id}').get_json()['price'] == 12.5
@@ -0,0 +1,50 @@
+# test_serving.py
+import logging
+from types import SimpleNamespace
+from sqlalchemy.exc import OperationalError
+from config import Config
+from database import db
+import serving
+
+
+class FakeServer:
+    def __init__(self, app, workers, preload_app=True):
+        self.cfg = SimpleNamespace(workers=workers, preload_app=preload_app, graceful_timeout=1)
+        self.app = SimpleNamespace(wsgi=lambda: app)
+        self.log = logging.getLogger('test_serving')
+
+
+def test_settings_follow_the_config(monkeypatch):
+    monkeypatch.setattr(serving, 'usable_cores', lambda: 3)
+    config = type('TestConfig', (Config,), {'SERVER_WORKERS': 0, 'SERVER_THREADS': 0, 'DB_POOL_SIZE': 2,
+                                            'SERVER_MAX_REQUESTS': 1000})
+    settings = serving.gunicorn_settings(config)
+    assert (settings['workers'], settings['threads'], settings['worker_class']) == (3, 2, 'gthread')
+    assert settings['preload_app'] is True
+    assert (settings['max_requests'], settings['max_requests_jitter']) == (1000, 100)
+    assert settings['when_ready'] is serving.when_ready
+
+
+def test_when_ready_warns_about_a_per_process_cache(app, monkeypatch, caplog):
+    monkeypatch.setattr(Config, 'CACHE_BACKEND', 'memory')
+    with caplog.at_level(logging.WARNING, logger='test_serving'):
+        serving.when_ready(FakeServer(app, workers=1, preload_app=False))
+        assert caplog.records == []
+        serving.when_ready(FakeServer(app, workers=4, preload_app=False))
+    assert 'CACHE_BACKEND' in caplog.records[0].getMessage()
+
+
+def test_health_probes(app, client, monkeypatch):
+    assert client.get('/health/live').get_json() == {'status': 'ok'}
+    ready = client.get('/health/ready')
+    assert ready.status_code == 200
+    assert ready.get_json()['databases']['default']['ok'] is True
+
+    def unreachable(*args, **kwargs):
+        raise OperationalError('SELECT 1', {}, Exception('connection refused'))
+    with app.app_context():
+        monkeypatch.setattr(type(db.engine), 'connect', unreachable)
+    down = client.get('/health/ready')
+    assert down.status_code == 503
+    check = down.get_json()['databases']['default']
+    assert (check['ok'], check['error']) == (False, 'OperationalError')
@@ -0,0 +1,6 @@
+# web.py
+# Production entry point for the web workers, see serving.py. (Not named wsgi.py:
+# the flask CLI would pick that up instead of app.py and lose its commands.)
+from app import create_app
+
+app = create_app(cli=False)